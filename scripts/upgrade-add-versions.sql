@@ -0,0 +1,5 @@
+-- Adds the `version` columns behind ETags and cache invalidation to tables created before them,
+-- as startup only creates missing tables. Runs on MySQL, PostgreSQL and SQLite.
+-- Existing rows start at version 1, as MongoDB documents and Redis hashes without one are read.
+ALTER TABLE pokemon ADD COLUMN version BIGINT NOT NULL DEFAULT 1;
+ALTER TABLE trainer ADD COLUMN version BIGINT NOT NULL DEFAULT 1;
@@ -0,0 +1,94 @@
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Any, Callable, Generic, Hashable, Iterable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class TTLLRUCache(Generic[K, V]):
+    """Size-bounded LRU cache whose entries also expire `ttl` seconds after being stored.
+
+    Entries may carry tags; `invalidate_tag` drops every entry stored with a given tag. The cache
+    is meant for a single event loop and does no locking. `counts` tallies the hits, misses,
+    evictions and invalidations reported by `stats`.
+    """
+
+    def __init__(
+        self, max_size: int, ttl: float, timer: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._timer = timer
+        self._entries: OrderedDict[K, tuple[float, V, tuple[Hashable, ...]]] = OrderedDict()
+        self._tagged_keys: defaultdict[Hashable, set[K]] = defaultdict(set)
+        self.counts: Counter[str] = Counter()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.counts['misses'] += 1
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at <= self._timer():
+            self._remove(key)
+            self.counts['misses'] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.counts['hits'] += 1
+        return value
+
+    def set(self, key: K, value: V, tags: Iterable[Hashable] = ()) -> None:
+        if self.max_size <= 0:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        tags = tuple(tags)
+        self._entries[key] = (self._timer() + self.ttl, value, tags)
+        for tag in tags:
+            self._tagged_keys[tag].add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+            self.counts['evictions'] += 1
+
+    def delete(self, key: K) -> None:
+        if key in self._entries:
+            self._remove(key)
+            self.counts['invalidations'] += 1
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        for key in list(self._tagged_keys.get(tag, ())):
+            self.delete(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tagged_keys.clear()
+
+    def stats(self) -> dict[str, Any]:
+        hits, misses = self.counts['hits'], self.counts['misses']
+        lookups = hits + misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'evictions': self.counts['evictions'],
+            'invalidations': self.counts['invalidations'],
+        }
+
+    def _remove(self, key: K) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged_keys[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tagged_keys[tag]
@@ -1,4 +1,5 @@
 import re
+from typing import Iterable
 
 
 class UUIDStr(str):
@@ -7,6 +8,8 @@ class UUIDStr(str):
     # regular expression to match 32 hexadecimal characters
 
     UUID_PATTERN = re.compile(r'^[a-fA-F0-9]{32}$')
+    # the same, for any number of them joined by "\n"
+    _UUIDS_PATTERN = re.compile(r'(?:[a-fA-F0-9]{32}\n)*[a-fA-F0-9]{32}')
 
     def __new__(cls, *args, **kwargs):
         instance = super().__new__(cls, *args, **kwargs)
@@ -16,12 +19,28 @@ class UUIDStr(str):
 
         return instance
 
+    @classmethod
+    def from_trusted(cls, value: str) -> 'UUIDStr':
+        """Wrap a value read back from our own storage without matching it again."""
+        return str.__new__(cls, value)
+
+    @classmethod
+    def validate_many(cls, values: Iterable[str]) -> list['UUIDStr']:
+        """Validate `values` with a single regex match, raising the error `cls(value)` would."""
+        values = list(values)
+        if _match_joined(cls._UUIDS_PATTERN, values, 32):
+            return [str.__new__(cls, value) for value in values]
+
+        return list(map(cls, values))
+
 
 class PokemonNumberStr(str):
     """Pokemon Number represented as a string in the range "0001" to "9999"."""
 
     # regular expression to match numbers from 0001 to 9999
     NUMBER_PATTERN = re.compile(r'^\d{4}$')
+    # the same, for any number of them joined by "\n"
+    _NUMBERS_PATTERN = re.compile(r'(?:\d{4}\n)*\d{4}')
 
     def __new__(cls, *args, **kwargs):
         instance = super().__new__(cls, *args, **kwargs)
@@ -32,3 +51,27 @@ class PokemonNumberStr(str):
             )
 
         return instance
+
+    @classmethod
+    def from_trusted(cls, value: str) -> 'PokemonNumberStr':
+        """Wrap a value read back from our own storage without matching it again."""
+        return str.__new__(cls, value)
+
+    @classmethod
+    def validate_many(cls, values: Iterable[str]) -> list['PokemonNumberStr']:
+        """Validate `values` with a single regex match, raising the error `cls(value)` would."""
+        values = list(values)
+        if _match_joined(cls._NUMBERS_PATTERN, values, 4) and '0000' not in values:
+            return [str.__new__(cls, value) for value in values]
+
+        return list(map(cls, values))
+
+
+def _match_joined(pattern: re.Pattern, values: list, width: int) -> bool:
+    # with `len(values) - 1` separators and every match `width` long, no value can hold a "\n";
+    # anything else, or anything but strings, is left to the one-by-one path and its errors
+    if not values or not all(type(value) is str for value in values):
+        return False
+
+    joined = '\n'.join(values)
+    return len(joined) == (width + 1) * len(values) - 1 and pattern.fullmatch(joined) is not None
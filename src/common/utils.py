@@ -1,9 +1,34 @@
+import binascii
+import time
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from uuid import uuid4
 
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
 
 def build_uuid4_str() -> str:
     return str(uuid4().hex)
 
 
+def build_initial_version() -> int:
+    """Return the version of a new entity, counted up by one on each write from then on.
+
+    It is a microsecond timestamp, so an entity re-created under a deleted one's id doesn't repeat
+    its versions (and with them its ETags).
+    """
+    return time.time_ns() // 1000
+
+
 def public_dict(object_) -> dict:
     return {k: v for k, v in vars(object_).items() if not k.startswith('_')}
+
+
+def encode_cursor(value: str) -> str:
+    return urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError(f"'{cursor}' is not a valid cursor")
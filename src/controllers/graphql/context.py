@@ -0,0 +1,25 @@
+from strawberry.dataloader import DataLoader
+from strawberry.fastapi import BaseContext
+
+from .pokemon.loader import load_pokemon_types, load_pokemons
+from .trainer.loader import load_trainer_teams
+
+
+class GraphQLContext(BaseContext):
+    """
+    Per-request GraphQL context.
+
+    The loaders batch and deduplicate lookups made by sibling resolvers, so a query touching many
+    trainers or Pokemon issues a constant number of backend calls. They are created per request, so
+    nothing is cached across requests.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.pokemon_loader = DataLoader(load_fn=load_pokemons)
+        self.pokemon_types_loader = DataLoader(load_fn=load_pokemon_types)
+        self.trainer_team_loader = DataLoader(load_fn=load_trainer_teams)
+
+
+async def get_context() -> GraphQLContext:
+    return GraphQLContext()
@@ -0,0 +1,40 @@
+from collections import defaultdict
+
+import usecases.pokemon as pokemon_ucase
+from common.type import PokemonNumberStr
+from di.dependency_injection import injector
+from di.unit_of_work import AbstractUnitOfWork
+from models.exception import PokemonNotFound
+from models.pokemon import PokemonIncludeModel
+
+from .mapper import PokemonNodeMapper, TypeNodeMapper
+from .schema import PokemonNode, TypeNode
+
+PokemonLoaderKey = tuple[PokemonNumberStr, PokemonIncludeModel]
+
+
+async def load_pokemons(keys: list[PokemonLoaderKey]) -> list[PokemonNode | PokemonNotFound]:
+    numbers_by_include = defaultdict(list)
+    for no, include in keys:
+        numbers_by_include[include].append(no)
+
+    # one backend call per distinct field selection, usually just one
+    nodes = {}
+    for include, numbers in numbers_by_include.items():
+        async_unit_of_work = injector.get(AbstractUnitOfWork)
+        pokemons = await pokemon_ucase.get_pokemon_map(async_unit_of_work, numbers, include)
+        for no, pokemon in pokemons.items():
+            nodes[(no, include)] = PokemonNodeMapper.entity_to_node(pokemon)
+
+    return [nodes[key] if key in nodes else PokemonNotFound(key[0]) for key in keys]
+
+
+async def load_pokemon_types(numbers: list[PokemonNumberStr]) -> list[list[TypeNode]]:
+    async_unit_of_work = injector.get(AbstractUnitOfWork)
+    include = PokemonIncludeModel(previous_evolutions=False, next_evolutions=False)
+    pokemons = await pokemon_ucase.get_pokemon_map(async_unit_of_work, numbers, include)
+
+    return [
+        list(map(TypeNodeMapper.entity_to_node, pokemons[no].types)) if no in pokemons else []
+        for no in numbers
+    ]
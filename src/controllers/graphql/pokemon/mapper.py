@@ -1,51 +1,139 @@
 # pylint: disable=duplicate-code
+from dataclasses import fields
+from itertools import chain
+from typing import Callable, Iterable
+
+from strawberry.types import Info
+from strawberry.types.nodes import FragmentSpread, InlineFragment, Selection
+from strawberry.utils.str_converters import to_camel_case
+
 from common.docstring import MAPPER_DOCSTRING
 from common.type import PokemonNumberStr
+from common.utils import decode_cursor, encode_cursor
 from models.pokemon import (
+    CreatePokemonErrorModel,
     CreatePokemonModel,
+    CreatePokemonsResultModel,
+    GetPokemonParamsModel,
     PokemonEvolutionModel,
+    PokemonIncludeModel,
     PokemonModel,
+    PokemonPageModel,
     TypeModel,
     UpdatePokemonModel,
 )
 
-from .schema import CreatePokemonInput, EvolutionNode, PokemonNode, TypeNode, UpdatePokemonInput
+from .schema import (
+    CreatePokemonErrorNode,
+    CreatePokemonInput,
+    CreatePokemonsResultNode,
+    EvolutionNode,
+    PageInfoNode,
+    PokemonConnectionNode,
+    PokemonNode,
+    TypeNode,
+    UpdatePokemonInput,
+)
 
 __doc__ = MAPPER_DOCSTRING
 
+NumbersParser = Callable[[Iterable[str]], list[PokemonNumberStr]]
+
+
+def _numbers_of(instance: CreatePokemonInput) -> list[str]:
+    return [
+        instance.no,
+        *(instance.previous_evolution_numbers or []),
+        *(instance.next_evolution_numbers or []),
+    ]
+
+
+def _trust_numbers(values: Iterable[str]) -> list[PokemonNumberStr]:
+    return list(map(PokemonNumberStr.from_trusted, values))
+
 
 class PokemonInputMapper:
     @staticmethod
-    def create_input_to_entity(instance: CreatePokemonInput) -> CreatePokemonModel:
+    def create_input_to_entity(
+        instance: CreatePokemonInput,
+        to_numbers: NumbersParser = PokemonNumberStr.validate_many,
+    ) -> CreatePokemonModel:
+        no, *evolution_numbers = to_numbers(_numbers_of(instance))
+        previous_count = len(instance.previous_evolution_numbers or [])
         return CreatePokemonModel(
-            no=PokemonNumberStr(instance.no),
+            no=no,
             name=instance.name,
             type_names=instance.type_names,
-            previous_evolution_numbers=list(
-                map(PokemonNumberStr, instance.previous_evolution_numbers or [])
-            ),
-            next_evolution_numbers=list(
-                map(PokemonNumberStr, instance.next_evolution_numbers or [])
-            ),
+            previous_evolution_numbers=evolution_numbers[:previous_count],
+            next_evolution_numbers=evolution_numbers[previous_count:],
         )
 
+    @staticmethod
+    def create_many_input_to_entities(
+        instances: list[CreatePokemonInput],
+    ) -> list[CreatePokemonModel]:
+        # a single match for every number in the batch, after which the items don't repeat it
+        PokemonNumberStr.validate_many(chain.from_iterable(map(_numbers_of, instances)))
+        return [
+            PokemonInputMapper.create_input_to_entity(instance, _trust_numbers)
+            for instance in instances
+        ]
+
     @staticmethod
     def update_input_to_entity(instance: UpdatePokemonInput) -> UpdatePokemonModel:
         return UpdatePokemonModel(
             name=instance.name,
             type_names=instance.type_names,
             previous_evolution_numbers=(
-                list(map(PokemonNumberStr, instance.previous_evolution_numbers))
+                PokemonNumberStr.validate_many(instance.previous_evolution_numbers)
                 if instance.previous_evolution_numbers is not None
                 else None
             ),
             next_evolution_numbers=(
-                list(map(PokemonNumberStr, instance.next_evolution_numbers))
+                PokemonNumberStr.validate_many(instance.next_evolution_numbers)
                 if instance.next_evolution_numbers is not None
                 else None
             ),
         )
 
+    @staticmethod
+    def page_args_to_entity(first: int, after: str | None) -> GetPokemonParamsModel:
+        return GetPokemonParamsModel(
+            size=first,
+            after_no=PokemonNumberStr(decode_cursor(after)) if after else None,
+        )
+
+    @staticmethod
+    def info_to_include(info: Info, path: tuple[str, ...] = ()) -> PokemonIncludeModel:
+        """Map the fields selected on the resolved PokemonNode(s) to the relations to load.
+
+        Args:
+            info: Resolver info of the field returning the Pokemon.
+            path: Field names leading from that field to the PokemonNode, e.g. `('nodes',)`.
+        """
+
+        def collect_names(selections: list[Selection], path: tuple[str, ...]) -> set[str]:
+            names = set()
+            for selection in selections:
+                if isinstance(selection, (FragmentSpread, InlineFragment)):
+                    names |= collect_names(selection.selections, path)
+                elif not path:
+                    names.add(selection.name)
+                elif selection.name == path[0]:
+                    names |= collect_names(selection.selections, path[1:])
+            return names
+
+        names = set()
+        for selected_field in info.selected_fields:
+            names |= collect_names(selected_field.selections, path)
+
+        return PokemonIncludeModel(
+            **{
+                field.name: field.name in names or to_camel_case(field.name) in names
+                for field in fields(PokemonIncludeModel)
+            }
+        )
+
 
 class PokemonNodeMapper:
     @staticmethod
@@ -61,6 +149,37 @@ class PokemonNodeMapper:
         )
 
 
+class CreatePokemonsResultNodeMapper:
+    @staticmethod
+    def entity_to_node(instance: CreatePokemonsResultModel) -> CreatePokemonsResultNode:
+        return CreatePokemonsResultNode(
+            created=list(map(PokemonNodeMapper.entity_to_node, instance.created)),
+            errors=list(map(CreatePokemonErrorNodeMapper.entity_to_node, instance.errors)),
+        )
+
+
+class CreatePokemonErrorNodeMapper:
+    @staticmethod
+    def entity_to_node(instance: CreatePokemonErrorModel) -> CreatePokemonErrorNode:
+        return CreatePokemonErrorNode(
+            index=instance.index,
+            no=instance.no,
+            error=f'{type(instance.error).__name__}: {instance.error}',
+        )
+
+
+class PokemonConnectionNodeMapper:
+    @staticmethod
+    def page_to_node(page: PokemonPageModel) -> PokemonConnectionNode:
+        return PokemonConnectionNode(
+            nodes=list(map(PokemonNodeMapper.entity_to_node, page.items)),
+            page_info=PageInfoNode(
+                has_next_page=page.next_no is not None,
+                end_cursor=encode_cursor(page.next_no) if page.next_no is not None else None,
+            ),
+        )
+
+
 class TypeNodeMapper:
     @staticmethod
     def entity_to_node(instance: TypeModel) -> TypeNode:
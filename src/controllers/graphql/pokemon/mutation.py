@@ -8,8 +8,8 @@ from common.type import PokemonNumberStr
 from di.dependency_injection import injector
 from di.unit_of_work import AbstractUnitOfWork
 
-from .mapper import PokemonInputMapper, PokemonNodeMapper
-from .schema import CreatePokemonInput, PokemonNode, UpdatePokemonInput
+from .mapper import CreatePokemonsResultNodeMapper, PokemonInputMapper, PokemonNodeMapper
+from .schema import CreatePokemonInput, CreatePokemonsResultNode, PokemonNode, UpdatePokemonInput
 
 
 @strawberry.type
@@ -28,6 +28,21 @@ class PokemonMutation:
 
         return PokemonNodeMapper.entity_to_node(created_pokemon)
 
+    @strawberry.field
+    async def create_pokemons(
+        self,
+        input_: Annotated[list[CreatePokemonInput], strawberry.argument(name='input')],
+        _: Info,
+    ) -> CreatePokemonsResultNode:
+        if not 1 <= len(input_) <= 1000:
+            raise ValueError('"input" must contain between 1 and 1000 items')
+
+        async_unit_of_work = injector.get(AbstractUnitOfWork)
+        create_pokemons_data = PokemonInputMapper.create_many_input_to_entities(input_)
+        result = await pokemon_ucase.create_pokemons(async_unit_of_work, create_pokemons_data)
+
+        return CreatePokemonsResultNodeMapper.entity_to_node(result)
+
     @strawberry.field
     async def update_pokemon(
         self,
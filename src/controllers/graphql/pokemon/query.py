@@ -8,61 +8,50 @@ from common.type import PokemonNumberStr
 from di.dependency_injection import injector
 from di.unit_of_work import AbstractUnitOfWork
 
-from .mapper import PokemonNodeMapper
-from .schema import PokemonNode
+from .mapper import PokemonConnectionNodeMapper, PokemonInputMapper, PokemonNodeMapper
+from .schema import PokemonConnectionNode, PokemonNode
 
 
 @strawberry.type
 class PokemonQuery:
     """
-    GraphQL Performance Optimization Notes.
+    Resolvers pass the fields selected on PokemonNode down as a `PokemonIncludeModel`.
 
-    Current Implementation Limitation:
-    The current GraphQL resolvers load all relational data (types, evolutions) regardless of
-    which fields are actually requested in the query. This defeats the purpose of GraphQL's
-    selective field querying capability.
-
-    For example, a query like:
-      query { pokemon(no: "001") { no, name } }
-    Still triggers database queries for types and evolutions that aren't needed.
-
-    Potential Optimization Strategies:
-
-    1. Field Selection Analysis
-       - Parse the GraphQL Info parameter to determine requested fields
-       - Implement conditional loading in usecases based on field selection
-       - Modify repository layer to support selective data loading
-
-    2. DataLoader Pattern
-       - Implement batched loading for relational data to solve N+1 query problems
-       - Use lazy loading in GraphQL resolvers with proper caching
-
-    3. Dedicated GraphQL Usecases
-       - Create GraphQL-specific usecases that don't impact REST API compatibility
-       - Maintain separation of concerns between different API layers
-
-    4. Repository Method Specialization
-       - Provide multiple query methods (minimal, with_types, full)
-       - Allow resolvers to choose appropriate data loading strategy
-
-    Implementation Priority: High for field selection analysis, Medium for DataLoader pattern.
+    A query like `query { pokemon(no: "0001") { no, name } }` therefore loads neither types nor
+    evolutions, while fragments and inline fragments are still taken into account.
     """
 
     @strawberry.field
-    async def pokemons(self, _: Info) -> list[PokemonNode]:
+    async def pokemons(self, info: Info) -> list[PokemonNode]:
         async_unit_of_work = injector.get(AbstractUnitOfWork)
-        pokemons = await pokemon_ucase.get_pokemons(async_unit_of_work)
+        include = PokemonInputMapper.info_to_include(info)
+        pokemons = await pokemon_ucase.get_pokemons(async_unit_of_work, include)
 
         return list(map(PokemonNodeMapper.entity_to_node, pokemons))
 
+    @strawberry.field
+    async def pokemon_connection(
+        self,
+        info: Info,
+        first: Annotated[int, strawberry.argument(description='Page size')] = 100,
+        after: Annotated[str | None, strawberry.argument(description='Opaque end cursor of the previous page')] = None,  # fmt: skip
+    ) -> PokemonConnectionNode:
+        if not 1 <= first <= 1000:
+            raise ValueError('"first" must be between 1 and 1000')
+
+        async_unit_of_work = injector.get(AbstractUnitOfWork)
+        params = PokemonInputMapper.page_args_to_entity(first, after)
+        include = PokemonInputMapper.info_to_include(info, path=('nodes',))
+        page = await pokemon_ucase.get_pokemon_page(async_unit_of_work, params, include)
+
+        return PokemonConnectionNodeMapper.page_to_node(page)
+
     @strawberry.field
     async def pokemon(
         self,
         no: Annotated[str, strawberry.argument(description=PokemonNumberStr.__doc__)],
-        _: Info,
+        info: Info,
     ) -> PokemonNode:
-        async_unit_of_work = injector.get(AbstractUnitOfWork)
-        no = PokemonNumberStr(no)
-        pokemon = await pokemon_ucase.get_pokemon(async_unit_of_work, no)
+        include = PokemonInputMapper.info_to_include(info)
 
-        return PokemonNodeMapper.entity_to_node(pokemon)
+        return await info.context.pokemon_loader.load((PokemonNumberStr(no), include))
@@ -47,3 +47,28 @@ class TypeNode:
 class EvolutionNode:
     no: str = strawberry.field(description=PokemonNumberStr.__doc__)
     name: str
+
+
+@strawberry.type
+class CreatePokemonErrorNode:
+    index: int = strawberry.field(description='Position of the rejected item in the input')
+    no: str = strawberry.field(description=PokemonNumberStr.__doc__)
+    error: str
+
+
+@strawberry.type
+class CreatePokemonsResultNode:
+    created: list[PokemonNode]
+    errors: list[CreatePokemonErrorNode]
+
+
+@strawberry.type
+class PageInfoNode:
+    has_next_page: bool
+    end_cursor: str | None = strawberry.field(description='Opaque cursor to pass as `after`')
+
+
+@strawberry.type
+class PokemonConnectionNode:
+    nodes: list[PokemonNode]
+    page_info: PageInfoNode
@@ -3,6 +3,7 @@ from strawberry.fastapi import GraphQLRouter
 from strawberry.schema import Schema
 from strawberry.schema.config import StrawberryConfig
 
+from .context import get_context
 from .pokemon.mutation import PokemonMutation
 from .pokemon.query import PokemonQuery
 from .trainer.mutation import TrainerMutation
@@ -25,4 +26,5 @@ router = GraphQLRouter(
         mutation=Mutation,
         config=StrawberryConfig(auto_camel_case=True),
     ),
+    context_getter=get_context,
 )
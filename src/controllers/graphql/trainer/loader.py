@@ -0,0 +1,14 @@
+import usecases.trainer as trainer_ucase
+from common.type import UUIDStr
+from di.dependency_injection import injector
+from di.unit_of_work import AbstractUnitOfWork
+
+from .mapper import TrainerPokemonNodeMapper
+from .schema import TrainerPokemonNode
+
+
+async def load_trainer_teams(ids: list[UUIDStr]) -> list[list[TrainerPokemonNode]]:
+    async_unit_of_work = injector.get(AbstractUnitOfWork)
+    teams = await trainer_ucase.get_trainer_teams(async_unit_of_work, ids)
+
+    return [list(map(TrainerPokemonNodeMapper.entity_to_node, teams.get(id, []))) for id in ids]
@@ -6,6 +6,7 @@ from models.trainer import (
     CreateTrainerModel,
     ReleasePokemonModel,
     TradePokemonModel,
+    TrainerIncludeModel,
     TrainerModel,
     TrainerPokemonModel,
     UpdateTrainerModel,
@@ -62,13 +63,20 @@ class TrainerInputMapper:
 
 class TrainerNodeMapper:
     @staticmethod
-    def entity_to_node(instance: TrainerModel) -> TrainerNode:
+    def entity_to_node(
+        instance: TrainerModel, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerNode:
+        # without a loaded team, TrainerNode.team falls back to the per-request team loader
         return TrainerNode(
             id=instance.id,
             name=instance.name,
             region=instance.region,
             badge_count=instance.badge_count,
-            team=list(map(TrainerPokemonNodeMapper.entity_to_node, instance.team)),
+            team_nodes=(
+                list(map(TrainerPokemonNodeMapper.entity_to_node, instance.team))
+                if include.team
+                else None
+            ),
         )
 
     @staticmethod
@@ -7,19 +7,23 @@ import usecases.trainer as trainer_ucase
 from common.type import UUIDStr
 from di.dependency_injection import injector
 from di.unit_of_work import AbstractUnitOfWork
+from models.trainer import TrainerIncludeModel
 
 from .mapper import TrainerNodeMapper
 from .schema import TrainerNode
 
+# teams are resolved by TrainerNode.team through the per-request loader, batched across trainers
+WITHOUT_TEAM = TrainerIncludeModel(team=False)
+
 
 @strawberry.type
 class TrainerQuery:
     @strawberry.field
     async def trainers(self, _: Info) -> list[TrainerNode]:
         async_unit_of_work = injector.get(AbstractUnitOfWork)
-        trainers = await trainer_ucase.get_trainers(async_unit_of_work)
+        trainers = await trainer_ucase.get_trainers(async_unit_of_work, WITHOUT_TEAM)
 
-        return list(map(TrainerNodeMapper.entity_to_node, trainers))
+        return [TrainerNodeMapper.entity_to_node(trainer, WITHOUT_TEAM) for trainer in trainers]
 
     @strawberry.field
     async def trainer(
@@ -29,6 +33,6 @@ class TrainerQuery:
     ) -> TrainerNode:
         async_unit_of_work = injector.get(AbstractUnitOfWork)
         id = UUIDStr(id)
-        trainer = await trainer_ucase.get_trainer(async_unit_of_work, id)
+        trainer = await trainer_ucase.get_trainer(async_unit_of_work, id, WITHOUT_TEAM)
 
-        return TrainerNodeMapper.entity_to_node(trainer)
+        return TrainerNodeMapper.entity_to_node(trainer, WITHOUT_TEAM)
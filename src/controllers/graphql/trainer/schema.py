@@ -1,7 +1,10 @@
 import strawberry
+from strawberry.types import Info
 
 from common.type import PokemonNumberStr, UUIDStr
 
+from ..pokemon.schema import TypeNode
+
 
 @strawberry.input
 class CreateTrainerInput:
@@ -40,6 +43,10 @@ class TrainerPokemonNode:
     no: str = strawberry.field(description=PokemonNumberStr.__doc__)
     name: str
 
+    @strawberry.field
+    async def types(self, info: Info) -> list[TypeNode]:
+        return await info.context.pokemon_types_loader.load(self.no)
+
 
 @strawberry.type
 class TrainerNode:
@@ -47,7 +54,14 @@ class TrainerNode:
     name: str
     region: str
     badge_count: int
-    team: list[TrainerPokemonNode]
+    team_nodes: strawberry.Private[list[TrainerPokemonNode] | None] = None
+
+    @strawberry.field
+    async def team(self, info: Info) -> list[TrainerPokemonNode]:
+        if self.team_nodes is not None:
+            return self.team_nodes
+
+        return await info.context.trainer_team_loader.load(self.id)
 
 
 @strawberry.type
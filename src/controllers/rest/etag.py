@@ -0,0 +1,53 @@
+"""
+Conditional Requests for the REST Layer.
+
+Strong ETags are derived from the versions repositories increment on every write that changes how
+an entity is shown, so they can be checked against `If-None-Match` with a version lookup instead of
+loading and serializing the response.
+"""
+
+import hashlib
+from typing import Any, Iterable, Mapping
+
+from fastapi import HTTPException, Request, Response, status
+
+ETAG_HEADER = 'ETag'
+IF_NONE_MATCH_HEADER = 'If-None-Match'
+
+# bump when the response schemas change, so clients don't keep representations of the old shape
+REPRESENTATION_REVISION = 1
+
+
+def build_etag(kind: str, versions: Mapping[Any, int], *extra: str | None) -> str:
+    """Build the ETag of `kind` from the `{id: version}` of every entity shown, in order."""
+    parts = [
+        str(REPRESENTATION_REVISION),
+        kind,
+        *(f'{id}={version}' for id, version in versions.items()),
+        *map(str, extra),
+    ]
+    digest = hashlib.blake2b('\n'.join(parts).encode(), digest_size=16).hexdigest()
+
+    return f'"{digest}"'
+
+
+def _parse_if_none_match(value: str) -> Iterable[str]:
+    # If-None-Match uses the weak comparison: "W/" is ignored on both sides
+    return (tag.strip().removeprefix('W/') for tag in value.split(','))
+
+
+def is_conditional(request: Request) -> bool:
+    return IF_NONE_MATCH_HEADER in request.headers
+
+
+def ensure_modified(request: Request, etag: str):
+    """Raise a 304 Not Modified carrying `etag` when the request's `If-None-Match` matches it."""
+    if (value := request.headers.get(IF_NONE_MATCH_HEADER)) is None:
+        return
+
+    if value.strip() == '*' or etag in _parse_if_none_match(value):
+        raise HTTPException(status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers[ETAG_HEADER] = etag
@@ -12,6 +12,7 @@ Note:
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
 
+from di.unit_of_work import UnitOfWorkConflict
 from models.exception import (
     PokemonAlreadyExists,
     PokemonError,
@@ -26,12 +27,15 @@ _EXCEPTION_STATUS_MAP: dict[type[Exception], int] = {
     PokemonAlreadyExists: 409,
     TrainerNotFound: 404,
     TrainerAlreadyOwnsPokemon: 409,
+    # still conflicting after the retries
+    UnitOfWorkConflict: 409,
 }
 
 
 def add_exception_handlers(app: FastAPI):
     @app.exception_handler(PokemonError)
     @app.exception_handler(TrainerError)
+    @app.exception_handler(UnitOfWorkConflict)
     async def handle_domain_error(_, exc):
         status_code = _EXCEPTION_STATUS_MAP.get(type(exc), 400)
         return JSONResponse(
@@ -1,8 +1,15 @@
 # pylint: disable=duplicate-code
+from itertools import chain
+from typing import Callable, Iterable
+
 from common.docstring import MAPPER_DOCSTRING
 from common.type import PokemonNumberStr
+from common.utils import decode_cursor, encode_cursor
 from models.pokemon import (
+    CreatePokemonErrorModel,
     CreatePokemonModel,
+    CreatePokemonsResultModel,
+    GetPokemonParamsModel,
     PokemonEvolutionModel,
     PokemonModel,
     TypeModel,
@@ -10,7 +17,10 @@ from models.pokemon import (
 )
 
 from .schema import (
+    CreatePokemonErrorResponse,
     CreatePokemonRequest,
+    CreatePokemonsRequest,
+    CreatePokemonsResponse,
     EvolutionResponse,
     PokemonResponse,
     TypeResponse,
@@ -19,30 +29,64 @@ from .schema import (
 
 __doc__ = MAPPER_DOCSTRING
 
+NumbersParser = Callable[[Iterable[str]], list[PokemonNumberStr]]
+
+
+def _numbers_of(instance: CreatePokemonRequest) -> list[str]:
+    return [
+        instance.no,
+        *(instance.previous_evolution_numbers or []),
+        *(instance.next_evolution_numbers or []),
+    ]
+
+
+def _trust_numbers(values: Iterable[str]) -> list[PokemonNumberStr]:
+    return list(map(PokemonNumberStr.from_trusted, values))
+
 
 class PokemonRequestMapper:
     @staticmethod
-    def create_request_to_entity(instance: CreatePokemonRequest) -> CreatePokemonModel:
+    def create_request_to_entity(
+        instance: CreatePokemonRequest,
+        to_numbers: NumbersParser = PokemonNumberStr.validate_many,
+    ) -> CreatePokemonModel:
+        no, *evolution_numbers = to_numbers(_numbers_of(instance))
+        previous_count = len(instance.previous_evolution_numbers or [])
         return CreatePokemonModel(
-            no=PokemonNumberStr(instance.no),
+            no=no,
             name=instance.name,
             type_names=instance.type_names,
-            previous_evolution_numbers=list(
-                map(PokemonNumberStr, instance.previous_evolution_numbers or [])
-            ),
-            next_evolution_numbers=list(
-                map(PokemonNumberStr, instance.next_evolution_numbers or [])
-            ),
+            previous_evolution_numbers=evolution_numbers[:previous_count],
+            next_evolution_numbers=evolution_numbers[previous_count:],
         )
 
+    @staticmethod
+    def create_many_request_to_entities(
+        instance: CreatePokemonsRequest,
+    ) -> list[CreatePokemonModel]:
+        # a single match for every number in the batch, after which the items don't repeat it
+        PokemonNumberStr.validate_many(chain.from_iterable(map(_numbers_of, instance.items)))
+        return [
+            PokemonRequestMapper.create_request_to_entity(item, _trust_numbers)
+            for item in instance.items
+        ]
+
     @staticmethod
     def update_request_to_entity(instance: UpdatePokemonRequest) -> UpdatePokemonModel:
         kwargs = instance.model_dump(exclude_unset=True)
         for field in ('previous_evolution_numbers', 'next_evolution_numbers'):
             if field in kwargs:
-                kwargs[field] = list(map(PokemonNumberStr, kwargs[field]))
+                kwargs[field] = PokemonNumberStr.validate_many(kwargs[field])
         return UpdatePokemonModel(**kwargs)
 
+    @staticmethod
+    def page_query_to_entity(
+        size: int | None, after_no: PokemonNumberStr | None
+    ) -> GetPokemonParamsModel:
+        if size is None:
+            return GetPokemonParamsModel(after_no=after_no)
+        return GetPokemonParamsModel(size=size, after_no=after_no)
+
 
 class PokemonResponseMapper:
     @staticmethod
@@ -60,6 +104,37 @@ class PokemonResponseMapper:
         )
 
 
+class CreatePokemonsResponseMapper:
+    @staticmethod
+    def entity_to_response(instance: CreatePokemonsResultModel) -> CreatePokemonsResponse:
+        return CreatePokemonsResponse(
+            created=list(map(PokemonResponseMapper.entity_to_response, instance.created)),
+            errors=list(map(CreatePokemonErrorResponseMapper.entity_to_response, instance.errors)),
+        )
+
+
+class CreatePokemonErrorResponseMapper:
+    @staticmethod
+    def entity_to_response(instance: CreatePokemonErrorModel) -> CreatePokemonErrorResponse:
+        return CreatePokemonErrorResponse(
+            index=instance.index,
+            no=instance.no,
+            error=f'{type(instance.error).__name__}: {instance.error}',
+        )
+
+
+class CursorRequestMapper:
+    @staticmethod
+    def request_to_entity(cursor: str) -> PokemonNumberStr:
+        return PokemonNumberStr(decode_cursor(cursor))
+
+
+class CursorResponseMapper:
+    @staticmethod
+    def entity_to_response(next_no: PokemonNumberStr | None) -> str | None:
+        return encode_cursor(next_no) if next_no is not None else None
+
+
 class TypeResponseMapper:
     @staticmethod
     def entity_to_response(instance: TypeModel) -> TypeResponse:
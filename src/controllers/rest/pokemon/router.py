@@ -1,54 +1,168 @@
-from fastapi import APIRouter, Body, Path, status
+from fastapi import APIRouter, Body, Depends, Path, Query, Request, Response, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
 
 from common.type import PokemonNumberStr
+from common.utils import NDJSON_MEDIA_TYPE
 from di.dependency_injection import injector
 from di.unit_of_work import AbstractUnitOfWork
+from models.pokemon import PokemonModel
 from usecases import pokemon as pokemon_ucase
 
-from .mapper import PokemonRequestMapper, PokemonResponseMapper
-from .schema import CreatePokemonRequest, PokemonResponse, UpdatePokemonRequest
+from ..etag import build_etag, ensure_modified, is_conditional, set_etag
+from ..serialization import ResponseEncoder
+from .mapper import (
+    CreatePokemonsResponseMapper,
+    CursorRequestMapper,
+    CursorResponseMapper,
+    PokemonRequestMapper,
+    PokemonResponseMapper,
+)
+from .schema import (
+    CreatePokemonRequest,
+    CreatePokemonsRequest,
+    CreatePokemonsResponse,
+    PokemonResponse,
+    UpdatePokemonRequest,
+)
+from .snapshot import page_snapshots
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
 
-@router.post('/pokemons', status_code=status.HTTP_201_CREATED)
-async def create_pokemon(body: CreatePokemonRequest) -> PokemonResponse:
+pokemon_encoder = ResponseEncoder(
+    PokemonModel, PokemonResponseMapper.entity_to_response, exclude=['version']
+)
+
+
+@router.post('/pokemons', status_code=status.HTTP_201_CREATED, response_model=PokemonResponse)
+async def create_pokemon(body: CreatePokemonRequest) -> PokemonResponse | Response:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     create_pokemon_data = PokemonRequestMapper.create_request_to_entity(body)
     created_pokemon = await pokemon_ucase.create_pokemon(async_unit_of_work, create_pokemon_data)
 
-    return PokemonResponseMapper.entity_to_response(created_pokemon)
+    return pokemon_encoder.render(created_pokemon, status_code=status.HTTP_201_CREATED)
 
 
-@router.get('/pokemons/{no}')
-async def get_pokemon(no: str = Path(..., description=PokemonNumberStr.__doc__)) -> PokemonResponse:
+@router.post('/pokemons:batch')
+async def create_pokemons(body: CreatePokemonsRequest) -> CreatePokemonsResponse:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
-    no = PokemonNumberStr(no)
-    pokemon = await pokemon_ucase.get_pokemon(async_unit_of_work, no)
+    create_pokemons_data = PokemonRequestMapper.create_many_request_to_entities(body)
+    result = await pokemon_ucase.create_pokemons(async_unit_of_work, create_pokemons_data)
 
-    return PokemonResponseMapper.entity_to_response(pokemon)
+    return CreatePokemonsResponseMapper.entity_to_response(result)
 
 
-@router.get('/pokemons')
-async def get_pokemons() -> list[PokemonResponse]:
+# registered before `/pokemons/{no}` so "export" isn't matched as a Pokemon number
+@router.get('/pokemons/export', response_class=StreamingResponse)
+async def export_pokemons() -> StreamingResponse:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
-    pokemons = await pokemon_ucase.get_pokemons(async_unit_of_work)
+    lines = (
+        PokemonResponseMapper.entity_to_response(pokemon).model_dump_json() + '\n'
+        async for pokemon in pokemon_ucase.iter_pokemons(async_unit_of_work)
+    )
 
-    return list(map(PokemonResponseMapper.entity_to_response, pokemons))
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
 
 
-@router.patch('/pokemons/{no}')
+@router.get('/pokemons/{no}', response_model=PokemonResponse)
+async def get_pokemon(
+    request: Request,
+    response: Response,
+    no: str = Path(..., description=PokemonNumberStr.__doc__),
+) -> PokemonResponse | Response:
+    no = PokemonNumberStr(no)
+    if is_conditional(request):
+        # answer a matching If-None-Match from the version alone, without loading the Pokemon
+        version = await pokemon_ucase.get_pokemon_version(injector.get(AbstractUnitOfWork), no)
+        ensure_modified(request, build_etag('pokemon', {no: version}))
+
+    async_unit_of_work = injector.get(AbstractUnitOfWork)
+    pokemon = await pokemon_ucase.get_pokemon(async_unit_of_work, no)
+    set_etag(response, build_etag('pokemon', {pokemon.no: pokemon.version}))
+
+    return pokemon_encoder.render(pokemon, response)
+
+
+def decode_cursor_query(
+    cursor: str | None = Query(None, description=f'Opaque `{NEXT_CURSOR_HEADER}` of the previous page'),  # fmt: skip
+) -> PokemonNumberStr | None:
+    """Decode the cursor, rejecting a malformed one as invalid input like any other query."""
+    if cursor is None:
+        return None
+
+    try:
+        return CursorRequestMapper.request_to_entity(cursor)
+    except ValueError as error:
+        raise RequestValidationError(
+            [
+                {
+                    'type': 'value_error',
+                    'loc': ('query', 'cursor'),
+                    'msg': str(error),
+                    'input': cursor,
+                }
+            ]
+        ) from error
+
+
+@router.get('/pokemons', response_model=list[PokemonResponse])
+async def get_pokemons(
+    request: Request,
+    size: int | None = Query(
+        None,
+        ge=1,
+        le=1000,
+        description='Pokemon per page; 100 with only a `cursor`, and all of them without either',
+    ),
+    after_no: PokemonNumberStr | None = Depends(decode_cursor_query),
+) -> Response:
+    # without either, every Pokemon as a single page, as listed before pages existed
+    params = (
+        PokemonRequestMapper.page_query_to_entity(size, after_no)
+        if size is not None or after_no is not None
+        else None
+    )
+    version_page = await pokemon_ucase.get_pokemon_page_versions(
+        injector.get(AbstractUnitOfWork), params
+    )
+    etag = build_etag('pokemons', version_page.versions, version_page.next_no)
+    ensure_modified(request, etag)
+
+    # serve the page as encoded while it was current, skipping validation and serialization
+    key = (params.size, params.after_no) if params is not None else (None, None)
+    if (snapshot := page_snapshots.get_fresh(key, etag)) is None:
+        async_unit_of_work = injector.get(AbstractUnitOfWork)
+        page = await pokemon_ucase.get_pokemon_page(async_unit_of_work, params)
+        headers = {}
+        if next_cursor := CursorResponseMapper.entity_to_response(page.next_no):
+            headers[NEXT_CURSOR_HEADER] = next_cursor
+        snapshot = page_snapshots.store(
+            key,
+            # from the loaded page, which a write may have changed since the version lookup
+            build_etag(
+                'pokemons', {pokemon.no: pokemon.version for pokemon in page.items}, page.next_no
+            ),
+            pokemon_encoder.encode_many(page.items),
+            headers,
+        )
+
+    return snapshot.to_response()
+
+
+@router.patch('/pokemons/{no}', response_model=PokemonResponse)
 async def update_pokemon(
     no: str = Path(..., description=PokemonNumberStr.__doc__),
     body: UpdatePokemonRequest = Body(...),
-) -> PokemonResponse:
+) -> PokemonResponse | Response:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     no = PokemonNumberStr(no)
     update_pokemon_data = PokemonRequestMapper.update_request_to_entity(body)
     update_pokemon_data.validate_no_not_in_evolutions(no)
     updated_pokemon = await pokemon_ucase.update_pokemon(async_unit_of_work, no, update_pokemon_data)  # fmt: skip
 
-    return PokemonResponseMapper.entity_to_response(updated_pokemon)
+    return pokemon_encoder.render(updated_pokemon)
 
 
 @router.delete('/pokemons/{no}', status_code=status.HTTP_204_NO_CONTENT)
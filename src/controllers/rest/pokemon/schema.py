@@ -15,6 +15,10 @@ class CreatePokemonRequest(BaseModel):
     )
 
 
+class CreatePokemonsRequest(BaseModel):
+    items: list[CreatePokemonRequest] = Field(..., min_length=1, max_length=1000)
+
+
 class UpdatePokemonRequest(BaseModel):
     name: str | None = None
     type_names: list[str] | None = None
@@ -44,4 +48,15 @@ class EvolutionResponse(BaseModel):
     name: str
 
 
+class CreatePokemonErrorResponse(BaseModel):
+    index: int = Field(..., description='Position of the rejected item in the request')
+    no: str = Field(..., description=PokemonNumberStr.__doc__)
+    error: str
+
+
+class CreatePokemonsResponse(BaseModel):
+    created: list[PokemonResponse]
+    errors: list[CreatePokemonErrorResponse]
+
+
 PokemonResponse.model_rebuild()
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+
+from fastapi import Response
+
+from common.cache import TTLLRUCache
+from common.type import PokemonNumberStr
+from settings import POKEMON_SNAPSHOT_MAX_SIZE, POKEMON_SNAPSHOT_TTL_SECONDS
+
+from ..etag import ETAG_HEADER
+
+PageKey = tuple[int | None, PokemonNumberStr | None]
+
+
+@dataclass(frozen=True)
+class PageSnapshot:
+    etag: str
+    body: bytes
+    headers: dict[str, str]
+
+    def to_response(self) -> Response:
+        return Response(
+            self.body,
+            media_type='application/json',
+            headers={ETAG_HEADER: self.etag, **self.headers},
+        )
+
+
+class PageSnapshotCache(TTLLRUCache[PageKey, PageSnapshot]):
+    """
+    Already encoded pages of the Pokemon listing, keyed by `(size, after_no)`.
+
+    The unpaged listing of every Pokemon is kept as the page `(None, None)`.
+
+    A snapshot is served only while its ETag still equals the one computed from the current
+    versions, so a write anywhere, by any worker, outdates exactly the pages it touched; those are
+    rebuilt on their next request.
+    """
+
+    def get_fresh(self, key: PageKey, etag: str) -> PageSnapshot | None:
+        if (snapshot := self.get(key)) is None or snapshot.etag != etag:
+            return None
+
+        return snapshot
+
+    def store(self, key: PageKey, etag: str, body: bytes, headers: dict[str, str]) -> PageSnapshot:
+        snapshot = PageSnapshot(etag=etag, body=body, headers=headers)
+        self.set(key, snapshot)
+
+        return snapshot
+
+
+page_snapshots = PageSnapshotCache(
+    max_size=POKEMON_SNAPSHOT_MAX_SIZE, ttl=POKEMON_SNAPSHOT_TTL_SECONDS
+)
@@ -1,11 +1,16 @@
 # pylint: disable=duplicate-code
-from fastapi import APIRouter, Body, Path, status
+from fastapi import APIRouter, Body, Path, Request, Response, status
+from fastapi.responses import StreamingResponse
 
 from common.type import UUIDStr
+from common.utils import NDJSON_MEDIA_TYPE
 from di.dependency_injection import injector
 from di.unit_of_work import AbstractUnitOfWork
+from models.trainer import TrainerModel
 from usecases import trainer as trainer_ucase
 
+from ..etag import build_etag, ensure_modified, is_conditional, set_etag
+from ..serialization import ResponseEncoder
 from .mapper import TrainerRequestMapper, TrainerResponseMapper
 from .schema import (
     CatchPokemonRequest,
@@ -19,44 +24,77 @@ from .schema import (
 
 router = APIRouter()
 
+trainer_encoder = ResponseEncoder(
+    TrainerModel, TrainerResponseMapper.entity_to_response, exclude=['version']
+)
+
 
-@router.post('/trainers', status_code=status.HTTP_201_CREATED)
-async def create_trainer(body: CreateTrainerRequest) -> TrainerResponse:
+@router.post('/trainers', status_code=status.HTTP_201_CREATED, response_model=TrainerResponse)
+async def create_trainer(body: CreateTrainerRequest) -> TrainerResponse | Response:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     create_data = TrainerRequestMapper.create_request_to_entity(body)
     created_trainer = await trainer_ucase.create_trainer(async_unit_of_work, create_data)
 
-    return TrainerResponseMapper.entity_to_response(created_trainer)
+    return trainer_encoder.render(created_trainer, status_code=status.HTTP_201_CREATED)
 
 
-@router.get('/trainers/{id}')
-async def get_trainer(id: str = Path(..., description=UUIDStr.__doc__)) -> TrainerResponse:
+# registered before `/trainers/{id}` so "export" isn't matched as a Trainer id
+@router.get('/trainers/export', response_class=StreamingResponse)
+async def export_trainers() -> StreamingResponse:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
+    lines = (
+        TrainerResponseMapper.entity_to_response(trainer).model_dump_json() + '\n'
+        async for trainer in trainer_ucase.iter_trainers(async_unit_of_work)
+    )
+
+    return StreamingResponse(lines, media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get('/trainers/{id}', response_model=TrainerResponse)
+async def get_trainer(
+    request: Request,
+    response: Response,
+    id: str = Path(..., description=UUIDStr.__doc__),
+) -> TrainerResponse | Response:
     id = UUIDStr(id)
+    if is_conditional(request):
+        # answer a matching If-None-Match from the version alone, without loading the Trainer
+        version = await trainer_ucase.get_trainer_version(injector.get(AbstractUnitOfWork), id)
+        ensure_modified(request, build_etag('trainer', {id: version}))
+
+    async_unit_of_work = injector.get(AbstractUnitOfWork)
     trainer = await trainer_ucase.get_trainer(async_unit_of_work, id)
+    set_etag(response, build_etag('trainer', {trainer.id: trainer.version}))
+
+    return trainer_encoder.render(trainer, response)
 
-    return TrainerResponseMapper.entity_to_response(trainer)
 
+@router.get('/trainers', response_model=list[TrainerResponse])
+async def get_trainers(request: Request, response: Response) -> list[TrainerResponse] | Response:
+    if is_conditional(request):
+        versions = await trainer_ucase.get_trainer_versions(injector.get(AbstractUnitOfWork))
+        ensure_modified(request, build_etag('trainers', versions))
 
-@router.get('/trainers')
-async def get_trainers() -> list[TrainerResponse]:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     trainers = await trainer_ucase.get_trainers(async_unit_of_work)
+    set_etag(
+        response, build_etag('trainers', {trainer.id: trainer.version for trainer in trainers})
+    )
 
-    return list(map(TrainerResponseMapper.entity_to_response, trainers))
+    return trainer_encoder.render_many(trainers, response)
 
 
-@router.patch('/trainers/{id}')
+@router.patch('/trainers/{id}', response_model=TrainerResponse)
 async def update_trainer(
     id: str = Path(..., description=UUIDStr.__doc__),
     body: UpdateTrainerRequest = Body(...),
-) -> TrainerResponse:
+) -> TrainerResponse | Response:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     id = UUIDStr(id)
     update_data = TrainerRequestMapper.update_request_to_entity(body)
     updated_trainer = await trainer_ucase.update_trainer(async_unit_of_work, id, update_data)
 
-    return TrainerResponseMapper.entity_to_response(updated_trainer)
+    return trainer_encoder.render(updated_trainer)
 
 
 @router.delete('/trainers/{id}', status_code=status.HTTP_204_NO_CONTENT)
@@ -66,30 +104,30 @@ async def delete_trainer(id: str = Path(..., description=UUIDStr.__doc__)):
     await trainer_ucase.delete_trainer(async_unit_of_work, id)
 
 
-@router.post('/trainers/{id}/catch')
+@router.post('/trainers/{id}/catch', response_model=TrainerResponse)
 async def catch_pokemon(
     id: str = Path(..., description=UUIDStr.__doc__),
     body: CatchPokemonRequest = Body(...),
-) -> TrainerResponse:
+) -> TrainerResponse | Response:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     id = UUIDStr(id)
     catch_data = TrainerRequestMapper.catch_request_to_entity(body)
     trainer = await trainer_ucase.catch_pokemon(async_unit_of_work, id, catch_data)
 
-    return TrainerResponseMapper.entity_to_response(trainer)
+    return trainer_encoder.render(trainer)
 
 
-@router.post('/trainers/{id}/release')
+@router.post('/trainers/{id}/release', response_model=TrainerResponse)
 async def release_pokemon(
     id: str = Path(..., description=UUIDStr.__doc__),
     body: ReleasePokemonRequest = Body(...),
-) -> TrainerResponse:
+) -> TrainerResponse | Response:
     async_unit_of_work = injector.get(AbstractUnitOfWork)
     id = UUIDStr(id)
     release_data = TrainerRequestMapper.release_request_to_entity(body)
     trainer = await trainer_ucase.release_pokemon(async_unit_of_work, id, release_data)
 
-    return TrainerResponseMapper.entity_to_response(trainer)
+    return trainer_encoder.render(trainer)
 
 
 @router.post('/trainers/trade')
@@ -28,19 +28,73 @@ from injector import Injector, Module, provider, singleton
 from motor.motor_asyncio import AsyncIOMotorCollection
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from repositories.abstraction import AbstractPokemonRepository, AbstractTrainerRepository
+from repositories.cache import (
+    CachedPokemonRepository,
+    CachedTrainerRepository,
+    PokemonCache,
+    SharedCache,
+)
 from repositories.document_db import MongoDBPokemonRepository, MongoDBTrainerRepository
 from repositories.key_value_db import RedisPokemonRepository, RedisTrainerRepository
 from repositories.relational_db import RelationalDBPokemonRepository, RelationalDBTrainerRepository
+from settings import (
+    CACHE_REDIS_TTL_SECONDS,
+    CACHE_REDIS_URI,
+    POKEMON_CACHE_MAX_SIZE,
+    POKEMON_CACHE_TTL_SECONDS,
+)
 from settings.db import IS_DOCUMENT_DB, IS_KEY_VALUE_DB, IS_RELATIONAL_DB
+from settings.db.base import create_async_redis
 
 from .unit_of_work import (
     AbstractUnitOfWork,
     AsyncMotorUnitOfWork,
     AsyncRedisUnitOfWork,
     AsyncSQLAlchemyUnitOfWork,
+    CachedUnitOfWork,
 )
 
 
+class CacheModule(Module):
+    @singleton
+    @provider
+    def provide_pokemon_cache(self) -> PokemonCache:
+        return PokemonCache(max_size=POKEMON_CACHE_MAX_SIZE, ttl=POKEMON_CACHE_TTL_SECONDS)
+
+    @singleton
+    @provider
+    def provide_shared_cache(self) -> SharedCache:
+        client = create_async_redis(CACHE_REDIS_URI) if CACHE_REDIS_URI else None
+        return SharedCache(client, ttl=CACHE_REDIS_TTL_SECONDS)
+
+
+def with_cache(
+    unit_of_work: AbstractUnitOfWork,
+    pokemon_cache: PokemonCache,
+    shared_cache: SharedCache,
+    loaders: tuple[AbstractPokemonRepository, AbstractTrainerRepository] | None = None,
+) -> AbstractUnitOfWork:
+    """Put the configured cache tiers in front of the repositories of `unit_of_work`.
+
+    `loaders` are the Pokemon and Trainer repositories that load the misses, when not those of
+    `unit_of_work`.
+    """
+    if pokemon_cache.max_size <= 0 and not shared_cache.enabled:
+        return unit_of_work
+
+    pokemon_loader, trainer_loader = loaders or (None, None)
+    unit_of_work.pokemon_repo = CachedPokemonRepository(
+        unit_of_work.pokemon_repo, pokemon_cache, shared_cache, pokemon_loader
+    )
+    if shared_cache.enabled:
+        unit_of_work.trainer_repo = CachedTrainerRepository(
+            unit_of_work.trainer_repo, shared_cache, trainer_loader
+        )
+
+    return CachedUnitOfWork(unit_of_work, pokemon_cache, shared_cache)
+
+
 class RelationalDBModule(Module):
     @provider
     def provide_async_session(self) -> AsyncSession:
@@ -70,9 +124,8 @@ class RelationalDBModule(Module):
         ```
         injector.get(AbstractUnitOfWork)
             ├─> provide_async_sqlalchemy_unit_of_work()
-            │     ├─> provide_async_session()         # Returns a session scoped to the current asyncio task
             │     ├─> provide_pokemon_repository()
-            │     │     └─> provide_async_session()   # Reuses the same session instance as above
+            │     │     └─> provide_async_session()   # Returns a session scoped to the current asyncio task
             │     └─> provide_trainer_repository()
             │           └─> provide_async_session()   # Reuses the same session instance as above
         ```
@@ -92,11 +145,37 @@ class RelationalDBModule(Module):
     @provider
     def provide_async_sqlalchemy_unit_of_work(
         self,
-        session: AsyncSession,
         pokemon_repo: RelationalDBPokemonRepository,
         trainer_repo: RelationalDBTrainerRepository,
+        pokemon_cache: PokemonCache,
+        shared_cache: SharedCache,
     ) -> AbstractUnitOfWork:
-        return AsyncSQLAlchemyUnitOfWork(session, pokemon_repo, trainer_repo)
+        from settings.db.replica import replica_set
+
+        def provide_replica_unit_of_work() -> AbstractUnitOfWork:
+            replica_session = replica_set.create_session()
+            replica_unit_of_work = AsyncSQLAlchemyUnitOfWork(
+                replica_session,
+                RelationalDBPokemonRepository(replica_session),
+                RelationalDBTrainerRepository(replica_session),
+            )
+            # replicas may lag behind the writes that invalidated the caches, so the misses are
+            # loaded from the primary; its scoped session is closed with the replica's
+            return with_cache(
+                replica_unit_of_work,
+                pokemon_cache,
+                shared_cache,
+                loaders=(pokemon_repo, trainer_repo),
+            )
+
+        # the repositories share the session scoped to the current asyncio task
+        unit_of_work = AsyncSQLAlchemyUnitOfWork(
+            pokemon_repo.session,
+            pokemon_repo,
+            trainer_repo,
+            replica_factory=provide_replica_unit_of_work if replica_set.engines else None,
+        )
+        return with_cache(unit_of_work, pokemon_cache, shared_cache)
 
 
 class DocumentDBModule(Module):
@@ -131,22 +210,28 @@ class DocumentDBModule(Module):
         self,
         pokemon_repo: MongoDBPokemonRepository,
         trainer_repo: MongoDBTrainerRepository,
+        pokemon_cache: PokemonCache,
+        shared_cache: SharedCache,
     ) -> AbstractUnitOfWork:
         from settings.db.mongodb import AsyncMongoDBEngine
 
-        return AsyncMotorUnitOfWork(AsyncMongoDBEngine, pokemon_repo, trainer_repo)
+        unit_of_work = AsyncMotorUnitOfWork(AsyncMongoDBEngine, pokemon_repo, trainer_repo)
+        return with_cache(unit_of_work, pokemon_cache, shared_cache)
 
 
 class KeyValueDBModule(Module):
     @provider
-    def provide_async_redis_unit_of_work(self) -> AbstractUnitOfWork:
+    def provide_async_redis_unit_of_work(
+        self, pokemon_cache: PokemonCache, shared_cache: SharedCache
+    ) -> AbstractUnitOfWork:
         from settings.db import get_async_client
 
         client = get_async_client()
         pokemon_repo = RedisPokemonRepository(client)
         trainer_repo = RedisTrainerRepository(client)
 
-        return AsyncRedisUnitOfWork(client, pokemon_repo, trainer_repo)
+        unit_of_work = AsyncRedisUnitOfWork(client, pokemon_repo, trainer_repo)
+        return with_cache(unit_of_work, pokemon_cache, shared_cache)
 
 
 class DatabaseModuleFactory:
@@ -161,4 +246,4 @@ class DatabaseModuleFactory:
         raise RuntimeError("Invalid database type configuration. It's neither relational nor NoSQL")
 
 
-injector = Injector([DatabaseModuleFactory().create_module()])
+injector = Injector([CacheModule(), DatabaseModuleFactory().create_module()])
@@ -1,18 +1,53 @@
 import abc
+import asyncio
+import functools
+import random
 from abc import abstractmethod
-from typing import Any
+from typing import Any, Awaitable, Callable, ParamSpec, TypeVar
 
 from motor.motor_asyncio import AsyncIOMotorClient
 from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import WatchError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from repositories.abstraction import AbstractPokemonRepository, AbstractTrainerRepository
-from repositories.document_db import MongoDBPokemonRepository, MongoDBTrainerRepository
-from repositories.key_value_db import RedisPokemonRepository, RedisTrainerRepository
-from repositories.relational_db import RelationalDBPokemonRepository, RelationalDBTrainerRepository
+from repositories.cache import CachedRepository, PokemonCache, SharedCache
+from repositories.document_db import MongoDBTrainerRepository
+from repositories.key_value_db import RedisTransaction
+from repositories.relational_db import RelationalDBTrainerRepository
+from settings import UNIT_OF_WORK_CONFLICT_RETRIES, UNIT_OF_WORK_RETRY_BACKOFF_SECONDS
 
 # pylint: disable=import-outside-toplevel,attribute-defined-outside-init
 
+P = ParamSpec('P')
+R = TypeVar('R')
+
+
+class UnitOfWorkConflict(Exception):
+    """The unit of work didn't commit, as what it read was changed concurrently."""
+
+
+def retry_on_conflict(usecase: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    """Run `usecase` again when its unit of work raises `UnitOfWorkConflict`.
+
+    Attempts are spread out by a random pause that doubles each time, and the conflict of the last
+    one is raised.
+    """
+
+    @functools.wraps(usecase)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        for attempt in range(UNIT_OF_WORK_CONFLICT_RETRIES):
+            try:
+                return await usecase(*args, **kwargs)
+            except UnitOfWorkConflict:
+                await asyncio.sleep(
+                    random.uniform(0, UNIT_OF_WORK_RETRY_BACKOFF_SECONDS * 2**attempt)
+                )
+
+        return await usecase(*args, **kwargs)
+
+    return wrapper
+
 
 class AbstractUnitOfWork(abc.ABC):
     pokemon_repo: AbstractPokemonRepository
@@ -26,21 +61,40 @@ class AbstractUnitOfWork(abc.ABC):
     async def __aexit__(self, exc_type, exc, tb):
         raise NotImplementedError
 
+    def read_only(self) -> 'AbstractUnitOfWork':
+        """Return the unit of work to use instead of this one when nothing will be written.
+
+        It may read from a replica, or skip what only writes need; other backends, and units of
+        work already entered, where reads have to see the writes, return themselves.
+        """
+        return self
+
 
 class AsyncSQLAlchemyUnitOfWork(AbstractUnitOfWork):
     def __init__(
         self,
         session: AsyncSession,
-        pokemon_repo: RelationalDBPokemonRepository,
+        pokemon_repo: AbstractPokemonRepository,
         trainer_repo: RelationalDBTrainerRepository,
+        replica_factory: Callable[[], AbstractUnitOfWork] | None = None,
     ):
         self.pokemon_repo = pokemon_repo
         self.trainer_repo = trainer_repo
         self._session = session
+        self._replica_factory = replica_factory
+        self._entered = False
 
     async def __aenter__(self):
+        self._entered = True
         return self
 
+    def read_only(self) -> AbstractUnitOfWork:
+        if self._replica_factory is None or self._entered:
+            return self
+
+        # the replica's unit of work closes it, and removes this task's scoped session on exit
+        return self._replica_factory()
+
     async def __aexit__(
         self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: Any
     ):
@@ -64,7 +118,7 @@ class AsyncMotorUnitOfWork(AbstractUnitOfWork):
     def __init__(
         self,
         engine: AsyncIOMotorClient,  # pyright: ignore[reportInvalidTypeForm]
-        pokemon_repo: MongoDBPokemonRepository,
+        pokemon_repo: AbstractPokemonRepository,
         trainer_repo: MongoDBTrainerRepository,
     ):
         self.pokemon_repo = pokemon_repo
@@ -93,31 +147,107 @@ class AsyncMotorUnitOfWork(AbstractUnitOfWork):
 
 class AsyncRedisUnitOfWork(AbstractUnitOfWork):
     """
-    This implementation does not support transactions.
-
-    If transaction-like behavior is required, compensating actions must be implemented manually.
-
-    Compensating actions are a series of operations that revert the effects of the preceding operations
-    in case of failure, ensuring data consistency.
+    Sends the writes of the repositories in a single MULTI/EXEC when the unit of work exits.
 
-    For more information, see: https://en.wikipedia.org/wiki/Compensating_transaction
+    The keys they read are WATCHed, so the commit is aborted with `UnitOfWorkConflict`, and nothing
+    is written, when another client changed any of them meanwhile; see `retry_on_conflict`. Reads
+    go through the WATCHing connection, the only one the unit of work holds, and are refused once
+    writes are queued: usecases read everything they need first, and build what they return from
+    what the writes return.
     """
 
     def __init__(
         self,
         client: AsyncRedis,
-        pokemon_repo: RedisPokemonRepository,
-        trainer_repo: RedisTrainerRepository,
+        pokemon_repo: AbstractPokemonRepository,
+        trainer_repo: AbstractTrainerRepository,
+        transactional: bool = True,
     ):
-        self._client = client
         self.pokemon_repo = pokemon_repo
         self.trainer_repo = trainer_repo
+        self._client = client
+        self._transactional = transactional
+        self._entered = False
+
+    async def __aenter__(self):
+        self._entered = True
+        if self._transactional:
+            self._transaction = RedisTransaction(self._client)
+            self.pokemon_repo.transaction = self._transaction
+            self.trainer_repo.transaction = self._transaction
+
+        return self
+
+    def read_only(self) -> AbstractUnitOfWork:
+        if not self._transactional or self._entered:
+            return self
+
+        # nothing to WATCH, nor to hold a connection for
+        return AsyncRedisUnitOfWork(
+            self._client, self.pokemon_repo, self.trainer_repo, transactional=False
+        )
+
+    async def __aexit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: Any
+    ):
+        if not self._transactional:
+            return
+
+        self.pokemon_repo.transaction = None
+        self.trainer_repo.transaction = None
+        try:
+            if exc_type is None:
+                await self._transaction.commit()
+                return
+
+            await self._transaction.discard()
+        except WatchError as error:
+            raise UnitOfWorkConflict('Keys read on Redis changed before the commit') from error
+
+
+class CachedUnitOfWork(AbstractUnitOfWork):
+    """
+    Wraps a unit of work whose repositories are cached and broadcasts what they outdated.
+
+    Only after the wrapped unit of work has committed are the pending tags of its cached
+    repositories evicted from this worker's `PokemonCache` (again, in case another request reloaded
+    them meanwhile) and published through the `SharedCache` to every other worker.
+    """
+
+    def __init__(
+        self,
+        unit_of_work: AbstractUnitOfWork,
+        pokemon_cache: PokemonCache,
+        shared_cache: SharedCache,
+    ):
+        self.pokemon_repo = unit_of_work.pokemon_repo
+        self.trainer_repo = unit_of_work.trainer_repo
+        self._unit_of_work = unit_of_work
+        self._pokemon_cache = pokemon_cache
+        self._shared_cache = shared_cache
 
     async def __aenter__(self):
+        await self._unit_of_work.__aenter__()
         return self
 
+    def read_only(self) -> AbstractUnitOfWork:
+        # a replica's unit of work comes with its own cached repositories
+        unit_of_work = self._unit_of_work.read_only()
+        return self if unit_of_work is self._unit_of_work else unit_of_work
+
     async def __aexit__(
         self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: Any
-    ) -> None:
-        # Not supported yet, see https://github.com/python/typeshed/blob/main/stubs/redis/redis/asyncio/client.pyi#L27
-        await self._client.aclose()  # type: ignore
+    ):
+        await self._unit_of_work.__aexit__(exc_type, exc, tb)
+        if exc_type is not None:
+            return
+
+        tags = []
+        for repo in (self.pokemon_repo, self.trainer_repo):
+            if isinstance(repo, CachedRepository):
+                tags.extend(repo.pending_tags)
+                repo.pending_tags.clear()
+
+        self._pokemon_cache.invalidate_tags(tags)
+        if self._shared_cache.enabled:
+            await self._shared_cache.invalidate(tags)
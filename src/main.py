@@ -1,4 +1,6 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Any
 
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
@@ -7,9 +9,16 @@ from controllers.graphql.extension import customize_graphql_openapi
 from controllers.graphql.router import router as graphql_router
 from controllers.rest.extension import add_exception_handlers as add_rest_exception_handlers
 from controllers.rest.pokemon.router import router as pokemon_rest_router
+from controllers.rest.pokemon.snapshot import page_snapshots as pokemon_page_snapshots
 from controllers.rest.trainer.router import router as trainer_rest_router
-from settings import APP_NAME, APP_VERSION
-from settings.db import IS_RELATIONAL_DB, initialize_db
+from di.dependency_injection import injector
+from di.unit_of_work import AbstractUnitOfWork
+from models.pokemon import GetPokemonParamsModel
+from repositories.cache import PokemonCache, SharedCache
+from settings import APP_NAME, APP_VERSION, POKEMON_CACHE_WARMUP_SIZE
+from settings.db import IS_KEY_VALUE_DB, IS_RELATIONAL_DB, initialize_db
+from settings.db.base import get_redis_pool_stats
+from usecases import pokemon as pokemon_ucase
 
 
 # https://fastapi.tiangolo.com/advanced/events/#lifespan
@@ -17,17 +26,60 @@ from settings.db import IS_RELATIONAL_DB, initialize_db
 async def lifespan(app: FastAPI):  # pylint: disable=redefined-outer-name
     # pylint: disable=import-outside-toplevel
 
-    kwargs = {}
+    kwargs: dict[str, Any] = {}
     if IS_RELATIONAL_DB:
         from repositories.relational_db import Base
 
         kwargs = {'declarative_base': Base}
+    elif IS_KEY_VALUE_DB:
+        from repositories.key_value_db import SCRIPTS
+
+        kwargs = {'scripts': SCRIPTS}
 
     await initialize_db(**kwargs)
+
+    # evict what other workers outdated from this worker's in-process cache
+    shared_cache = injector.get(SharedCache)
+    listener = None
+    if shared_cache.enabled:
+        pokemon_cache = injector.get(PokemonCache)
+        listener = asyncio.create_task(
+            shared_cache.listen(pokemon_cache.invalidate_tags, on_reconnect=pokemon_cache.clear)
+        )
+
+    await warm_up()
+    app.state.ready = True
     yield
+    app.state.ready = False
+
+    if listener is not None:
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+
+
+async def warm_up():
+    """Open the connections and fill the caches that the first requests would otherwise wait for."""
+    # pylint: disable=import-outside-toplevel
+
+    if IS_RELATIONAL_DB:
+        from settings.db import AsyncRelationalDBEngine
+        from settings.db.pool import warm_up_pool
+        from settings.db.replica import replica_set
+
+        for async_engine in (AsyncRelationalDBEngine, *replica_set.engines):
+            await warm_up_pool(async_engine)
+
+    if POKEMON_CACHE_WARMUP_SIZE > 0:
+        page = await pokemon_ucase.get_pokemon_page_versions(
+            injector.get(AbstractUnitOfWork), GetPokemonParamsModel(size=POKEMON_CACHE_WARMUP_SIZE)
+        )
+        await pokemon_ucase.get_pokemon_map(injector.get(AbstractUnitOfWork), list(page.versions))
 
 
 app = FastAPI(title=APP_NAME, version=APP_VERSION, lifespan=lifespan)
+# set once the startup, warm-up included, is done, and cleared again at shutdown
+app.state.ready = False
 
 # controllers/rest
 app.include_router(pokemon_rest_router, tags=['REST - Pokemon'])
@@ -49,3 +101,37 @@ async def universal_exception_handler(_, exc):
 @app.get('/', include_in_schema=False)
 async def root():
     return JSONResponse({'service': APP_NAME, 'version': APP_VERSION})
+
+
+@app.get('/ready', include_in_schema=False)
+async def ready():
+    if not app.state.ready:
+        return JSONResponse({'ready': False}, status_code=503)
+
+    return JSONResponse({'ready': True})
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics():
+    # pylint: disable=import-outside-toplevel
+
+    stats: dict[str, Any] = {
+        'pokemon_cache': injector.get(PokemonCache).stats(),
+        'pokemon_page_snapshots': pokemon_page_snapshots.stats(),
+    }
+    if IS_RELATIONAL_DB:
+        from settings.db import AsyncRelationalDBEngine
+        from settings.db.pool import get_pool_stats
+        from settings.db.replica import replica_set
+
+        stats['database_pool'] = get_pool_stats(AsyncRelationalDBEngine)
+        stats['database_replica_pools'] = list(map(get_pool_stats, replica_set.engines))
+    elif IS_KEY_VALUE_DB:
+        from settings.db.redis import async_redis
+
+        stats['redis_pool'] = get_redis_pool_stats(async_redis)
+
+    if (cache_client := injector.get(SharedCache).client) is not None:
+        stats['cache_redis_pool'] = get_redis_pool_stats(cache_client)
+
+    return JSONResponse(stats)
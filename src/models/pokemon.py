@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
+from operator import attrgetter
 
 from common.type import PokemonNumberStr, UUIDStr
+from models.exception import PokemonError
 
 
 @dataclass
@@ -10,13 +12,13 @@ class GetTypeParamsModel:
     pokemon_numbers: list[str] | None = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TypeModel:
     id: UUIDStr
     name: str
 
 
-@dataclass
+@dataclass(slots=True)
 class PokemonEvolutionModel:
     no: PokemonNumberStr
     name: str
@@ -24,8 +26,19 @@ class PokemonEvolutionModel:
 
 @dataclass
 class GetPokemonParamsModel:
-    page: int = 1
     size: int = 100
+    after_no: PokemonNumberStr | None = None
+
+
+@dataclass(frozen=True)
+class PokemonIncludeModel:
+    types: bool = True
+    previous_evolutions: bool = True
+    next_evolutions: bool = True
+
+    @classmethod
+    def without_relations(cls) -> 'PokemonIncludeModel':
+        return cls(types=False, previous_evolutions=False, next_evolutions=False)
 
 
 @dataclass
@@ -43,6 +56,12 @@ class CreatePokemonModel:
         if self.no in (self.previous_evolution_numbers + self.next_evolution_numbers):
             raise ValueError('Pokemon number cannot be the same as any of its evolution numbers')
 
+    def evolution_pairs(self) -> list[tuple[PokemonNumberStr, PokemonNumberStr]]:
+        """Return `(previous_no, next_no)` pairs for both evolution directions."""
+        return [(no, self.no) for no in self.previous_evolution_numbers] + [
+            (self.no, no) for no in self.next_evolution_numbers
+        ]
+
 
 @dataclass
 class UpdatePokemonModel:
@@ -56,10 +75,131 @@ class UpdatePokemonModel:
             raise ValueError('Pokemon number cannot be the same as any of its evolution numbers')
 
 
-@dataclass
+@dataclass(slots=True)
 class PokemonModel:
     no: PokemonNumberStr
     name: str
     types: list[TypeModel] = field(default_factory=list)
     previous_evolutions: list[PokemonEvolutionModel] = field(default_factory=list)
     next_evolutions: list[PokemonEvolutionModel] = field(default_factory=list)
+    version: int = 1
+
+
+@dataclass
+class PokemonAggregateModel:
+    """
+    What a create or an update writes about one Pokemon, all at once with `upsert_aggregate`.
+
+    Fields left as `None` keep their current value; a new Pokemon sets them all. Evolutions come
+    with the names they were loaded with when checked to exist, ordered by number.
+    """
+
+    no: PokemonNumberStr
+    name: str | None = None
+    type_names: list[str] | None = None
+    previous_evolutions: list[PokemonEvolutionModel] | None = None
+    next_evolutions: list[PokemonEvolutionModel] | None = None
+    is_new: bool = False
+
+    @classmethod
+    def for_create(
+        cls, data: CreatePokemonModel, evolutions: dict[PokemonNumberStr, PokemonEvolutionModel]
+    ) -> 'PokemonAggregateModel':
+        return cls(
+            no=data.no,
+            name=data.name,
+            type_names=list(dict.fromkeys(data.type_names)),
+            previous_evolutions=_pick_evolutions(evolutions, data.previous_evolution_numbers),
+            next_evolutions=_pick_evolutions(evolutions, data.next_evolution_numbers),
+            is_new=True,
+        )
+
+    @classmethod
+    def for_update(
+        cls,
+        no: PokemonNumberStr,
+        data: UpdatePokemonModel,
+        evolutions: dict[PokemonNumberStr, PokemonEvolutionModel],
+    ) -> 'PokemonAggregateModel':
+        return cls(
+            no=no,
+            name=data.name,
+            type_names=(
+                list(dict.fromkeys(data.type_names)) if data.type_names is not None else None
+            ),
+            previous_evolutions=(
+                _pick_evolutions(evolutions, data.previous_evolution_numbers)
+                if data.previous_evolution_numbers is not None
+                else None
+            ),
+            next_evolutions=(
+                _pick_evolutions(evolutions, data.next_evolution_numbers)
+                if data.next_evolution_numbers is not None
+                else None
+            ),
+        )
+
+    @property
+    def evolution_numbers(self) -> list[PokemonNumberStr]:
+        """Numbers of the evolutions written, on both sides."""
+        return [evo.no for evo in (self.previous_evolutions or []) + (self.next_evolutions or [])]
+
+    @property
+    def kept_relations(self) -> PokemonIncludeModel:
+        """The relations left as they are, to load along with the Pokemon being updated."""
+        return PokemonIncludeModel(
+            types=self.type_names is None,
+            previous_evolutions=self.previous_evolutions is None,
+            next_evolutions=self.next_evolutions is None,
+        )
+
+    def apply_to(
+        self, pokemon: PokemonModel | None, types: list[TypeModel] | None, version: int
+    ) -> PokemonModel:
+        """Return the Pokemon as written, from the one updated (`None` if new) and types written."""
+        pokemon = pokemon or PokemonModel(no=self.no, name='')
+        return PokemonModel(
+            no=self.no,
+            name=pokemon.name if self.name is None else self.name,
+            types=pokemon.types if types is None else types,
+            previous_evolutions=(
+                pokemon.previous_evolutions
+                if self.previous_evolutions is None
+                else self.previous_evolutions
+            ),
+            next_evolutions=(
+                pokemon.next_evolutions if self.next_evolutions is None else self.next_evolutions
+            ),
+            version=version,
+        )
+
+
+def _pick_evolutions(
+    evolutions: dict[PokemonNumberStr, PokemonEvolutionModel], numbers: list[PokemonNumberStr]
+) -> list[PokemonEvolutionModel]:
+    return sorted((evolutions[no] for no in dict.fromkeys(numbers)), key=attrgetter('no'))
+
+
+@dataclass
+class PokemonPageModel:
+    items: list[PokemonModel]
+    next_no: PokemonNumberStr | None = None
+
+
+@dataclass
+class PokemonVersionPageModel:
+    versions: dict[PokemonNumberStr, int]
+    next_no: PokemonNumberStr | None = None
+
+
+@dataclass
+class CreatePokemonErrorModel:
+    index: int
+    no: PokemonNumberStr
+    error: PokemonError
+
+
+@dataclass
+class CreatePokemonsResultModel:
+    created: list[PokemonModel] = field(default_factory=list)
+    errors: list[CreatePokemonErrorModel] = field(default_factory=list)
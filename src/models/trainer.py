@@ -1,23 +1,26 @@
+from bisect import insort
 from dataclasses import dataclass, field
+from operator import attrgetter
 
 from common.type import PokemonNumberStr, UUIDStr
 
 MAX_TEAM_SIZE = 6
 
 
-@dataclass
+@dataclass(slots=True)
 class TrainerPokemonModel:
     no: PokemonNumberStr
     name: str
 
 
-@dataclass
+@dataclass(slots=True)
 class TrainerModel:
     id: UUIDStr
     name: str
     region: str
     badge_count: int
     team: list[TrainerPokemonModel] = field(default_factory=list)
+    version: int = 1
 
     @property
     def is_team_full(self) -> bool:
@@ -26,6 +29,19 @@ class TrainerModel:
     def has_pokemon(self, pokemon_no: PokemonNumberStr) -> bool:
         return any(p.no == pokemon_no for p in self.team)
 
+    def add_to_team(self, pokemon: TrainerPokemonModel):
+        # teams are loaded ordered by number
+        insort(self.team, pokemon, key=attrgetter('no'))
+
+    def remove_from_team(self, pokemon_no: PokemonNumberStr) -> TrainerPokemonModel:
+        index = next(i for i, p in enumerate(self.team) if p.no == pokemon_no)
+        return self.team.pop(index)
+
+
+@dataclass(frozen=True)
+class TrainerIncludeModel:
+    team: bool = True
+
 
 @dataclass
 class CreateTrainerModel:
@@ -1,55 +1,92 @@
 # pylint: disable=duplicate-code
 import abc
-from typing import Any, List
+from typing import Any, AsyncIterator, Dict, List
 
 from common.type import PokemonNumberStr
 from models.pokemon import (
     CreatePokemonModel,
     GetPokemonParamsModel,
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
     PokemonModel,
-    UpdatePokemonModel,
 )
 
 
 class AbstractPokemonRepository(abc.ABC):
     session: Any
+    transaction: Any
 
     @abc.abstractmethod
-    async def get(self, no: PokemonNumberStr) -> PokemonModel:
+    async def get(
+        self, no: PokemonNumberStr, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def list(self, params: GetPokemonParamsModel | None = None) -> List[PokemonModel]:
+    async def list(
+        self,
+        params: GetPokemonParamsModel | None = None,
+        include: PokemonIncludeModel = PokemonIncludeModel(),
+    ) -> List[PokemonModel]:
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def create(self, data: CreatePokemonModel) -> PokemonNumberStr:
+    async def get_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> Dict[PokemonNumberStr, PokemonModel]:
+        """Load several Pokemon in one backend call; numbers that don't exist are left out."""
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def update(self, no: PokemonNumberStr, data: UpdatePokemonModel):
+    async def iter_all(
+        self, include: PokemonIncludeModel = PokemonIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[PokemonModel]:
+        """Yield every Pokemon ordered by number, holding at most `chunk_size` in memory."""
         raise NotImplementedError
+        # an async generator, like the implementations overriding it
+        yield  # pylint: disable=unreachable
 
     @abc.abstractmethod
-    async def delete(self, no: PokemonNumberStr):
+    async def get_version(self, no: PokemonNumberStr) -> int:
+        """Return the Pokemon's version without loading it.
+
+        Every write that changes how the Pokemon is shown increments it, including renames and
+        deletions of the evolutions whose names it embeds.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def are_existed(self, numbers: List[PokemonNumberStr]) -> bool:
+    async def list_versions(
+        self, params: GetPokemonParamsModel | None = None
+    ) -> Dict[PokemonNumberStr, int]:
+        """Return the versions of the Pokemon `list` would load, ordered by number."""
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def replace_types(self, pokemon_no: PokemonNumberStr, type_names: List[str]):
+    async def bulk_create(
+        self,
+        data: List[CreatePokemonModel],
+        evolutions: Dict[PokemonNumberStr, PokemonEvolutionModel],
+    ) -> List[PokemonModel]:
+        """Create Pokemon with their types and evolutions in a fixed number of backend calls.
+
+        Callers validate beforehand: numbers are new and unique, and every evolution number
+        either exists or is part of `data`. `evolutions` names all of them, to return the created
+        Pokemon with.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def replace_previous_evolutions(
-        self, pokemon_no: PokemonNumberStr, previous_evolution_numbers: List[PokemonNumberStr]
-    ):
+    async def upsert_aggregate(self, aggregate: PokemonAggregateModel) -> PokemonModel:
+        """Write the Pokemon with its types and evolutions at once, and return it as written.
+
+        A new Pokemon is created, raising `PokemonAlreadyExists` if its number is taken; otherwise
+        it is updated, raising `PokemonNotFound` if it doesn't exist, and its version incremented
+        once. The Pokemon on the other side of each evolution added, removed or renamed are touched.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def replace_next_evolutions(
-        self, pokemon_no: PokemonNumberStr, next_evolution_numbers: List[PokemonNumberStr]
-    ):
+    async def delete(self, no: PokemonNumberStr):
         raise NotImplementedError
@@ -1,32 +1,76 @@
 # pylint: disable=duplicate-code
 import abc
-from typing import Any, List
+from typing import Any, AsyncIterator, Dict, List
 
 from common.type import PokemonNumberStr, UUIDStr
 from models.trainer import (
     CreateTrainerModel,
+    TrainerIncludeModel,
     TrainerModel,
+    TrainerPokemonModel,
     UpdateTrainerModel,
 )
 
 
 class AbstractTrainerRepository(abc.ABC):
     session: Any
+    transaction: Any
 
     @abc.abstractmethod
-    async def get(self, id: UUIDStr) -> TrainerModel:
+    async def get(
+        self, id: UUIDStr, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerModel:
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def list(self) -> List[TrainerModel]:
+    async def get_many(
+        self, ids: List[UUIDStr], include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> Dict[UUIDStr, TrainerModel]:
+        """Load several Trainers in one backend call; ids that don't exist are left out."""
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def create(self, data: CreateTrainerModel) -> UUIDStr:
+    async def list(
+        self, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> List[TrainerModel]:
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def update(self, id: UUIDStr, data: UpdateTrainerModel):
+    async def iter_all(
+        self, include: TrainerIncludeModel = TrainerIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[TrainerModel]:
+        """Yield every Trainer in backend order, holding at most `chunk_size` in memory."""
+        raise NotImplementedError
+        # an async generator, like the implementations overriding it
+        yield  # pylint: disable=unreachable
+
+    @abc.abstractmethod
+    async def get_teams(self, ids: List[UUIDStr]) -> Dict[UUIDStr, List[TrainerPokemonModel]]:
+        """Load the teams of several Trainers in one backend call, keyed by Trainer id."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def get_version(self, id: UUIDStr) -> int:
+        """Return the Trainer's version without loading it.
+
+        Every write that changes how the Trainer is shown increments it, including changes to the
+        Pokemon of its team.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def list_versions(self) -> Dict[UUIDStr, int]:
+        """Return the versions of all Trainers, ordered by id."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def create(self, data: CreateTrainerModel) -> TrainerModel:
+        """Create the Trainer and return it as written."""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def update(self, id: UUIDStr, data: UpdateTrainerModel) -> int:
+        """Set the fields given in `data` and return the Trainer's new version."""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -34,13 +78,30 @@ class AbstractTrainerRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
+    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr) -> TrainerModel:
+        """Add the Pokemon to the Trainer's team and return the Trainer as written.
+
+        The backend checks the team atomically with the write, raising `TrainerAlreadyOwnsPokemon`
+        or `TrainerTeamFullError` rather than letting concurrent catches exceed `MAX_TEAM_SIZE`.
+        The returned team and version are those the write produced, not those read before it.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
-    async def remove_from_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
+    async def remove_from_team(
+        self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr
+    ) -> TrainerModel:
+        """Remove the Pokemon from the Trainer's team and return the Trainer as written.
+
+        Raises `TrainerDoesNotOwnPokemon`, leaving the version as is, when the team doesn't hold it.
+        """
         raise NotImplementedError
 
     @abc.abstractmethod
     async def remove_pokemon_from_all_teams(self, pokemon_no: PokemonNumberStr):
         raise NotImplementedError
+
+    @abc.abstractmethod
+    async def touch_pokemon_owners(self, pokemon_no: PokemonNumberStr):
+        """Increment the version of every Trainer whose team shows the Pokemon."""
+        raise NotImplementedError
@@ -0,0 +1,4 @@
+from .base import CachedRepository
+from .pokemon import CachedPokemonRepository, PokemonCache
+from .shared import SharedCache, SharedCacheCodec
+from .trainer import CachedTrainerRepository
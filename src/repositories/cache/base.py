@@ -0,0 +1,61 @@
+from dataclasses import astuple
+from typing import Any, Iterable
+
+from .shared import SharedCache
+
+POKEMON_KIND = 'POKEMON'
+TRAINER_KIND = 'TRAINER'
+
+
+def build_tag(kind: str, id: str) -> str:
+    return f'{kind}:{id}'
+
+
+def build_variant(include: Any) -> str:
+    """Encode an include model such as `PokemonIncludeModel` as e.g. `'101'`."""
+    return ''.join('1' if value else '0' for value in astuple(include))
+
+
+class CachedRepository:
+    """
+    Bookkeeping shared by the caching repository decorators.
+
+    Writes record the tags they outdate in `pending_tags`; the unit of work broadcasts them once
+    it has committed. After the first write, reads go straight to the wrapped repository so that
+    uncommitted state of the unit of work is never cached; so do reads in a Redis transaction,
+    which must be WATCHed to guard its writes.
+
+    Misses are loaded with `loader`, the wrapped repository unless given: in front of a lagging
+    read replica, it is the primary's, so that the caches only ever store what was committed.
+    """
+
+    def __init__(self, repository: Any, shared_cache: SharedCache, loader: Any = None):
+        self.repository = repository
+        self.shared_cache = shared_cache
+        self.loader = loader if loader is not None else repository
+        self.pending_tags: set[str] = set()
+        self._has_written = False
+
+    @property
+    def session(self) -> Any:
+        return self.repository.session
+
+    @session.setter
+    def session(self, value: Any):
+        self.repository.session = value
+
+    @property
+    def transaction(self) -> Any:
+        return self.repository.transaction
+
+    @transaction.setter
+    def transaction(self, value: Any):
+        self.repository.transaction = value
+
+    @property
+    def _bypasses_cache(self) -> bool:
+        return self._has_written or getattr(self.repository, 'transaction', None) is not None
+
+    def _invalidate(self, tags: Iterable[str]):
+        self._has_written = True
+        self.pending_tags.update(tags)
@@ -0,0 +1,54 @@
+from dataclasses import asdict
+
+from common.docstring import MAPPER_DOCSTRING
+from common.type import PokemonNumberStr, UUIDStr
+from models.pokemon import PokemonEvolutionModel, PokemonModel, TypeModel
+from models.trainer import TrainerModel, TrainerPokemonModel
+
+__doc__ = MAPPER_DOCSTRING
+
+
+class PokemonCacheMapper:
+    @staticmethod
+    def entity_to_dict(instance: PokemonModel) -> dict:
+        return asdict(instance)
+
+    @staticmethod
+    def dict_to_entity(value: dict) -> PokemonModel:
+        return PokemonModel(
+            no=PokemonNumberStr.from_trusted(value['no']),
+            name=value['name'],
+            types=[
+                TypeModel(id=UUIDStr.from_trusted(type_['id']), name=type_['name'])
+                for type_ in value['types']
+            ],
+            previous_evolutions=[
+                PokemonEvolutionModel(no=PokemonNumberStr.from_trusted(evo['no']), name=evo['name'])
+                for evo in value['previous_evolutions']
+            ],
+            next_evolutions=[
+                PokemonEvolutionModel(no=PokemonNumberStr.from_trusted(evo['no']), name=evo['name'])
+                for evo in value['next_evolutions']
+            ],
+            version=value['version'],
+        )
+
+
+class TrainerCacheMapper:
+    @staticmethod
+    def entity_to_dict(instance: TrainerModel) -> dict:
+        return asdict(instance)
+
+    @staticmethod
+    def dict_to_entity(value: dict) -> TrainerModel:
+        return TrainerModel(
+            id=UUIDStr.from_trusted(value['id']),
+            name=value['name'],
+            region=value['region'],
+            badge_count=value['badge_count'],
+            team=[
+                TrainerPokemonModel(no=PokemonNumberStr.from_trusted(tp['no']), name=tp['name'])
+                for tp in value['team']
+            ],
+            version=value['version'],
+        )
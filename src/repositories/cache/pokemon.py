@@ -0,0 +1,155 @@
+from typing import AsyncIterator, Dict, List
+
+from common.cache import TTLLRUCache
+from common.type import PokemonNumberStr
+from models.exception import PokemonNotFound
+from models.pokemon import (
+    CreatePokemonModel,
+    GetPokemonParamsModel,
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
+    PokemonModel,
+)
+
+from ..abstraction import AbstractPokemonRepository
+from .base import POKEMON_KIND, CachedRepository, build_tag, build_variant
+from .mapper import PokemonCacheMapper
+from .shared import SharedCache, SharedCacheCodec
+
+PokemonCacheKey = tuple[PokemonNumberStr, PokemonIncludeModel]
+
+
+class PokemonCache(TTLLRUCache[PokemonCacheKey, PokemonModel]):
+    """Process-wide cache of Pokemon reads, tagged by the entities each entry depends on."""
+
+    def invalidate_tags(self, tags: List[str]):
+        for tag in tags:
+            self.invalidate_tag(tag)
+
+
+class CachedPokemonRepository(CachedRepository, AbstractPokemonRepository):
+    """
+    Read-through cache in front of another Pokemon repository.
+
+    `get` and `get_many` are served per `(no, include)` from the in-process `PokemonCache`, then
+    from the `SharedCache` in Redis when one is configured. An entry is tagged with its own number
+    and with the numbers of the evolutions it embeds, so a write to one Pokemon also evicts the
+    neighbours that show its name.
+
+    Writes evict the in-process entries right away and again after the commit, when the shared
+    cache broadcasts them to the other workers. Cached models are shared between requests and
+    must not be mutated.
+    """
+
+    def __init__(
+        self,
+        repository: AbstractPokemonRepository,
+        cache: PokemonCache,
+        shared_cache: SharedCache,
+        loader: AbstractPokemonRepository | None = None,
+    ):
+        super().__init__(repository, shared_cache, loader)
+        self.cache = cache
+
+    def _build_tags(self, pokemon: PokemonModel) -> set[str]:
+        evolutions = pokemon.previous_evolutions + pokemon.next_evolutions
+        return {build_tag(POKEMON_KIND, no) for no in [pokemon.no, *(evo.no for evo in evolutions)]}
+
+    def _store(self, pokemon: PokemonModel, include: PokemonIncludeModel):
+        self.cache.set((pokemon.no, include), pokemon, self._build_tags(pokemon))
+
+    def _invalidate_numbers(self, numbers: List[PokemonNumberStr]):
+        tags = [build_tag(POKEMON_KIND, no) for no in numbers]
+        self.cache.invalidate_tags(tags)
+        self._invalidate(tags)
+
+    async def _load_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel
+    ) -> Dict[PokemonNumberStr, PokemonModel]:
+        if not self.shared_cache.enabled:
+            return await self.loader.get_many(numbers, include)
+
+        return await self.shared_cache.get_or_load(
+            SharedCacheCodec(
+                POKEMON_KIND,
+                dump=PokemonCacheMapper.entity_to_dict,
+                parse=PokemonCacheMapper.dict_to_entity,
+                tags_of=self._build_tags,
+            ),
+            numbers,
+            build_variant(include),
+            load=lambda missing: self.loader.get_many(missing, include),
+        )
+
+    async def get(
+        self, no: PokemonNumberStr, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
+        if self._bypasses_cache:
+            return await self.repository.get(no, include)
+
+        if (pokemon := self.cache.get((no, include))) is None:
+            if (pokemon := (await self._load_many([no], include)).get(no)) is None:
+                raise PokemonNotFound(no)
+            self._store(pokemon, include)
+
+        return pokemon
+
+    async def list(
+        self,
+        params: GetPokemonParamsModel | None = None,
+        include: PokemonIncludeModel = PokemonIncludeModel(),
+    ) -> List[PokemonModel]:
+        return await self.repository.list(params, include)
+
+    async def get_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> Dict[PokemonNumberStr, PokemonModel]:
+        if self._bypasses_cache:
+            return await self.repository.get_many(numbers, include)
+
+        found, missing = {}, []
+        for no in dict.fromkeys(numbers):
+            if (pokemon := self.cache.get((no, include))) is not None:
+                found[no] = pokemon
+            else:
+                missing.append(no)
+
+        if missing:
+            loaded = await self._load_many(missing, include)
+            for pokemon in loaded.values():
+                self._store(pokemon, include)
+            found.update(loaded)
+
+        return dict(sorted(found.items()))
+
+    async def iter_all(
+        self, include: PokemonIncludeModel = PokemonIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[PokemonModel]:
+        async for pokemon in self.repository.iter_all(include, chunk_size):
+            yield pokemon
+
+    async def get_version(self, no: PokemonNumberStr) -> int:
+        return await self.repository.get_version(no)
+
+    async def list_versions(
+        self, params: GetPokemonParamsModel | None = None
+    ) -> Dict[PokemonNumberStr, int]:
+        return await self.repository.list_versions(params)
+
+    async def bulk_create(
+        self,
+        data: List[CreatePokemonModel],
+        evolutions: Dict[PokemonNumberStr, PokemonEvolutionModel],
+    ) -> List[PokemonModel]:
+        evolution_numbers = [no for item in data for pair in item.evolution_pairs() for no in pair]
+        self._invalidate_numbers([*(item.no for item in data), *evolution_numbers])
+        return await self.repository.bulk_create(data, evolutions)
+
+    async def upsert_aggregate(self, aggregate: PokemonAggregateModel) -> PokemonModel:
+        self._invalidate_numbers([aggregate.no, *aggregate.evolution_numbers])
+        return await self.repository.upsert_aggregate(aggregate)
+
+    async def delete(self, no: PokemonNumberStr):
+        self._invalidate_numbers([no])
+        await self.repository.delete(no)
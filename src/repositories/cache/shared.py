@@ -0,0 +1,214 @@
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Iterable, List, Set, TypeVar
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import LockError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+T = TypeVar('T')
+# e.g. a Pokemon number or a Trainer id
+K = TypeVar('K', bound=str)
+
+
+@dataclass(frozen=True)
+class SharedCacheCodec(Generic[T]):
+    """How entities of one kind are stored in the `SharedCache`.
+
+    Attributes:
+        kind: Entity kind, e.g. `POKEMON`; `{kind}:{id}` is the entity's own tag.
+        dump: Converts a loaded entity into a JSON-compatible value.
+        parse: Converts a cached value back into an entity.
+        tags_of: Returns the tags of other entities whose data the entity embeds.
+    """
+
+    kind: str
+    dump: Callable[[T], Any]
+    parse: Callable[[Any], T]
+    tags_of: Callable[[T], Set[str]]
+
+
+class SharedCache:
+    """
+    Second-level cache shared by every worker through Redis.
+
+    Entries are stored under `CACHE:v{SCHEMA_VERSION}:{kind}:{id}:{variant}` together with the
+    versions of the tags they depend on (their own `{kind}:{id}` and e.g. embedded evolutions).
+    Invalidating a tag increments its `CACHE:VERSION:{tag}` counter, which turns every entry that
+    recorded an older version into a miss on every worker at once, and publishes the tags on
+    `CACHE:INVALIDATE` so workers can drop their in-process copies as well.
+
+    When exactly one entry is missing, a short Redis lock lets only one worker load it from the
+    database while the others wait for it to appear (stampede protection): the lock expires after
+    `LOCK_TIMEOUT` seconds, and the others poll every `POLL_INTERVAL` for up to `LOCK_WAIT`.
+
+    Without a client (no `CACHE_REDIS_URI`), the cache is disabled and `enabled` is false.
+    """
+
+    SCHEMA_VERSION = 2
+    CHANNEL = 'CACHE:INVALIDATE'
+    LOCK_TIMEOUT = 5.0
+    LOCK_WAIT = 1.0
+    POLL_INTERVAL = 0.05
+    RECONNECT_INTERVAL = 1.0
+
+    def __init__(self, client: AsyncRedis | None, ttl: float):
+        self.client = client
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.client is not None
+
+    @property
+    def _redis(self) -> AsyncRedis:
+        # callers check `enabled` first
+        if self.client is None:
+            raise RuntimeError('The shared cache is disabled')
+        return self.client
+
+    def _build_entry_key(self, tag: str, variant: str) -> str:
+        return f'CACHE:v{self.SCHEMA_VERSION}:{tag}:{variant}'
+
+    def _build_version_key(self, tag: str) -> str:
+        return f'CACHE:VERSION:{tag}'
+
+    async def _get_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = sorted(set(tags))
+        if not tags:
+            return {}
+
+        values = await self._redis.mget([self._build_version_key(tag) for tag in tags])
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    async def _get_entries(self, keys: List[str]) -> Dict[str, Any]:
+        """Return the still valid values stored under `keys`, leaving out misses."""
+        raw_entries = await self._redis.mget(keys) if keys else []
+        entries = {key: json.loads(raw) for key, raw in zip(keys, raw_entries) if raw}
+        versions = await self._get_versions(
+            tag for entry in entries.values() for tag in entry['versions']
+        )
+
+        return {
+            key: entry['value']
+            for key, entry in entries.items()
+            if all(versions[tag] == version for tag, version in entry['versions'].items())
+        }
+
+    async def _load_and_store(
+        self,
+        tags: Dict[K, str],
+        variant: str,
+        load: Callable[[List[K]], Awaitable[Dict[K, T]]],
+        codec: SharedCacheCodec[T],
+    ) -> Dict[K, T]:
+        # read the own versions before loading: a write committed meanwhile bumps them, so the
+        # stored entry is already outdated instead of silently stale
+        own_versions = await self._get_versions(tags.values())
+        loaded = await load(list(tags))
+        versions = own_versions | await self._get_versions(
+            {tag for item in loaded.values() for tag in codec.tags_of(item)} - own_versions.keys()
+        )
+
+        # in milliseconds, as a sub-second TTL would round down to no expiry at all
+        ttl = max(1, int(self.ttl * 1000))
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for id, item in loaded.items():
+                item_tags = codec.tags_of(item) | {tags[id]}
+                entry = {
+                    'value': codec.dump(item),
+                    'versions': {tag: versions[tag] for tag in item_tags},
+                }
+                pipe.set(self._build_entry_key(tags[id], variant), json.dumps(entry), px=ttl)
+            await pipe.execute()
+
+        return loaded
+
+    async def _wait_for(self, key: str) -> Any | None:
+        for _ in range(int(self.LOCK_WAIT / self.POLL_INTERVAL)):
+            await asyncio.sleep(self.POLL_INTERVAL)
+            if (value := (await self._get_entries([key])).get(key)) is not None:
+                return value
+
+        return None
+
+    async def get_or_load(
+        self,
+        codec: SharedCacheCodec[T],
+        ids: List[K],
+        variant: str,
+        load: Callable[[List[K]], Awaitable[Dict[K, T]]],
+    ) -> Dict[K, T]:
+        """Serve `ids` from Redis, loading the misses with `load` and storing them for next time.
+
+        Args:
+            codec: How the entities are tagged and stored.
+            ids: Entity ids to look up.
+            variant: Distinguishes differently shaped values of the same entity.
+            load: Loads the given ids from the database, leaving out those that don't exist.
+        """
+        tags = {id: f'{codec.kind}:{id}' for id in ids}
+        keys = {id: self._build_entry_key(tag, variant) for id, tag in tags.items()}
+        cached = await self._get_entries(list(keys.values()))
+        found = {id: codec.parse(cached[key]) for id, key in keys.items() if key in cached}
+        missing = {id: tags[id] for id in ids if id not in found}
+        if not missing:
+            return found
+
+        if len(missing) == 1:
+            [(missing_id, _)] = missing.items()
+            lock = self._redis.lock(f'{keys[missing_id]}:LOCK', timeout=self.LOCK_TIMEOUT)
+            if await lock.acquire(blocking=False):
+                try:
+                    found.update(await self._load_and_store(missing, variant, load, codec))
+                finally:
+                    try:
+                        await lock.release()
+                    except LockError:
+                        pass  # expired while loading
+                return found
+
+            if (value := await self._wait_for(keys[missing_id])) is not None:
+                found[missing_id] = codec.parse(value)
+                return found
+
+        found.update(await self._load_and_store(missing, variant, load, codec))
+        return found
+
+    async def invalidate(self, tags: Iterable[str]):
+        """Outdate every entry depending on `tags` and tell the other workers about it."""
+        tags = sorted(set(tags))
+        if not tags:
+            return
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(self._build_version_key(tag))
+            pipe.publish(self.CHANNEL, json.dumps(tags))
+            await pipe.execute()
+
+    async def listen(
+        self, on_invalidate: Callable[[List[str]], None], on_reconnect: Callable[[], None]
+    ):
+        """Call `on_invalidate` with the tags of every invalidation published by any worker.
+
+        The subscription is renewed every `RECONNECT_INTERVAL` seconds until Redis is reachable
+        again; `on_reconnect` is then called, as what was published meanwhile is lost.
+        """
+        reconnecting = False
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.CHANNEL)
+                    if reconnecting:
+                        on_reconnect()
+                        reconnecting = False
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            on_invalidate(json.loads(message['data']))
+            except (RedisConnectionError, RedisTimeoutError):
+                pass  # retried below
+            reconnecting = True
+            await asyncio.sleep(self.RECONNECT_INTERVAL)
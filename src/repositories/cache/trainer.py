@@ -0,0 +1,110 @@
+from typing import AsyncIterator, Dict, List
+
+from common.type import PokemonNumberStr, UUIDStr
+from models.exception import TrainerNotFound
+from models.trainer import (
+    CreateTrainerModel,
+    TrainerIncludeModel,
+    TrainerModel,
+    TrainerPokemonModel,
+    UpdateTrainerModel,
+)
+
+from ..abstraction import AbstractTrainerRepository
+from .base import POKEMON_KIND, TRAINER_KIND, CachedRepository, build_tag, build_variant
+from .mapper import TrainerCacheMapper
+from .shared import SharedCacheCodec
+
+
+class CachedTrainerRepository(CachedRepository, AbstractTrainerRepository):
+    """
+    Read-through `SharedCache` in front of another Trainer repository.
+
+    There is no in-process tier: every read returns freshly parsed models, which usecases may
+    modify. An entry is tagged with its Trainer and the Pokemon of its team, whose names it embeds.
+    """
+
+    def _build_tags(self, trainer: TrainerModel) -> set[str]:
+        return {build_tag(TRAINER_KIND, trainer.id)} | {
+            build_tag(POKEMON_KIND, tp.no) for tp in trainer.team
+        }
+
+    async def get(
+        self, id: UUIDStr, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerModel:
+        if self._bypasses_cache:
+            return await self.repository.get(id, include)
+
+        if (trainer := (await self.get_many([id], include)).get(id)) is None:
+            raise TrainerNotFound(id)
+
+        return trainer
+
+    async def get_many(
+        self, ids: List[UUIDStr], include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> Dict[UUIDStr, TrainerModel]:
+        if self._bypasses_cache:
+            return await self.repository.get_many(ids, include)
+
+        return await self.shared_cache.get_or_load(
+            SharedCacheCodec(
+                TRAINER_KIND,
+                dump=TrainerCacheMapper.entity_to_dict,
+                parse=TrainerCacheMapper.dict_to_entity,
+                tags_of=self._build_tags,
+            ),
+            list(dict.fromkeys(ids)),
+            build_variant(include),
+            load=lambda missing: self.loader.get_many(missing, include),
+        )
+
+    async def list(
+        self, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> List[TrainerModel]:
+        return await self.repository.list(include)
+
+    async def iter_all(
+        self, include: TrainerIncludeModel = TrainerIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[TrainerModel]:
+        async for trainer in self.repository.iter_all(include, chunk_size):
+            yield trainer
+
+    async def get_teams(self, ids: List[UUIDStr]) -> Dict[UUIDStr, List[TrainerPokemonModel]]:
+        return await self.repository.get_teams(ids)
+
+    async def get_version(self, id: UUIDStr) -> int:
+        return await self.repository.get_version(id)
+
+    async def list_versions(self) -> Dict[UUIDStr, int]:
+        return await self.repository.list_versions()
+
+    async def create(self, data: CreateTrainerModel) -> TrainerModel:
+        self._invalidate([])
+        return await self.repository.create(data)
+
+    async def update(self, id: UUIDStr, data: UpdateTrainerModel) -> int:
+        self._invalidate([build_tag(TRAINER_KIND, id)])
+        return await self.repository.update(id, data)
+
+    async def delete(self, id: UUIDStr):
+        self._invalidate([build_tag(TRAINER_KIND, id)])
+        await self.repository.delete(id)
+
+    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr) -> TrainerModel:
+        self._invalidate([build_tag(TRAINER_KIND, trainer_id)])
+        return await self.repository.add_to_team(trainer_id, pokemon_no)
+
+    async def remove_from_team(
+        self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr
+    ) -> TrainerModel:
+        self._invalidate([build_tag(TRAINER_KIND, trainer_id)])
+        return await self.repository.remove_from_team(trainer_id, pokemon_no)
+
+    async def remove_pokemon_from_all_teams(self, pokemon_no: PokemonNumberStr):
+        # every team holding the Pokemon is tagged with it
+        self._invalidate([build_tag(POKEMON_KIND, pokemon_no)])
+        await self.repository.remove_pokemon_from_all_teams(pokemon_no)
+
+    async def touch_pokemon_owners(self, pokemon_no: PokemonNumberStr):
+        self._invalidate([build_tag(POKEMON_KIND, pokemon_no)])
+        await self.repository.touch_pokemon_owners(pokemon_no)
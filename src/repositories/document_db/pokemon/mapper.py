@@ -1,25 +1,37 @@
+import functools
 import uuid
+from typing import Iterable
 
-from common.type import UUIDStr
-from models.pokemon import PokemonEvolutionModel, PokemonModel, TypeModel
+from common.type import PokemonNumberStr, UUIDStr
+from models.pokemon import PokemonEvolutionModel, PokemonIncludeModel, PokemonModel, TypeModel
+
+
+@functools.lru_cache(maxsize=1024)
+def _build_type(name: str) -> TypeModel:
+    # types are stored by name only; the model is frozen, so every Pokemon can share one instance
+    return TypeModel(id=UUIDStr.from_trusted(uuid.uuid5(uuid.NAMESPACE_DNS, name).hex), name=name)
 
 
 class PokemonDictMapper:
     @staticmethod
-    def dict_to_entity(document: dict) -> PokemonModel:
+    def dict_to_entity(
+        document: dict, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
         return PokemonModel(
-            no=document['no'],
+            no=PokemonNumberStr.from_trusted(document['no']),
             name=document['name'],
-            types=[
-                TypeModel(id=UUIDStr(uuid.uuid5(uuid.NAMESPACE_DNS, name).hex), name=name)
-                for name in document['types']
-            ],
+            types=[_build_type(name) for name in (document['types'] if include.types else [])],
             previous_evolutions=[
-                PokemonEvolutionModel(no=evo['no'], name=evo['name'])
+                PokemonEvolutionModel(no=PokemonNumberStr.from_trusted(evo['no']), name=evo['name'])
                 for evo in document.get('previous_evolution_details', [])
             ],
             next_evolutions=[
-                PokemonEvolutionModel(no=evo['no'], name=evo['name'])
+                PokemonEvolutionModel(no=PokemonNumberStr.from_trusted(evo['no']), name=evo['name'])
                 for evo in document.get('next_evolution_details', [])
             ],
+            version=document.get('version', 1),
         )
+
+    @staticmethod
+    def names_to_types(names: Iterable[str]) -> list[TypeModel]:
+        return [_build_type(name) for name in names]
@@ -1,15 +1,20 @@
-from typing import List
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Tuple
 
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection
+from pymongo import InsertOne, UpdateOne
 
 from common.type import PokemonNumberStr
+from common.utils import build_initial_version
 from models.exception import PokemonAlreadyExists, PokemonNotFound
 from models.pokemon import (
     CreatePokemonModel,
     GetPokemonParamsModel,
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
     PokemonModel,
-    UpdatePokemonModel,
 )
 
 from ...abstraction import AbstractPokemonRepository
@@ -25,6 +30,8 @@ class MongoDBPokemonRepository(AbstractPokemonRepository):
     PUSH = '$push'
     MATCH = '$match'
     SET = '$set'
+    INC = '$inc'
+    LIMIT = '$limit'
 
     # fmt: off
     def __init__(
@@ -36,68 +43,74 @@ class MongoDBPokemonRepository(AbstractPokemonRepository):
         self.session = session
     # fmt: on
 
-    def _build_evolution_pipeline(self) -> List:
-        PREVIOUS_EVOLUTION_DETAILS = 'previous_evolution_details'
-        NEXT_EVOLUTION_DETAILS = 'next_evolution_details'
-
+    def _build_lookup_stages(
+        self, local_field: str, as_field: str, carried_fields: List[str]
+    ) -> List:
         return [
-            # previous_evolutions
-            {
-                self.LOOKUP: {
-                    'from': self.collection.name,
-                    'localField': 'previous_evolution_object_ids',
-                    'foreignField': '_id',
-                    'as': PREVIOUS_EVOLUTION_DETAILS,
-                }
-            },
-            {
-                self.UNWIND: {
-                    'path': f'${PREVIOUS_EVOLUTION_DETAILS}',
-                    'preserveNullAndEmptyArrays': True,
-                }
-            },
-            {self.SORT: {f'{PREVIOUS_EVOLUTION_DETAILS}.no': 1}},
-            {
-                self.GROUP: {
-                    '_id': '$_id',
-                    'no': {self.FIRST: '$no'},
-                    'name': {self.FIRST: '$name'},
-                    'types': {self.FIRST: '$types'},
-                    'previous_evolution_object_ids': {self.FIRST: '$previous_evolution_object_ids'},
-                    'next_evolution_object_ids': {self.FIRST: '$next_evolution_object_ids'},
-                    PREVIOUS_EVOLUTION_DETAILS: {self.PUSH: f'${PREVIOUS_EVOLUTION_DETAILS}'},
-                }
-            },
-            # next_evolution_object_ids
             {
                 self.LOOKUP: {
                     'from': self.collection.name,
-                    'localField': 'next_evolution_object_ids',
+                    'localField': local_field,
                     'foreignField': '_id',
-                    'as': NEXT_EVOLUTION_DETAILS,
-                }
-            },
-            {
-                self.UNWIND: {
-                    'path': f'${NEXT_EVOLUTION_DETAILS}',
-                    'preserveNullAndEmptyArrays': True,
+                    'as': as_field,
                 }
             },
-            {self.SORT: {f'{NEXT_EVOLUTION_DETAILS}.no': 1}},
+            {self.UNWIND: {'path': f'${as_field}', 'preserveNullAndEmptyArrays': True}},
+            {self.SORT: {f'{as_field}.no': 1}},
             {
                 self.GROUP: {
                     '_id': '$_id',
-                    'no': {self.FIRST: '$no'},
-                    'name': {self.FIRST: '$name'},
-                    'types': {self.FIRST: '$types'},
-                    'previous_evolution_object_ids': {self.FIRST: '$previous_evolution_object_ids'},
-                    PREVIOUS_EVOLUTION_DETAILS: {self.FIRST: f'${PREVIOUS_EVOLUTION_DETAILS}'},
-                    'next_evolution_object_ids': {self.FIRST: '$next_evolution_object_ids'},
-                    NEXT_EVOLUTION_DETAILS: {self.PUSH: f'${NEXT_EVOLUTION_DETAILS}'},
+                    **{field: {self.FIRST: f'${field}'} for field in carried_fields},
+                    as_field: {self.PUSH: f'${as_field}'},
                 }
             },
         ]
 
+    def _build_evolution_pipeline(
+        self, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> List:
+        PREVIOUS_EVOLUTION_DETAILS = 'previous_evolution_details'
+        NEXT_EVOLUTION_DETAILS = 'next_evolution_details'
+
+        # types are embedded in the document, only evolutions need a $lookup
+        pipeline = []
+        carried_fields = [
+            'no',
+            'name',
+            'types',
+            'previous_evolution_object_ids',
+            'next_evolution_object_ids',
+            'version',
+        ]
+        if include.previous_evolutions:
+            pipeline += self._build_lookup_stages(
+                'previous_evolution_object_ids', PREVIOUS_EVOLUTION_DETAILS, carried_fields
+            )
+            carried_fields = [*carried_fields, PREVIOUS_EVOLUTION_DETAILS]
+        if include.next_evolutions:
+            pipeline += self._build_lookup_stages(
+                'next_evolution_object_ids', NEXT_EVOLUTION_DETAILS, carried_fields
+            )
+
+        return pipeline
+
+    def _build_document(self, data: CreatePokemonModel | PokemonAggregateModel, **fields) -> dict:
+        return {
+            'no': data.no,
+            'name': data.name,
+            'hp': None,
+            'attack': None,
+            'defense': None,
+            'sp_atk': None,
+            'sp_def': None,
+            'speed': None,
+            'types': [],
+            'previous_evolution_object_ids': [],
+            'next_evolution_object_ids': [],
+            'version': build_initial_version(),
+            **fields,
+        }
+
     async def _get_filtered_pokemon_id_map(
         self, numbers: List[PokemonNumberStr]
     ) -> dict[PokemonNumberStr, ObjectId]:
@@ -108,9 +121,24 @@ class MongoDBPokemonRepository(AbstractPokemonRepository):
             for document in await cursor.to_list(None)  # pyright: ignore[reportGeneralTypeIssues]
         }
 
-    async def get(self, no: PokemonNumberStr):
-        pipeline = self._build_evolution_pipeline()
-        pipeline.append({self.MATCH: {'no': no}})
+    async def _touch(self, filter_: dict):
+        """Increment the version of the Pokemon matching `filter_`."""
+        await self.collection.update_many(filter_, {self.INC: {'version': 1}}, session=self.session)
+
+    def _build_evolution_filter(self, object_id: ObjectId) -> dict:
+        """Match the Pokemon listing `object_id` as a previous or next evolution."""
+        return {
+            '$or': [
+                {'previous_evolution_object_ids': object_id},
+                {'next_evolution_object_ids': object_id},
+            ]
+        }
+
+    async def get(
+        self, no: PokemonNumberStr, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
+        # match first so the evolution lookups only run for the requested document
+        pipeline = [{self.MATCH: {'no': no}}, *self._build_evolution_pipeline(include)]
         try:
             document = await self.collection.aggregate(pipeline, session=self.session).next()
             if not document:
@@ -118,127 +146,268 @@ class MongoDBPokemonRepository(AbstractPokemonRepository):
         except StopAsyncIteration:
             raise PokemonNotFound(no)
 
-        return PokemonDictMapper.dict_to_entity(document)
+        return PokemonDictMapper.dict_to_entity(document, include)
 
-    async def list(self, params: GetPokemonParamsModel | None = None) -> List[PokemonModel]:
-        pipeline = self._build_evolution_pipeline()
-        pipeline.append({self.SORT: {'no': 1}})
+    async def list(
+        self,
+        params: GetPokemonParamsModel | None = None,
+        include: PokemonIncludeModel = PokemonIncludeModel(),
+    ) -> List[PokemonModel]:
+        pipeline = []
         if params:
-            pipeline.append({'$skip': (params.page - 1) * params.size})
-            pipeline.append({'$limit': params.size})
+            # keyset pagination: seek on the unique "no" index before joining evolutions
+            if params.after_no is not None:
+                pipeline.append({self.MATCH: {'no': {'$gt': params.after_no}}})
+            pipeline.append({self.SORT: {'no': 1}})
+            pipeline.append({self.LIMIT: params.size})
+        pipeline.extend(self._build_evolution_pipeline(include))
+        pipeline.append({self.SORT: {'no': 1}})
         cursor = self.collection.aggregate(pipeline, session=self.session)
         documents = await cursor.to_list(None)
 
-        return list(map(PokemonDictMapper.dict_to_entity, documents))
+        return [PokemonDictMapper.dict_to_entity(document, include) for document in documents]
 
-    async def create(self, data: CreatePokemonModel) -> PokemonNumberStr:
-        count = await self.collection.count_documents(
-            {'no': data.no},
-            session=self.session,
+    async def iter_all(
+        self, include: PokemonIncludeModel = PokemonIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[PokemonModel]:
+        pipeline = [{self.SORT: {'no': 1}}, *self._build_evolution_pipeline(include)]
+        if include.previous_evolutions or include.next_evolutions:
+            # the $group stages of the evolution lookups drop the order
+            pipeline.append({self.SORT: {'no': 1}})
+        cursor = self.collection.aggregate(
+            pipeline, session=self.session, batchSize=chunk_size, allowDiskUse=True
         )
-        if count > 0:
-            raise PokemonAlreadyExists(data.no)
+        async for document in cursor:
+            yield PokemonDictMapper.dict_to_entity(document, include)
 
-        document = {
-            'no': data.no,
-            'name': data.name,
-            'hp': None,
-            'attack': None,
-            'defense': None,
-            'sp_atk': None,
-            'sp_def': None,
-            'speed': None,
-            'types': [],
-            'previous_evolution_object_ids': [],
-            'next_evolution_object_ids': [],
+    async def get_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> Dict[PokemonNumberStr, PokemonModel]:
+        pipeline = [
+            {self.MATCH: {'no': {'$in': numbers}}},
+            *self._build_evolution_pipeline(include),
+            {self.SORT: {'no': 1}},
+        ]
+        cursor = self.collection.aggregate(pipeline, session=self.session)
+        documents = await cursor.to_list(None)
+
+        return {
+            document['no']: PokemonDictMapper.dict_to_entity(document, include)
+            for document in documents
         }
-        await self.collection.insert_one(document, session=self.session)
 
-        return data.no
+    async def get_version(self, no: PokemonNumberStr) -> int:
+        document = await self.collection.find_one({'no': no}, {'version': 1}, session=self.session)
+        if not document:
+            raise PokemonNotFound(no)
 
-    async def update(self, no: PokemonNumberStr, data: UpdatePokemonModel):
-        if data.name is not None:
-            result = await self.collection.update_one(
-                {'no': no},
-                {self.SET: {'name': data.name}},
-                session=self.session,
-            )
-            if result.matched_count == 0:
-                raise PokemonNotFound(no)
+        return document.get('version', 1)
 
-    async def delete(self, no: PokemonNumberStr):
-        pokemon = await self.collection.find_one({'no': no}, session=self.session)
-        result = await self.collection.delete_one(
-            {'no': no},
-            session=self.session,
+    async def list_versions(
+        self, params: GetPokemonParamsModel | None = None
+    ) -> Dict[PokemonNumberStr, int]:
+        filter_, limit = {}, 0
+        if params:
+            if params.after_no is not None:
+                filter_ = {'no': {'$gt': params.after_no}}
+            limit = params.size
+        cursor = self.collection.find(
+            filter_, {'no': 1, 'version': 1}, sort=[('no', 1)], limit=limit, session=self.session
         )
-        if result.deleted_count == 0 or not pokemon:
-            raise PokemonNotFound(no)
 
-        await self.collection.update_many(
-            {'previous_evolution_object_ids': pokemon['_id']},
-            {'$pull': {'previous_evolution_object_ids': pokemon['_id']}},
-            session=self.session,
+        return {
+            document['no']: document.get('version', 1)
+            for document in await cursor.to_list(None)  # pyright: ignore[reportGeneralTypeIssues]
+        }
+
+    async def bulk_create(
+        self,
+        data: List[CreatePokemonModel],
+        evolutions: Dict[PokemonNumberStr, PokemonEvolutionModel],
+    ) -> List[PokemonModel]:
+        if not data:
+            return []
+
+        # new documents get their ObjectIds up front so evolutions can reference them before insert
+        number_to_object_id_map = {item.no: ObjectId() for item in data}
+        evolution_pairs = list(
+            dict.fromkeys(pair for item in data for pair in item.evolution_pairs())
         )
-        await self.collection.update_many(
-            {'next_evolution_object_ids': pokemon['_id']},
-            {'$pull': {'next_evolution_object_ids': pokemon['_id']}},
-            session=self.session,
+        existing_numbers = sorted(
+            {no for pair in evolution_pairs for no in pair} - number_to_object_id_map.keys()
         )
+        if existing_numbers:
+            number_to_object_id_map.update(
+                await self._get_filtered_pokemon_id_map(existing_numbers)
+            )
 
-    async def are_existed(self, numbers: List[PokemonNumberStr]) -> bool:
-        count = await self.collection.count_documents(
-            {'no': {'$in': numbers}}, session=self.session
-        )
-        return count == len(numbers)
+        previous_object_ids, next_object_ids = defaultdict(list), defaultdict(list)
+        for previous_no, next_no in evolution_pairs:
+            previous_object_ids[next_no].append(number_to_object_id_map[previous_no])
+            next_object_ids[previous_no].append(number_to_object_id_map[next_no])
 
-    async def replace_types(self, pokemon_no: PokemonNumberStr, type_names: List[str]):
-        await self.collection.update_one(
-            {'no': pokemon_no},
-            {self.SET: {'types': type_names}},
-            session=self.session,
-        )
+        documents = [
+            self._build_document(
+                item,
+                _id=number_to_object_id_map[item.no],
+                types=list(dict.fromkeys(item.type_names)),
+                previous_evolution_object_ids=previous_object_ids[item.no],
+                next_evolution_object_ids=next_object_ids[item.no],
+            )
+            for item in data
+        ]
+        await self.collection.insert_many(documents, session=self.session)
 
-    async def replace_previous_evolutions(
-        self, pokemon_no: PokemonNumberStr, previous_evolution_numbers: List[PokemonNumberStr]
-    ):
-        number_to_object_id_map = await self._get_filtered_pokemon_id_map(
-            [pokemon_no] + previous_evolution_numbers
-        )
-        object_id = number_to_object_id_map.pop(pokemon_no)
+        if requests := [
+            UpdateOne(
+                {'_id': number_to_object_id_map[no]},
+                {self.PUSH: {field: {'$each': object_ids[no]}}, self.INC: {'version': 1}},
+            )
+            for no in existing_numbers
+            for field, object_ids in (
+                ('previous_evolution_object_ids', previous_object_ids),
+                ('next_evolution_object_ids', next_object_ids),
+            )
+            if object_ids[no]
+        ]:
+            await self.collection.bulk_write(requests, session=self.session)
 
-        result = await self.collection.update_one(
-            {'_id': object_id},
-            {self.SET: {'previous_evolution_object_ids': list(number_to_object_id_map.values())}},
-            session=self.session,
-        )
-        if result.matched_count == 0:
-            raise PokemonNotFound(pokemon_no)
+        return [
+            PokemonAggregateModel.for_create(item, evolutions).apply_to(
+                None, PokemonDictMapper.names_to_types(document['types']), document['version']
+            )
+            for item, document in zip(data, documents)
+        ]
 
-        await self.collection.update_many(
-            {'_id': {'$in': list(number_to_object_id_map.values())}},
-            {self.PUSH: {'next_evolution_object_ids': object_id}},
-            session=self.session,
+    async def upsert_aggregate(self, aggregate: PokemonAggregateModel) -> PokemonModel:
+        include = (
+            PokemonIncludeModel.without_relations()
+            if aggregate.is_new
+            else aggregate.kept_relations
+        )
+        document, number_to_document_map = await self._get_for_upsert(aggregate, include)
+        object_id = document['_id'] if document else ObjectId()
+        fields, partner_updates, touched_object_ids = self._build_evolution_updates(
+            aggregate, document, object_id, number_to_document_map
         )
 
-    async def replace_next_evolutions(
-        self, pokemon_no: PokemonNumberStr, next_evolution_numbers: List[PokemonNumberStr]
-    ):
-        number_to_object_id_map = await self._get_filtered_pokemon_id_map(
-            [pokemon_no] + next_evolution_numbers
+        if aggregate.type_names is not None:
+            fields['types'] = aggregate.type_names
+        if document is None:
+            new_document = self._build_document(aggregate, _id=object_id, **fields)
+            requests: List = [InsertOne(new_document)]
+            version = new_document['version']
+        else:
+            if aggregate.name is not None:
+                fields['name'] = aggregate.name
+            update_: dict = {self.SET: fields} if fields else {}
+            requests = [UpdateOne({'_id': object_id}, {**update_, self.INC: {'version': 1}})]
+            version = document.get('version', 1) + 1
+        requests += [
+            UpdateOne(
+                {'_id': partner_id},
+                {**partner_updates.get(partner_id, {}), self.INC: {'version': 1}},
+            )
+            for partner_id in touched_object_ids
+        ]
+        await self.collection.bulk_write(requests, session=self.session)
+
+        return aggregate.apply_to(
+            PokemonDictMapper.dict_to_entity(document, include) if document else None,
+            (
+                PokemonDictMapper.names_to_types(aggregate.type_names)
+                if aggregate.type_names is not None
+                else None
+            ),
+            version,
         )
-        object_id = number_to_object_id_map.pop(pokemon_no)
 
-        result = await self.collection.update_one(
-            {'_id': object_id},
-            {self.SET: {'next_evolution_object_ids': list(number_to_object_id_map.values())}},
+    async def _get_for_upsert(
+        self, aggregate: PokemonAggregateModel, include: PokemonIncludeModel
+    ) -> Tuple[dict | None, Dict[PokemonNumberStr, dict]]:
+        """Load the Pokemon and, by number, its new evolutions, checking they exist as required."""
+        no = aggregate.no
+        # the Pokemon along with its new evolutions, for their ObjectIds, in one round-trip
+        pipeline = [
+            {self.MATCH: {'no': {'$in': [no, *aggregate.evolution_numbers]}}},
+            *self._build_evolution_pipeline(include),
+        ]
+        cursor = self.collection.aggregate(pipeline, session=self.session)
+        number_to_document_map = {
+            document['no']: document for document in await cursor.to_list(None)
+        }
+        document = number_to_document_map.pop(no, None)
+        if aggregate.is_new and document:
+            raise PokemonAlreadyExists(no)
+        if not aggregate.is_new and not document:
+            raise PokemonNotFound(no)
+        if missing_numbers := [
+            evo_no for evo_no in aggregate.evolution_numbers if evo_no not in number_to_document_map
+        ]:
+            raise PokemonNotFound(missing_numbers)
+
+        return document, number_to_document_map
+
+    def _build_evolution_updates(
+        self,
+        aggregate: PokemonAggregateModel,
+        document: dict | None,
+        object_id: ObjectId,
+        number_to_document_map: Dict[PokemonNumberStr, dict],
+    ) -> Tuple[dict, Dict[ObjectId, dict], Dict[ObjectId, None]]:
+        """Return the Pokemon's new evolution fields, its partners' updates and those to touch."""
+        # partners whose mirror field changes, and those touched because they embed the name
+        fields: dict = {}
+        partner_updates: dict[ObjectId, dict] = defaultdict(lambda: defaultdict(dict))
+        touched_object_ids: dict[ObjectId, None] = {}
+        renamed = aggregate.name is not None and document is not None
+        for evolutions, field, mirror_field in (
+            (
+                aggregate.previous_evolutions,
+                'previous_evolution_object_ids',
+                'next_evolution_object_ids',
+            ),
+            (
+                aggregate.next_evolutions,
+                'next_evolution_object_ids',
+                'previous_evolution_object_ids',
+            ),
+        ):
+            current_object_ids = document[field] if document else []
+            if renamed:
+                touched_object_ids.update(dict.fromkeys(current_object_ids))
+            if evolutions is None:
+                continue
+
+            fields[field] = [number_to_document_map[evo.no]['_id'] for evo in evolutions]
+            for partner_id in current_object_ids:
+                if partner_id not in fields[field]:
+                    partner_updates[partner_id]['$pull'][mirror_field] = object_id
+                    touched_object_ids[partner_id] = None
+            for partner_id in fields[field]:
+                if partner_id not in current_object_ids:
+                    partner_updates[partner_id][self.PUSH][mirror_field] = object_id
+                    touched_object_ids[partner_id] = None
+
+        return fields, partner_updates, touched_object_ids
+
+    async def delete(self, no: PokemonNumberStr):
+        pokemon = await self.collection.find_one({'no': no}, session=self.session)
+        result = await self.collection.delete_one(
+            {'no': no},
             session=self.session,
         )
-        if result.matched_count == 0:
-            raise PokemonNotFound(pokemon_no)
+        if result.deleted_count == 0 or not pokemon:
+            raise PokemonNotFound(no)
 
         await self.collection.update_many(
-            {'_id': {'$in': list(number_to_object_id_map.values())}},
-            {self.PUSH: {'previous_evolution_object_ids': object_id}},
+            self._build_evolution_filter(pokemon['_id']),
+            {
+                '$pull': {
+                    'previous_evolution_object_ids': pokemon['_id'],
+                    'next_evolution_object_ids': pokemon['_id'],
+                },
+                self.INC: {'version': 1},
+            },
             session=self.session,
         )
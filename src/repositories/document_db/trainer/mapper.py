@@ -1,4 +1,5 @@
 from common.docstring import MAPPER_DOCSTRING
+from common.type import PokemonNumberStr, UUIDStr
 from models.trainer import TrainerModel, TrainerPokemonModel
 
 __doc__ = MAPPER_DOCSTRING
@@ -8,12 +9,13 @@ class TrainerDictMapper:
     @staticmethod
     def dict_to_entity(document: dict) -> TrainerModel:
         return TrainerModel(
-            id=document['id'],
+            id=UUIDStr.from_trusted(document['id']),
             name=document['name'],
             region=document['region'],
             badge_count=document['badge_count'],
             team=[
-                TrainerPokemonModel(no=p['no'], name=p['name'])
+                TrainerPokemonModel(no=PokemonNumberStr.from_trusted(p['no']), name=p['name'])
                 for p in document.get('team_details', [])
             ],
+            version=document.get('version', 1),
         )
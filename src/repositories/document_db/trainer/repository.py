@@ -1,14 +1,23 @@
 # pylint: disable=duplicate-code
-from typing import List
+from typing import AsyncIterator, Dict, List
 
 from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorCollection
+from pymongo import ReturnDocument
 
 from common.type import PokemonNumberStr, UUIDStr
-from common.utils import build_uuid4_str
-from models.exception import TrainerNotFound
+from common.utils import build_initial_version, build_uuid4_str
+from models.exception import (
+    TrainerAlreadyOwnsPokemon,
+    TrainerDoesNotOwnPokemon,
+    TrainerNotFound,
+    TrainerTeamFullError,
+)
 from models.trainer import (
+    MAX_TEAM_SIZE,
     CreateTrainerModel,
+    TrainerIncludeModel,
     TrainerModel,
+    TrainerPokemonModel,
     UpdateTrainerModel,
 )
 
@@ -27,6 +36,7 @@ class MongoDBTrainerRepository(AbstractTrainerRepository):
     PUSH = '$push'
     MATCH = '$match'
     SET = '$set'
+    INC = '$inc'
 
     # fmt: off
     def __init__(
@@ -40,21 +50,27 @@ class MongoDBTrainerRepository(AbstractTrainerRepository):
         self.session = session
     # fmt: on
 
-    def _build_team_pipeline(self) -> List:
-        return [
-            {
-                self.LOOKUP: {
-                    'from': POKEMON_COLLECTION_NAME,
-                    'localField': 'team',
-                    'foreignField': 'no',
-                    'as': 'team_details',
+    def _build_team_pipeline(self, include: TrainerIncludeModel = TrainerIncludeModel()) -> List:
+        pipeline = []
+        if include.team:
+            pipeline.append(
+                {
+                    self.LOOKUP: {
+                        'from': POKEMON_COLLECTION_NAME,
+                        'localField': 'team',
+                        'foreignField': 'no',
+                        'as': 'team_details',
+                    }
                 }
-            },
-            {self.SORT: {'id': 1}},
-        ]
+            )
+        pipeline.append({self.SORT: {'id': 1}})
 
-    async def get(self, id: UUIDStr) -> TrainerModel:
-        pipeline = self._build_team_pipeline()
+        return pipeline
+
+    async def get(
+        self, id: UUIDStr, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerModel:
+        pipeline = self._build_team_pipeline(include)
         pipeline.insert(0, {self.MATCH: {'id': id}})
         try:
             document = await self.collection.aggregate(pipeline, session=self.session).next()
@@ -65,27 +81,77 @@ class MongoDBTrainerRepository(AbstractTrainerRepository):
 
         return TrainerDictMapper.dict_to_entity(document)
 
-    async def list(self) -> List[TrainerModel]:
-        pipeline = self._build_team_pipeline()
+    async def get_many(
+        self, ids: List[UUIDStr], include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> Dict[UUIDStr, TrainerModel]:
+        pipeline = self._build_team_pipeline(include)
+        pipeline.insert(0, {self.MATCH: {'id': {'$in': ids}}})
+        cursor = self.collection.aggregate(pipeline, session=self.session)
+
+        return {
+            document['id']: TrainerDictMapper.dict_to_entity(document)
+            for document in await cursor.to_list(None)
+        }
+
+    async def list(
+        self, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> List[TrainerModel]:
+        pipeline = self._build_team_pipeline(include)
         cursor = self.collection.aggregate(pipeline, session=self.session)
         documents = await cursor.to_list(None)
 
         return list(map(TrainerDictMapper.dict_to_entity, documents))
 
-    async def create(self, data: CreateTrainerModel) -> UUIDStr:
-        id = UUIDStr(build_uuid4_str())
+    async def iter_all(
+        self, include: TrainerIncludeModel = TrainerIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[TrainerModel]:
+        cursor = self.collection.aggregate(
+            self._build_team_pipeline(include), session=self.session, batchSize=chunk_size
+        )
+        async for document in cursor:
+            yield TrainerDictMapper.dict_to_entity(document)
+
+    async def get_teams(self, ids: List[UUIDStr]) -> Dict[UUIDStr, List[TrainerPokemonModel]]:
+        pipeline = self._build_team_pipeline()
+        pipeline.insert(0, {self.MATCH: {'id': {'$in': ids}}})
+        cursor = self.collection.aggregate(pipeline, session=self.session)
+        teams = {
+            document['id']: TrainerDictMapper.dict_to_entity(document).team
+            for document in await cursor.to_list(None)
+        }
+
+        return {id: teams.get(id, []) for id in ids}
+
+    async def get_version(self, id: UUIDStr) -> int:
+        document = await self.collection.find_one({'id': id}, {'version': 1}, session=self.session)
+        if not document:
+            raise TrainerNotFound(id)
+
+        return document.get('version', 1)
+
+    async def list_versions(self) -> Dict[UUIDStr, int]:
+        cursor = self.collection.find(
+            {}, {'id': 1, 'version': 1}, sort=[('id', 1)], session=self.session
+        )
+
+        return {
+            document['id']: document.get('version', 1) for document in await cursor.to_list(None)
+        }
+
+    async def create(self, data: CreateTrainerModel) -> TrainerModel:
         document = {
-            'id': id,
+            'id': UUIDStr.from_trusted(build_uuid4_str()),
             'name': data.name,
             'region': data.region,
             'badge_count': data.badge_count,
             'team': [],
+            'version': build_initial_version(),
         }
         await self.collection.insert_one(document, session=self.session)
 
-        return id
+        return TrainerDictMapper.dict_to_entity(document)
 
-    async def update(self, id: UUIDStr, data: UpdateTrainerModel):
+    async def update(self, id: UUIDStr, data: UpdateTrainerModel) -> int:
         values = {}
         if data.name is not None:
             values['name'] = data.name
@@ -95,36 +161,92 @@ class MongoDBTrainerRepository(AbstractTrainerRepository):
             values['badge_count'] = data.badge_count
 
         if values:
-            result = await self.collection.update_one(
-                {'id': id},
-                {self.SET: values},
-                session=self.session,
-            )
-            if result.matched_count == 0:
-                raise TrainerNotFound(id)
+            return await self._update_version(id, {self.SET: values})
+
+        return await self.get_version(id)
 
     async def delete(self, id: UUIDStr):
         result = await self.collection.delete_one({'id': id}, session=self.session)
         if result.deleted_count == 0:
             raise TrainerNotFound(id)
 
-    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
-        await self.collection.update_one(
+    async def _update_version(self, trainer_id: UUIDStr, update_: dict) -> int:
+        """Apply `update_` along with a version increment and return the new version."""
+        document = await self.collection.find_one_and_update(
             {'id': trainer_id},
-            {self.PUSH: {'team': pokemon_no}},
+            {**update_, self.INC: {'version': 1}},
+            projection={'version': 1},
+            return_document=ReturnDocument.AFTER,
             session=self.session,
         )
+        if not document:
+            raise TrainerNotFound(trainer_id)
 
-    async def remove_from_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
-        await self.collection.update_one(
-            {'id': trainer_id},
-            {'$pull': {'team': pokemon_no}},
+        return document['version']
+
+    async def _to_written_entity(self, document: dict) -> TrainerModel:
+        """Map the Trainer as returned by its update, along with the names of its team."""
+        cursor = self.pokemon_collection.find(
+            {'no': {'$in': document['team']}},
+            {'no': 1, 'name': 1},
+            sort=[('no', 1)],
             session=self.session,
         )
 
+        return TrainerDictMapper.dict_to_entity(
+            {**document, 'team_details': await cursor.to_list(None)}
+        )
+
+    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr) -> TrainerModel:
+        # guarded in the filter, as a single document update is atomic
+        document = await self.collection.find_one_and_update(
+            {
+                'id': trainer_id,
+                'team': {'$ne': pokemon_no},
+                '$expr': {'$lt': [{'$size': '$team'}, MAX_TEAM_SIZE]},
+            },
+            {'$addToSet': {'team': pokemon_no}, self.INC: {'version': 1}},
+            return_document=ReturnDocument.AFTER,
+            session=self.session,
+        )
+        if document:
+            return await self._to_written_entity(document)
+
+        document = await self.collection.find_one(
+            {'id': trainer_id}, {'team': 1}, session=self.session
+        )
+        if not document:
+            raise TrainerNotFound(trainer_id)
+        if pokemon_no in document['team']:
+            raise TrainerAlreadyOwnsPokemon(
+                f'Trainer {trainer_id} already owns Pokemon {pokemon_no}'
+            )
+        raise TrainerTeamFullError(f'Trainer {trainer_id} team is full')
+
+    async def remove_from_team(
+        self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr
+    ) -> TrainerModel:
+        document = await self.collection.find_one_and_update(
+            {'id': trainer_id, 'team': pokemon_no},
+            {'$pull': {'team': pokemon_no}, self.INC: {'version': 1}},
+            return_document=ReturnDocument.AFTER,
+            session=self.session,
+        )
+        if document:
+            return await self._to_written_entity(document)
+
+        # raises `TrainerNotFound` first
+        await self.get_version(trainer_id)
+        raise TrainerDoesNotOwnPokemon(f'Trainer {trainer_id} does not own Pokemon {pokemon_no}')
+
     async def remove_pokemon_from_all_teams(self, pokemon_no: PokemonNumberStr):
         await self.collection.update_many(
             {'team': pokemon_no},
-            {'$pull': {'team': pokemon_no}},
+            {'$pull': {'team': pokemon_no}, self.INC: {'version': 1}},
             session=self.session,
         )
+
+    async def touch_pokemon_owners(self, pokemon_no: PokemonNumberStr):
+        await self.collection.update_many(
+            {'team': pokemon_no}, {self.INC: {'version': 1}}, session=self.session
+        )
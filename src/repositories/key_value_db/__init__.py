@@ -1,2 +1,7 @@
+from .base import RedisRepository, RedisTransaction
 from .pokemon.repository import RedisPokemonRepository
+from .pokemon.scripts import SCRIPTS as POKEMON_SCRIPTS
 from .trainer.repository import RedisTrainerRepository
+from .trainer.scripts import SCRIPTS as TRAINER_SCRIPTS
+
+SCRIPTS = (*POKEMON_SCRIPTS, *TRAINER_SCRIPTS)
@@ -0,0 +1,165 @@
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from redis.asyncio import StrictRedis as AsyncRedis
+
+PIPELINE_CHUNK_SIZE = 1000
+
+Command = Tuple[Any, ...]
+# raised when the reply is falsy, or picked from the reply, None meaning success
+ReplyError = Exception | Callable[[Any], Exception | None]
+
+
+def check_reply(reply: Any, error: ReplyError):
+    if callable(error):
+        if (exception := error(reply)) is not None:
+            raise exception
+    elif not reply:
+        raise error
+
+
+class RedisTransaction:
+    """
+    Writes of a unit of work, queued to be sent at once in a single MULTI/EXEC.
+
+    The keys the repositories read are WATCHed first, so EXEC is aborted with `WatchError` when any
+    of them changed in the meantime. Reads go through the WATCHing connection, so a unit of work
+    holds only one connection. Queued writes aren't visible to reads, so reads after them are
+    refused: usecases read everything first and build what they return from what they wrote.
+
+    EXEC can't depend on the replies of its commands, so a write that may find its entity missing, or
+    a guard of its script failing, is queued with the error to raise after the commit; its script
+    then changes nothing. Likewise, repositories keep the versions they read in `versions` and count
+    the increments they queue, and keep the entities they read in `entities` to build what their
+    writes return, which stay exact as the keys are WATCHed until EXEC.
+    """
+
+    def __init__(self, client: AsyncRedis):
+        self._client = client
+        self._pipe = client.pipeline(transaction=True)
+        self._commands: List[Command] = []
+        self._errors: List[Tuple[int, ReplyError]] = []
+        self.versions: Dict[str, int] = {}
+        self.entities: Dict[str, Any] = {}
+
+    @property
+    def reader(self) -> Any:
+        """The WATCHing pipeline, which runs commands right away until MULTI."""
+        return self._pipe
+
+    async def watch(self, keys: Sequence[str]):
+        if self._commands:
+            raise RuntimeError('Redis reads must come before the writes of the unit of work')
+        if keys:
+            await self._pipe.watch(*keys)
+
+    async def read(self, commands: List[Command], chunk_size: int) -> List[Any]:
+        """Send `(command, *args)` tuples on the WATCHing connection, one round-trip per chunk."""
+        # set by the WATCH of the keys read
+        if (connection := self._pipe.connection) is None:
+            raise RuntimeError('Redis reads must WATCH their keys first')
+        results: List[Any] = []
+        for start in range(0, len(commands), chunk_size):
+            # a plain pipeline only to turn the commands into their arguments and reply options
+            stack = self._client.pipeline(transaction=False)
+            for command, *args in commands[start : start + chunk_size]:
+                getattr(stack, command)(*args)
+            try:
+                await connection.send_packed_command(
+                    connection.pack_commands([args for args, _ in stack.command_stack])
+                )
+                for args, options in stack.command_stack:
+                    results.append(await self._pipe.parse_response(connection, args[0], **options))
+            except BaseException:
+                # replies left unread would be taken for those of the next commands
+                await connection.disconnect()
+                raise
+
+        return results
+
+    def queue(self, commands: List[Command], error: ReplyError | None = None):
+        """Queue `(command, *args)` tuples; `error` is checked against the reply of the last one."""
+        self._commands.extend(commands)
+        if error is not None:
+            self._errors.append((len(self._commands) - 1, error))
+
+    async def commit(self):
+        commands, self._commands = self._commands, []
+        errors, self._errors = self._errors, []
+        self.versions.clear()
+        self.entities.clear()
+        if not commands:
+            # unwatches the keys and returns the connection
+            await self._pipe.reset()
+            return
+
+        self._pipe.multi()
+        for command, *args in commands:
+            getattr(self._pipe, command)(*args)
+        results = await self._pipe.execute()
+
+        for index, error in errors:
+            check_reply(results[index], error)
+
+    async def discard(self):
+        self._commands.clear()
+        self._errors.clear()
+        self.versions.clear()
+        self.entities.clear()
+        await self._pipe.reset()
+
+
+class RedisRepository:
+    def __init__(self, client: AsyncRedis, pipeline_chunk_size: int = PIPELINE_CHUNK_SIZE):
+        self.client: AsyncRedis = client
+        self.pipeline_chunk_size = pipeline_chunk_size
+        # set by the unit of work while it is entered
+        self.transaction: RedisTransaction | None = None
+
+    async def _watch(self, *keys: str):
+        if self.transaction is not None:
+            await self.transaction.watch(keys)
+
+    async def _execute_in_chunks(self, commands: List[Command]) -> List[Any]:
+        """Queue `(command, *args)` tuples on one pipeline, sending one round-trip per chunk."""
+        results: List[Any] = []
+        async with self.client.pipeline() as pipe:
+            for start in range(0, len(commands), self.pipeline_chunk_size):
+                for command, *args in commands[start : start + self.pipeline_chunk_size]:
+                    getattr(pipe, command)(*args)
+                results.extend(await pipe.execute())
+
+        return results
+
+    @property
+    def _reader(self) -> Any:
+        """Where to send single reads, once their keys are WATCHed with `_watch`."""
+        return self.transaction.reader if self.transaction is not None else self.client
+
+    async def _read_in_chunks(self, commands: List[Command]) -> List[Any]:
+        """Like `_execute_in_chunks`, for reads, whose keys come first in each command."""
+        if self.transaction is None:
+            return await self._execute_in_chunks(commands)
+        if not commands:
+            return []
+
+        await self._watch(*dict.fromkeys(key for _, key, *_ in commands))
+        return await self.transaction.read(commands, self.pipeline_chunk_size)
+
+    async def _write(self, commands: List[Command], error: ReplyError | None = None):
+        """Queue `commands` on the transaction, or send them right away outside of one.
+
+        `error` is checked against the reply of the last command, after the transaction committed.
+        """
+        if self.transaction is not None:
+            self.transaction.queue(commands, error)
+            return
+
+        results = await self._execute_in_chunks(commands)
+        if error is not None:
+            check_reply(results[-1], error)
+
+
+def build_script_command(script: str, keys: Sequence[str], args: Sequence[Any]) -> Command:
+    # sent whole, as a script missing from the cache couldn't be loaded in the middle of MULTI;
+    # Redis still compiles it only once
+    return ('eval', script, len(keys), *keys, *args)
@@ -1,25 +1,35 @@
+import functools
 import uuid
+from typing import Iterable
 
-from common.type import UUIDStr
+from common.type import PokemonNumberStr, UUIDStr
 from models.pokemon import PokemonEvolutionModel, PokemonModel, TypeModel
 
 
+@functools.lru_cache(maxsize=1024)
+def _build_type(name: str) -> TypeModel:
+    # types are stored by name only; the model is frozen, so every Pokemon can share one instance
+    return TypeModel(id=UUIDStr.from_trusted(uuid.uuid5(uuid.NAMESPACE_DNS, name).hex), name=name)
+
+
 class PokemonKeyValueMapper:
     @staticmethod
     def dict_to_entity(key_value: dict) -> PokemonModel:
         return PokemonModel(
-            no=key_value['no'],
+            no=PokemonNumberStr.from_trusted(key_value['no']),
             name=key_value['name'],
-            types=[
-                TypeModel(id=UUIDStr(uuid.uuid5(uuid.NAMESPACE_DNS, name).hex), name=name)
-                for name in key_value['types']
-            ],
+            types=[_build_type(name) for name in key_value['types']],
             previous_evolutions=[
-                PokemonEvolutionModel(no=evo['no'], name=evo['name'])
+                PokemonEvolutionModel(no=PokemonNumberStr.from_trusted(evo['no']), name=evo['name'])
                 for evo in key_value['previous_evolutions'] or []
             ],
             next_evolutions=[
-                PokemonEvolutionModel(no=evo['no'], name=evo['name'])
+                PokemonEvolutionModel(no=PokemonNumberStr.from_trusted(evo['no']), name=evo['name'])
                 for evo in key_value['next_evolutions'] or []
             ],
+            version=int(key_value.get('version') or 1),
         )
+
+    @staticmethod
+    def names_to_types(names: Iterable[str]) -> list[TypeModel]:
+        return [_build_type(name) for name in sorted(names)]
@@ -31,4 +31,8 @@ Anticipated Key-Value Structure for Pokemon:
     | Values:                                         |
     |   - next_evolution_no: String                   |  # Identifier of the next evolutionary form
     +-------------------------------------------------+
+    | Key: POKEMON:INDEX                              |  # Sorted set of all Pokemon numbers
+    | Members:                                        |
+    |   - no: String (score: int(no))                 |  # Ordered for ranged listing
+    +-------------------------------------------------+
 """
@@ -1,26 +1,26 @@
-import re
-from typing import List
-
-from redis.asyncio import StrictRedis as AsyncRedis
+from typing import AsyncIterator, Dict, List
 
 from common.type import PokemonNumberStr
-from models.exception import PokemonAlreadyExists, PokemonNotFound, PokemonUnknownError
+from common.utils import build_initial_version
+from models.exception import PokemonAlreadyExists, PokemonNotFound
 from models.pokemon import (
     CreatePokemonModel,
     GetPokemonParamsModel,
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
     PokemonModel,
-    UpdatePokemonModel,
 )
 
 from ...abstraction import AbstractPokemonRepository
+from ..base import Command, RedisRepository, build_script_command
 from .mapper import PokemonKeyValueMapper
+from .scripts import DELETE_POKEMON_SCRIPT, REPLACE_EVOLUTIONS_SCRIPT
 
 
-class RedisPokemonRepository(AbstractPokemonRepository):
-    re_pattern = re.compile(r'POKEMON:(\d+):INFO')
-
-    def __init__(self, client: AsyncRedis):
-        self.client: AsyncRedis = client
+class RedisPokemonRepository(RedisRepository, AbstractPokemonRepository):
+    INDEX_KEY = 'POKEMON:INDEX'
+    STAT_FIELDS = ('hp', 'attack', 'defense', 'sp_atk', 'sp_def', 'speed')
 
     def _build_info_key(self, no: PokemonNumberStr) -> str:
         return f'POKEMON:{no}:INFO'
@@ -34,189 +34,243 @@ class RedisPokemonRepository(AbstractPokemonRepository):
     def _build_next_evolution_key(self, no: PokemonNumberStr) -> str:
         return f'POKEMON:{no}:NEXT_EVOLUTION'
 
-    async def get(self, no: PokemonNumberStr):
-        key = self._build_info_key(no)
-        if not await self.client.exists(key):
-            raise PokemonNotFound(no)
+    async def _list_numbers(
+        self, params: GetPokemonParamsModel | None = None
+    ) -> List[PokemonNumberStr]:
+        await self._watch(self.INDEX_KEY)
+        if not params:
+            return await self._reader.zrange(self.INDEX_KEY, 0, -1)
+
+        # keyset pagination: "(" makes the lower bound exclusive
+        min_score = f'({int(params.after_no)}' if params.after_no is not None else '-inf'
+        return await self._reader.zrangebyscore(
+            self.INDEX_KEY, min_score, '+inf', start=0, num=params.size
+        )
 
-        async with self.client.pipeline() as pipe:
-            pipe.hgetall(key)
-            pipe.smembers(self._build_type_key(no))
-            pipe.smembers(self._build_previous_evolution_key(no))
-            pipe.smembers(self._build_next_evolution_key(no))
-            [info, types, prev_evo_numbers, next_evo_numbers] = await pipe.execute()
-
-            for number in prev_evo_numbers:
-                pipe.hgetall(self._build_info_key(number))
-            prev_evos = await pipe.execute()
-            for number in next_evo_numbers:
-                pipe.hgetall(self._build_info_key(number))
-            next_evos = await pipe.execute()
-
-            return PokemonKeyValueMapper.dict_to_entity(
-                {
-                    **info,
-                    'types': sorted(types),
-                    'previous_evolutions': sorted(prev_evos, key=lambda item: item['no']),
-                    'next_evolutions': sorted(next_evos, key=lambda item: item['no']),
-                },
+    async def _load_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> List[PokemonModel]:
+        commands = []
+        for no in numbers:
+            commands.append(('hgetall', self._build_info_key(no)))
+            if include.types:
+                commands.append(('smembers', self._build_type_key(no)))
+            if include.previous_evolutions:
+                commands.append(('smembers', self._build_previous_evolution_key(no)))
+            if include.next_evolutions:
+                commands.append(('smembers', self._build_next_evolution_key(no)))
+        results = iter(await self._read_in_chunks(commands))
+        rows = [
+            (
+                next(results),
+                next(results) if include.types else set(),
+                next(results) if include.previous_evolutions else set(),
+                next(results) if include.next_evolutions else set(),
             )
+            for _ in numbers
+        ]
 
-    async def list(self, params: GetPokemonParamsModel | None = None) -> List[PokemonModel]:
-        pokemon_map = {}
-        async with self.client.pipeline() as pipe:
-            async for key in self.client.scan_iter(match='POKEMON:*:INFO'):
-                match = self.re_pattern.match(key)
-                if not match:
-                    raise PokemonUnknownError(key)
-
-                no = PokemonNumberStr(match.group(1))
-                pipe.hgetall(self._build_info_key(no))
-                pipe.smembers(self._build_type_key(no))
-                pipe.smembers(self._build_previous_evolution_key(no))
-                pipe.smembers(self._build_next_evolution_key(no))
-                [info, types, prev_evo_numbers, next_evo_numbers] = await pipe.execute()
-
-                for number in list(prev_evo_numbers) + list(next_evo_numbers):
-                    if number == no:
-                        continue
-                    if number not in pokemon_map:
-                        pipe.hgetall(self._build_info_key(number))
-                for evo_info in await pipe.execute():
-                    pokemon_map[evo_info['no']] = evo_info
-
-                pokemon_map[no] = info
-                pokemon_map[no]['types'] = sorted(types)
-                pokemon_map[no]['previous_evolutions'] = [
-                    {'no': pokemon_map[number]['no'], 'name': pokemon_map[number]['name']}
-                    for number in sorted(prev_evo_numbers)
-                ]
-                pokemon_map[no]['next_evolutions'] = [
-                    {'no': pokemon_map[number]['no'], 'name': pokemon_map[number]['name']}
-                    for number in sorted(next_evo_numbers)
-                ]
-
-        return list(
-            map(
-                PokemonKeyValueMapper.dict_to_entity,
-                sorted(pokemon_map.values(), key=lambda pokemon: pokemon['no']),
-            )
+        names = {info['no']: info['name'] for info, *_ in rows if info}
+        evolution_numbers = sorted(
+            {number for _, _, prevs, nexts in rows for number in prevs | nexts} - names.keys()
+        )
+        evolution_names = await self._read_in_chunks(
+            [('hget', self._build_info_key(number), 'name') for number in evolution_numbers]
+        )
+        names.update(
+            (number, name) for number, name in zip(evolution_numbers, evolution_names) if name
         )
 
-    async def create(self, data: CreatePokemonModel) -> PokemonNumberStr:
-        key = self._build_info_key(data.no)
-        if await self.client.exists(key):
-            raise PokemonAlreadyExists(data.no)
-
-        async with self.client.pipeline() as pipe:
-            pipe.hset(key, 'no', data.no)
-            pipe.hset(key, 'name', data.name)
-            pipe.hset(key, 'hp', '')
-            pipe.hset(key, 'attack', '')
-            pipe.hset(key, 'defense', '')
-            pipe.hset(key, 'sp_atk', '')
-            pipe.hset(key, 'sp_def', '')
-            pipe.hset(key, 'speed', '')
-            await pipe.execute()
-
-        return data.no
-
-    async def update(self, no: PokemonNumberStr, data: UpdatePokemonModel):
-        if data.name is not None:
-            key = self._build_info_key(no)
-            if not await self.client.exists(key):
-                raise PokemonNotFound(no)
-
-            await self.client.hset(key, 'name', data.name)
+        return [
+            PokemonKeyValueMapper.dict_to_entity(
+                {
+                    **info,
+                    'types': sorted(types),
+                    'previous_evolutions': [
+                        {'no': number, 'name': names[number]}
+                        for number in sorted(prevs)
+                        if number in names
+                    ],
+                    'next_evolutions': [
+                        {'no': number, 'name': names[number]}
+                        for number in sorted(nexts)
+                        if number in names
+                    ],
+                }
+            )
+            for info, types, prevs, nexts in rows
+            if info
+        ]
+
+    async def get(
+        self, no: PokemonNumberStr, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
+        pokemons = await self._load_many([no], include)
+        if not pokemons:
+            raise PokemonNotFound(no)
 
-    async def delete(self, no: PokemonNumberStr):
-        # pylint: disable=too-many-locals
+        return pokemons[0]
+
+    async def list(
+        self,
+        params: GetPokemonParamsModel | None = None,
+        include: PokemonIncludeModel = PokemonIncludeModel(),
+    ) -> List[PokemonModel]:
+        return await self._load_many(await self._list_numbers(params), include)
+
+    async def iter_all(
+        self, include: PokemonIncludeModel = PokemonIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[PokemonModel]:
+        # walk the index by score rather than ZSCAN so the export stays ordered by number
+        await self._watch(self.INDEX_KEY)
+        min_score = '-inf'
+        while numbers := await self._reader.zrangebyscore(
+            self.INDEX_KEY, min_score, '+inf', start=0, num=chunk_size
+        ):
+            for pokemon in await self._load_many(numbers, include):
+                yield pokemon
+            min_score = f'({int(numbers[-1])}'
+
+    async def get_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> Dict[PokemonNumberStr, PokemonModel]:
+        pokemons = await self._load_many(sorted(set(numbers)), include)
+
+        return {pokemon.no: pokemon for pokemon in pokemons}
+
+    async def get_version(self, no: PokemonNumberStr) -> int:
+        await self._watch(self._build_info_key(no))
+        number, version = await self._reader.hmget(self._build_info_key(no), ['no', 'version'])
+        if number is None:
+            raise PokemonNotFound(no)
 
-        info_key = self._build_info_key(no)
-        type_key = self._build_type_key(no)
-        prev_evo_key = self._build_previous_evolution_key(no)
-        next_evo_key = self._build_next_evolution_key(no)
+        return int(version or 1)
 
-        is_existed = await self.client.exists(info_key)
-        if not is_existed:
-            raise PokemonNotFound(no)
+    async def list_versions(
+        self, params: GetPokemonParamsModel | None = None
+    ) -> Dict[PokemonNumberStr, int]:
+        numbers = await self._list_numbers(params)
+        versions = await self._read_in_chunks(
+            [('hget', self._build_info_key(no), 'version') for no in numbers]
+        )
 
-        async with self.client.pipeline() as pipe:
-            pipe.hgetall(info_key)
-            pipe.smembers(type_key)
-            pipe.smembers(prev_evo_key)
-            pipe.smembers(next_evo_key)
-            [_, _, ori_prev_evo_numbers, ori_next_evo_numbers] = await pipe.execute()
-
-            pipe.delete(info_key)
-            pipe.delete(type_key)
-            pipe.delete(prev_evo_key)
-            pipe.delete(next_evo_key)
-            await pipe.execute()
-
-            for number in ori_prev_evo_numbers:
-                key = self._build_next_evolution_key(number)
-                pipe.srem(key, no)
-            for number in ori_next_evo_numbers:
-                key = self._build_previous_evolution_key(number)
-                pipe.srem(key, no)
-
-            await pipe.execute()
-
-    async def are_existed(self, numbers: List[PokemonNumberStr]) -> bool:
-        if not numbers:
-            return True
-
-        async with self.client.pipeline() as pipe:
-            for number in numbers:
-                pipe.exists(self._build_info_key(number))
-            return all(await pipe.execute())
-
-    async def replace_types(self, pokemon_no: PokemonNumberStr, type_names: List[str]):
-        key = self._build_type_key(pokemon_no)
-        await self.client.delete(key)
-        await self.client.sadd(key, *type_names)
-
-    async def replace_previous_evolutions(
-        self, pokemon_no: PokemonNumberStr, previous_evolution_numbers: List[PokemonNumberStr]
-    ):
-        async with self.client.pipeline() as pipe:
-            ori_prev_evo_numbers = await self.client.smembers(
-                self._build_previous_evolution_key(pokemon_no)
+        return {no: int(version or 1) for no, version in zip(numbers, versions)}
+
+    async def bulk_create(
+        self,
+        data: List[CreatePokemonModel],
+        evolutions: Dict[PokemonNumberStr, PokemonEvolutionModel],
+    ) -> List[PokemonModel]:
+        commands = []
+        versions = {item.no: build_initial_version() for item in data}
+        for item in data:
+            info = {
+                'no': item.no,
+                'name': item.name,
+                'version': str(versions[item.no]),
+                **dict.fromkeys(self.STAT_FIELDS, ''),
+            }
+            # positional form of `hset(key, mapping=info)`
+            commands.append(('hset', self._build_info_key(item.no), None, None, info))
+            if item.type_names:
+                commands.append(('sadd', self._build_type_key(item.no), *item.type_names))
+            commands.append(('zadd', self.INDEX_KEY, {item.no: int(item.no)}))
+        evolution_pairs = dict.fromkeys(pair for item in data for pair in item.evolution_pairs())
+        for previous_no, next_no in evolution_pairs:
+            commands.append(('sadd', self._build_next_evolution_key(previous_no), next_no))
+            commands.append(('sadd', self._build_previous_evolution_key(next_no), previous_no))
+        # existing Pokemon on the other side now show the new ones as evolutions
+        new_numbers = {item.no for item in data}
+        for no in sorted({no for pair in evolution_pairs for no in pair} - new_numbers):
+            commands.append(('hincrby', self._build_info_key(no), 'version', 1))
+        await self._write(commands)
+
+        return [
+            PokemonAggregateModel.for_create(item, evolutions).apply_to(
+                None, PokemonKeyValueMapper.names_to_types(item.type_names), versions[item.no]
             )
-            for number in ori_prev_evo_numbers:
-                key = self._build_next_evolution_key(number)
-                pipe.srem(key, pokemon_no)
-
-            key = self._build_previous_evolution_key(pokemon_no)
-            pipe.delete(key)
-
-            for number in previous_evolution_numbers:
-                key = self._build_previous_evolution_key(pokemon_no)
-                pipe.sadd(key, number)
-                key = self._build_next_evolution_key(number)
-                pipe.sadd(key, pokemon_no)
-
-            await pipe.execute()
-
-    async def replace_next_evolutions(
-        self, pokemon_no: PokemonNumberStr, next_evolution_numbers: List[PokemonNumberStr]
-    ):
-        async with self.client.pipeline() as pipe:
-            ori_next_evo_numbers = await self.client.smembers(
-                self._build_next_evolution_key(pokemon_no)
-            )
-            for number in ori_next_evo_numbers:
-                key = self._build_previous_evolution_key(number)
-                pipe.srem(key, pokemon_no)
+            for item in data
+        ]
 
-            key = self._build_next_evolution_key(pokemon_no)
-            pipe.delete(key)
+    async def upsert_aggregate(self, aggregate: PokemonAggregateModel) -> PokemonModel:
+        no = aggregate.no
+        key = self._build_info_key(no)
+        pokemon: PokemonModel | None = None
+        if aggregate.is_new:
+            await self._watch(key)
+            if await self._reader.exists(key):
+                raise PokemonAlreadyExists(no)
+            version = build_initial_version()
+        else:
+            if not (pokemons := await self._load_many([no], aggregate.kept_relations)):
+                raise PokemonNotFound(no)
+            pokemon = pokemons[0]
+            # the read is WATCHed by the unit of work, so the version can't move in between
+            version = pokemon.version + 1
+
+        commands: List[Command] = []
+        if aggregate.type_names is not None:
+            type_key = self._build_type_key(no)
+            commands.append(('delete', type_key))
+            if aggregate.type_names:
+                commands.append(('sadd', type_key, *aggregate.type_names))
+        for evolutions, evolution_key, mirror in (
+            (
+                aggregate.previous_evolutions,
+                self._build_previous_evolution_key(no),
+                'NEXT_EVOLUTION',
+            ),
+            (aggregate.next_evolutions, self._build_next_evolution_key(no), 'PREVIOUS_EVOLUTION'),
+        ):
+            if evolutions is not None:
+                # also touches the Pokemon itself, whose version is set below
+                commands.append(
+                    build_script_command(
+                        REPLACE_EVOLUTIONS_SCRIPT,
+                        keys=[evolution_key],
+                        args=[no, mirror, *(evo.no for evo in evolutions)],
+                    )
+                )
+        if aggregate.name is not None and pokemon is not None:
+            # evolutions embed the name; the replaced ones were touched by the script
+            commands.extend(
+                ('hincrby', self._build_info_key(evo.no), 'version', 1)
+                for evo in pokemon.previous_evolutions + pokemon.next_evolutions
+            )
 
-            for number in next_evolution_numbers:
-                key = self._build_next_evolution_key(pokemon_no)
-                pipe.sadd(key, number)
-                key = self._build_previous_evolution_key(number)
-                pipe.sadd(key, pokemon_no)
+        info = {'version': str(version)}
+        if aggregate.name is not None:
+            info['name'] = aggregate.name
+        if aggregate.is_new:
+            info = {'no': no, **info, **dict.fromkeys(self.STAT_FIELDS, '')}
+            commands.append(('zadd', self.INDEX_KEY, {no: int(no)}))
+        # positional form of `hset(key, mapping=info)`, last so that a new Pokemon isn't touched
+        commands.append(('hset', key, None, None, info))
+        await self._write(commands)
+
+        types = aggregate.type_names
+        return aggregate.apply_to(
+            pokemon,
+            PokemonKeyValueMapper.names_to_types(types) if types is not None else None,
+            version,
+        )
 
-            await pipe.execute()
+    async def delete(self, no: PokemonNumberStr):
+        # the script checks that the Pokemon exists: reading it first would commit the writes
+        # queued before, such as the usecase removing it from every team
+        await self._write(
+            [
+                build_script_command(
+                    DELETE_POKEMON_SCRIPT,
+                    keys=[
+                        self._build_info_key(no),
+                        self._build_type_key(no),
+                        self._build_previous_evolution_key(no),
+                        self._build_next_evolution_key(no),
+                        self.INDEX_KEY,
+                    ],
+                    args=[no],
+                )
+            ],
+            error=PokemonNotFound(no),
+        )
@@ -0,0 +1,70 @@
+"""Lua Scripts for Pokemon Mutations.
+
+Each script runs atomically on the Redis server, and can be queued in the MULTI/EXEC of a unit of
+work. Scripts are sent whole with EVAL; `initialize_redis` loads them into the script cache on
+startup, so that Redis finds them already compiled.
+
+Every script that changes how a Pokemon is shown increments the `version` field of its INFO hash,
+and of the evolutions embedding its name.
+
+Only the keys of the Pokemon written are passed in KEYS. Those of its evolutions are built in the
+script, from the numbers given in ARGV or read from its evolution sets, as they are only known
+on the server; like the Trainer scripts, these need a single Redis node, not a Redis Cluster.
+"""
+
+# increments the version of an existing Pokemon, never creating a bare INFO hash
+_TOUCH_FUNCTION = """
+local function touch(number)
+    local key = 'POKEMON:' .. number .. ':INFO'
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('HINCRBY', key, 'version', 1)
+    end
+end
+"""
+
+# KEYS: INFO, TYPE, PREVIOUS_EVOLUTION, NEXT_EVOLUTION, POKEMON:INDEX
+# ARGV: no
+# Returns 0 if the Pokemon does not exist, otherwise 1.
+DELETE_POKEMON_SCRIPT = (
+    _TOUCH_FUNCTION
+    + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for _, number in ipairs(redis.call('SMEMBERS', KEYS[3])) do
+    redis.call('SREM', 'POKEMON:' .. number .. ':NEXT_EVOLUTION', ARGV[1])
+    touch(number)
+end
+for _, number in ipairs(redis.call('SMEMBERS', KEYS[4])) do
+    redis.call('SREM', 'POKEMON:' .. number .. ':PREVIOUS_EVOLUTION', ARGV[1])
+    touch(number)
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[4])
+redis.call('ZREM', KEYS[5], ARGV[1])
+return 1
+"""
+)
+
+# KEYS: the Pokemon's own evolution set (PREVIOUS_EVOLUTION or NEXT_EVOLUTION)
+# ARGV: no, suffix of the mirrored set on the other side (NEXT_EVOLUTION or PREVIOUS_EVOLUTION),
+#       evolution numbers...
+REPLACE_EVOLUTIONS_SCRIPT = (
+    _TOUCH_FUNCTION
+    + """
+local mirror = ':' .. ARGV[2]
+touch(ARGV[1])
+for _, number in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    redis.call('SREM', 'POKEMON:' .. number .. mirror, ARGV[1])
+    touch(number)
+end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV do
+    redis.call('SADD', KEYS[1], ARGV[i])
+    redis.call('SADD', 'POKEMON:' .. ARGV[i] .. mirror, ARGV[1])
+    touch(ARGV[i])
+end
+return #ARGV - 2
+"""
+)
+
+SCRIPTS = (DELETE_POKEMON_SCRIPT, REPLACE_EVOLUTIONS_SCRIPT)
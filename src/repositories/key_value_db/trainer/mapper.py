@@ -1,4 +1,5 @@
 from common.docstring import MAPPER_DOCSTRING
+from common.type import PokemonNumberStr, UUIDStr
 from models.trainer import TrainerModel, TrainerPokemonModel
 
 __doc__ = MAPPER_DOCSTRING
@@ -8,11 +9,18 @@ class TrainerKeyValueMapper:
     @staticmethod
     def dict_to_entity(key_value: dict) -> TrainerModel:
         return TrainerModel(
-            id=key_value['id'],
+            id=UUIDStr.from_trusted(key_value['id']),
             name=key_value['name'],
             region=key_value['region'],
             badge_count=int(key_value['badge_count']),
-            team=[
-                TrainerPokemonModel(no=p['no'], name=p['name']) for p in key_value.get('team', [])
-            ],
+            team=list(map(TrainerPokemonKeyValueMapper.dict_to_entity, key_value.get('team', []))),
+            version=int(key_value.get('version') or 1),
+        )
+
+
+class TrainerPokemonKeyValueMapper:
+    @staticmethod
+    def dict_to_entity(key_value: dict) -> TrainerPokemonModel:
+        return TrainerPokemonModel(
+            no=PokemonNumberStr.from_trusted(key_value['no']), name=key_value['name']
         )
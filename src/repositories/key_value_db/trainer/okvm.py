@@ -17,4 +17,12 @@ Anticipated Key-Value Structure for Trainer:
     | Values:                                         |
     |   - pokemon_no: String                          |  # Pokemon number (e.g., "0025")
     +-------------------------------------------------+
+    | Key: POKEMON:{no}:OWNERS                        |  # Reverse index of TRAINER:{id}:TEAM
+    | Values:                                         |
+    |   - trainer_id: String (UUID hex)               |  # Trainer whose team holds the Pokemon
+    +-------------------------------------------------+
+    | Key: TRAINER:INDEX                              |  # Set of all Trainer ids
+    | Members:                                        |
+    |   - id: String (UUID hex)                       |
+    +-------------------------------------------------+
 """
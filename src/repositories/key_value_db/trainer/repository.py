@@ -1,26 +1,36 @@
-import re
-from typing import List
-
-from redis.asyncio import StrictRedis as AsyncRedis
+from dataclasses import replace
+from typing import AsyncIterator, Dict, List
 
 from common.type import PokemonNumberStr, UUIDStr
-from common.utils import build_uuid4_str
-from models.exception import TrainerNotFound
+from common.utils import build_initial_version, build_uuid4_str
+from models.exception import (
+    TrainerAlreadyOwnsPokemon,
+    TrainerDoesNotOwnPokemon,
+    TrainerNotFound,
+    TrainerTeamFullError,
+)
 from models.trainer import (
+    MAX_TEAM_SIZE,
     CreateTrainerModel,
+    TrainerIncludeModel,
     TrainerModel,
+    TrainerPokemonModel,
     UpdateTrainerModel,
 )
 
 from ...abstraction import AbstractTrainerRepository
-from .mapper import TrainerKeyValueMapper
-
+from ..base import RedisRepository, build_script_command
+from .mapper import TrainerKeyValueMapper, TrainerPokemonKeyValueMapper
+from .scripts import (
+    ADD_TO_TEAM_SCRIPT,
+    DELETE_TRAINER_SCRIPT,
+    REMOVE_POKEMON_FROM_ALL_TEAMS_SCRIPT,
+    TOUCH_POKEMON_OWNERS_SCRIPT,
+)
 
-class RedisTrainerRepository(AbstractTrainerRepository):
-    re_pattern = re.compile(r'TRAINER:([a-fA-F0-9]{32}):INFO')
 
-    def __init__(self, client: AsyncRedis):
-        self.client: AsyncRedis = client
+class RedisTrainerRepository(RedisRepository, AbstractTrainerRepository):
+    INDEX_KEY = 'TRAINER:INDEX'
 
     def _build_info_key(self, id: UUIDStr) -> str:
         return f'TRAINER:{id}:INFO'
@@ -31,95 +41,298 @@ class RedisTrainerRepository(AbstractTrainerRepository):
     def _build_pokemon_info_key(self, no: PokemonNumberStr) -> str:
         return f'POKEMON:{no}:INFO'
 
-    async def get(self, id: UUIDStr) -> TrainerModel:
+    def _build_pokemon_owners_key(self, no: PokemonNumberStr) -> str:
+        return f'POKEMON:{no}:OWNERS'
+
+    async def _resolve_teams(
+        self, ids: List[UUIDStr], team_numbers: List[set]
+    ) -> Dict[UUIDStr, List[dict]]:
+        numbers = sorted(set().union(*team_numbers))
+        pokemon_names = await self._read_in_chunks(
+            [('hget', self._build_pokemon_info_key(number), 'name') for number in numbers]
+        )
+        names = {number: name for number, name in zip(numbers, pokemon_names) if name}
+
+        return {
+            id: [
+                {'no': number, 'name': names[number]} for number in sorted(team) if number in names
+            ]
+            for id, team in zip(ids, team_numbers)
+        }
+
+    async def _load_many(
+        self, ids: List[UUIDStr], include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> List[TrainerModel]:
+        commands = []
+        for id in ids:
+            commands.append(('hgetall', self._build_info_key(id)))
+            if include.team:
+                commands.append(('smembers', self._build_team_key(id)))
+        results = iter(await self._read_in_chunks(commands))
+        rows = [(next(results), next(results) if include.team else set()) for _ in ids]
+        if self.transaction is not None:
+            self.transaction.versions.update(
+                (self._build_info_key(id), int(info.get('version', 1)))
+                for id, (info, _) in zip(ids, rows)
+                if info
+            )
+        teams = await self._resolve_teams(ids, [team_numbers for _, team_numbers in rows])
+        trainers = [
+            TrainerKeyValueMapper.dict_to_entity({**info, 'team': teams[id]})
+            for id, (info, _) in zip(ids, rows)
+            if info
+        ]
+        if include.team:
+            self._keep_read(trainers)
+
+        return trainers
+
+    def _keep_read(self, trainers: List[TrainerModel]):
+        """Keep the Trainers read, and the Pokemon of their teams, for the writes to return."""
+        if self.transaction is None:
+            return
+
+        for trainer in trainers:
+            self._keep_written(trainer)
+            self.transaction.entities.update(
+                (self._build_pokemon_info_key(pokemon.no), pokemon) for pokemon in trainer.team
+            )
+
+    def _forget_versions(self):
+        # after a script touching Trainers not known in advance
+        if self.transaction is not None:
+            self.transaction.versions.clear()
+            self.transaction.entities.clear()
+
+    async def _increment_version(self, id: UUIDStr) -> int:
+        """Return the version the Trainer gets from the `hincrby` about to be written.
+
+        It comes from the version read in this transaction, if any, as replies only come at EXEC.
+        """
         key = self._build_info_key(id)
-        if not await self.client.exists(key):
+        versions = self.transaction.versions if self.transaction is not None else {}
+        if (version := versions.get(key)) is None:
+            # e.g. a Trainer served from the shared cache
+            await self._watch(key)
+            if (version := await self._reader.hget(key, 'version')) is None:
+                raise TrainerNotFound(id)
+        versions[key] = int(version) + 1
+
+        return versions[key]
+
+    async def _get_written(self, id: UUIDStr) -> TrainerModel:
+        """Return the Trainer as read in this transaction, or read it now, to apply a write to."""
+        entities = self.transaction.entities if self.transaction is not None else {}
+        if (trainer := entities.get(self._build_info_key(id))) is None:
+            trainer = await self.get(id)
+
+        return replace(trainer, team=list(trainer.team))
+
+    def _keep_written(self, trainer: TrainerModel) -> TrainerModel:
+        # a copy, as the caller may change what it is given
+        if self.transaction is not None:
+            self.transaction.entities[self._build_info_key(trainer.id)] = replace(
+                trainer, team=list(trainer.team)
+            )
+
+        return trainer
+
+    async def _get_pokemon_name(self, no: PokemonNumberStr) -> str | None:
+        key = self._build_pokemon_info_key(no)
+        entities = self.transaction.entities if self.transaction is not None else {}
+        # e.g. a Pokemon traded from another Trainer read in this transaction
+        if (pokemon := entities.get(key)) is not None:
+            return pokemon.name
+
+        [name] = await self._read_in_chunks([('hget', key, 'name')])
+        return name
+
+    async def get(
+        self, id: UUIDStr, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerModel:
+        trainers = await self._load_many([id], include)
+        if not trainers:
             raise TrainerNotFound(id)
 
-        async with self.client.pipeline() as pipe:
-            pipe.hgetall(key)
-            pipe.smembers(self._build_team_key(id))
-            [info, team_numbers] = await pipe.execute()
-
-            team = []
-            for number in sorted(team_numbers):
-                pipe.hgetall(self._build_pokemon_info_key(number))
-            pokemon_infos = await pipe.execute()
-            for pokemon_info in pokemon_infos:
-                if pokemon_info:
-                    team.append({'no': pokemon_info['no'], 'name': pokemon_info['name']})
-
-            return TrainerKeyValueMapper.dict_to_entity({**info, 'team': team})
-
-    async def list(self) -> List[TrainerModel]:
-        trainers = []
-        async with self.client.pipeline() as pipe:
-            async for key in self.client.scan_iter(match='TRAINER:*:INFO'):
-                match = self.re_pattern.match(key)
-                if not match:
-                    continue
-
-                id = UUIDStr(match.group(1))
-                pipe.hgetall(self._build_info_key(id))
-                pipe.smembers(self._build_team_key(id))
-                [info, team_numbers] = await pipe.execute()
-
-                team = []
-                for number in sorted(team_numbers):
-                    pipe.hgetall(self._build_pokemon_info_key(number))
-                pokemon_infos = await pipe.execute()
-                for pokemon_info in pokemon_infos:
-                    if pokemon_info:
-                        team.append({'no': pokemon_info['no'], 'name': pokemon_info['name']})
-
-                trainers.append(TrainerKeyValueMapper.dict_to_entity({**info, 'team': team}))
-
-        return sorted(trainers, key=lambda t: t.id)
-
-    async def create(self, data: CreateTrainerModel) -> UUIDStr:
-        id = UUIDStr(build_uuid4_str())
-        key = self._build_info_key(id)
+        return trainers[0]
 
-        async with self.client.pipeline() as pipe:
-            pipe.hset(key, 'id', id)
-            pipe.hset(key, 'name', data.name)
-            pipe.hset(key, 'region', data.region)
-            pipe.hset(key, 'badge_count', str(data.badge_count))
-            await pipe.execute()
+    async def get_many(
+        self, ids: List[UUIDStr], include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> Dict[UUIDStr, TrainerModel]:
+        trainers = await self._load_many(sorted(set(ids)), include)
 
-        return id
+        return {trainer.id: trainer for trainer in trainers}
 
-    async def update(self, id: UUIDStr, data: UpdateTrainerModel):
-        key = self._build_info_key(id)
-        if not await self.client.exists(key):
+    async def list(
+        self, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> List[TrainerModel]:
+        await self._watch(self.INDEX_KEY)
+        ids = sorted(await self._reader.smembers(self.INDEX_KEY))
+
+        return await self._load_many(ids, include)
+
+    async def iter_all(
+        self, include: TrainerIncludeModel = TrainerIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[TrainerModel]:
+        await self._watch(self.INDEX_KEY)
+        cursor = 0
+        while True:
+            cursor, ids = await self._reader.sscan(self.INDEX_KEY, cursor, count=chunk_size)
+            for trainer in await self._load_many(sorted(ids), include):
+                yield trainer
+            if not cursor:
+                break
+
+    async def get_teams(self, ids: List[UUIDStr]) -> Dict[UUIDStr, List[TrainerPokemonModel]]:
+        team_numbers = await self._read_in_chunks(
+            [('smembers', self._build_team_key(id)) for id in ids]
+        )
+        teams = await self._resolve_teams(ids, team_numbers)
+
+        return {
+            id: list(map(TrainerPokemonKeyValueMapper.dict_to_entity, team))
+            for id, team in teams.items()
+        }
+
+    async def get_version(self, id: UUIDStr) -> int:
+        await self._watch(self._build_info_key(id))
+        trainer_id, version = await self._reader.hmget(self._build_info_key(id), ['id', 'version'])
+        if trainer_id is None:
             raise TrainerNotFound(id)
 
-        async with self.client.pipeline() as pipe:
-            if data.name is not None:
-                pipe.hset(key, 'name', data.name)
-            if data.region is not None:
-                pipe.hset(key, 'region', data.region)
-            if data.badge_count is not None:
-                pipe.hset(key, 'badge_count', str(data.badge_count))
-            await pipe.execute()
+        return int(version or 1)
+
+    async def list_versions(self) -> Dict[UUIDStr, int]:
+        await self._watch(self.INDEX_KEY)
+        ids = sorted(await self._reader.smembers(self.INDEX_KEY))
+        versions = await self._read_in_chunks(
+            [('hget', self._build_info_key(id), 'version') for id in ids]
+        )
+
+        return {id: int(version or 1) for id, version in zip(ids, versions)}
+
+    async def create(self, data: CreateTrainerModel) -> TrainerModel:
+        id = UUIDStr.from_trusted(build_uuid4_str())
+        info = {
+            'id': id,
+            'name': data.name,
+            'region': data.region,
+            'badge_count': str(data.badge_count),
+            'version': str(build_initial_version()),
+        }
+        await self._write(
+            [
+                # positional form of `hset(key, mapping=info)`
+                ('hset', self._build_info_key(id), None, None, info),
+                ('sadd', self.INDEX_KEY, id),
+            ]
+        )
+
+        return TrainerKeyValueMapper.dict_to_entity({**info, 'team': []})
+
+    async def update(self, id: UUIDStr, data: UpdateTrainerModel) -> int:
+        info = {
+            field: str(value)
+            for field, value in (
+                ('name', data.name),
+                ('region', data.region),
+                ('badge_count', data.badge_count),
+            )
+            if value is not None
+        }
+        if not info:
+            return await self.get_version(id)
+
+        version = await self._increment_version(id)
+        key = self._build_info_key(id)
+        await self._write([('hset', key, None, None, info), ('hincrby', key, 'version', 1)])
+
+        return version
 
     async def delete(self, id: UUIDStr):
-        info_key = self._build_info_key(id)
-        if not await self.client.exists(info_key):
-            raise TrainerNotFound(id)
+        await self._write(
+            [
+                build_script_command(
+                    DELETE_TRAINER_SCRIPT,
+                    keys=[self._build_info_key(id), self._build_team_key(id), self.INDEX_KEY],
+                    args=[id],
+                )
+            ],
+            error=TrainerNotFound(id),
+        )
 
-        team_key = self._build_team_key(id)
-        async with self.client.pipeline() as pipe:
-            pipe.delete(info_key)
-            pipe.delete(team_key)
-            await pipe.execute()
+    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr) -> TrainerModel:
+        trainer = await self._get_written(trainer_id)
+        name = await self._get_pokemon_name(pokemon_no)
+        version = await self._increment_version(trainer_id)
+        errors = {
+            -1: TrainerNotFound(trainer_id),
+            0: TrainerAlreadyOwnsPokemon(f'Trainer {trainer_id} already owns Pokemon {pokemon_no}'),
+            -2: TrainerTeamFullError(f'Trainer {trainer_id} team is full'),
+        }
+        await self._write(
+            [
+                build_script_command(
+                    ADD_TO_TEAM_SCRIPT,
+                    keys=[
+                        self._build_info_key(trainer_id),
+                        self._build_team_key(trainer_id),
+                        self._build_pokemon_owners_key(pokemon_no),
+                    ],
+                    args=[trainer_id, pokemon_no, MAX_TEAM_SIZE],
+                )
+            ],
+            error=errors.get,
+        )
 
-    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
-        await self.client.sadd(self._build_team_key(trainer_id), pokemon_no)
+        # exact, as the team is WATCHed; when a guard of the script fails, the commit raises instead
+        trainer.version = version
+        if name is not None:
+            trainer.add_to_team(TrainerPokemonModel(no=pokemon_no, name=name))
+        return self._keep_written(trainer)
 
-    async def remove_from_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
-        await self.client.srem(self._build_team_key(trainer_id), pokemon_no)
+    async def remove_from_team(
+        self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr
+    ) -> TrainerModel:
+        trainer = await self._get_written(trainer_id)
+        # exact, as the team is WATCHed
+        if not trainer.has_pokemon(pokemon_no):
+            raise TrainerDoesNotOwnPokemon(
+                f'Trainer {trainer_id} does not own Pokemon {pokemon_no}'
+            )
+        version = await self._increment_version(trainer_id)
+        await self._write(
+            [
+                ('srem', self._build_team_key(trainer_id), pokemon_no),
+                ('srem', self._build_pokemon_owners_key(pokemon_no), trainer_id),
+                ('hincrby', self._build_info_key(trainer_id), 'version', 1),
+            ]
+        )
+
+        team = [pokemon for pokemon in trainer.team if pokemon.no != pokemon_no]
+        return self._keep_written(replace(trainer, team=team, version=version))
 
     async def remove_pokemon_from_all_teams(self, pokemon_no: PokemonNumberStr):
-        async for key in self.client.scan_iter(match='TRAINER:*:TEAM'):
-            await self.client.srem(key, pokemon_no)
+        await self._write(
+            [
+                build_script_command(
+                    REMOVE_POKEMON_FROM_ALL_TEAMS_SCRIPT,
+                    keys=[self._build_pokemon_owners_key(pokemon_no)],
+                    args=[pokemon_no],
+                )
+            ]
+        )
+        self._forget_versions()
+
+    async def touch_pokemon_owners(self, pokemon_no: PokemonNumberStr):
+        # a script, as the owners can no longer be read after the rename queued before
+        await self._write(
+            [
+                build_script_command(
+                    TOUCH_POKEMON_OWNERS_SCRIPT,
+                    keys=[self._build_pokemon_owners_key(pokemon_no)],
+                    args=[],
+                )
+            ]
+        )
+        self._forget_versions()
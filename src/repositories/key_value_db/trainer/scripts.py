@@ -0,0 +1,83 @@
+"""Lua Scripts for Trainer Mutations.
+
+Each script runs atomically on the Redis server, and can be queued in the MULTI/EXEC of a unit of
+work. Scripts are sent whole with EVAL; `initialize_redis` loads them into the script cache on
+startup, so that Redis finds them already compiled.
+
+Scripts reach the other side of a team through keys built from the members they read, e.g. the
+INFO of each owner of a Pokemon, which aren't declared in KEYS: they need a single Redis node, not
+a Redis Cluster. Owners whose Trainer no longer exists are skipped, so that no INFO is recreated.
+"""
+
+# KEYS: INFO, TEAM, TRAINER:INDEX
+# ARGV: id
+# Returns 0 if the Trainer does not exist, otherwise 1.
+DELETE_TRAINER_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for _, number in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+    redis.call('SREM', 'POKEMON:' .. number .. ':OWNERS', ARGV[1])
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('SREM', KEYS[3], ARGV[1])
+return 1
+"""
+
+# KEYS: INFO, TEAM, POKEMON:{no}:OWNERS
+# ARGV: id, pokemon_no, max_team_size
+# Returns -1 if the Trainer does not exist, 0 if it owns the Pokemon already, -2 if its team is
+# full, otherwise 1.
+ADD_TO_TEAM_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+if redis.call('SISMEMBER', KEYS[2], ARGV[2]) == 1 then
+    return 0
+end
+if redis.call('SCARD', KEYS[2]) >= tonumber(ARGV[3]) then
+    return -2
+end
+redis.call('SADD', KEYS[2], ARGV[2])
+redis.call('SADD', KEYS[3], ARGV[1])
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+return 1
+"""
+
+# KEYS: POKEMON:{no}:OWNERS
+# ARGV: pokemon_no
+# Returns the number of teams the Pokemon was removed from.
+REMOVE_POKEMON_FROM_ALL_TEAMS_SCRIPT = """
+local removed = 0
+for _, id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if redis.call('EXISTS', 'TRAINER:' .. id .. ':INFO') == 1 then
+        redis.call('SREM', 'TRAINER:' .. id .. ':TEAM', ARGV[1])
+        redis.call('HINCRBY', 'TRAINER:' .. id .. ':INFO', 'version', 1)
+        removed = removed + 1
+    end
+end
+redis.call('DEL', KEYS[1])
+return removed
+"""
+
+# KEYS: POKEMON:{no}:OWNERS
+# Returns the number of Trainers touched.
+TOUCH_POKEMON_OWNERS_SCRIPT = """
+local touched = 0
+for _, id in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if redis.call('EXISTS', 'TRAINER:' .. id .. ':INFO') == 1 then
+        redis.call('HINCRBY', 'TRAINER:' .. id .. ':INFO', 'version', 1)
+        touched = touched + 1
+    else
+        redis.call('SREM', KEYS[1], id)
+    end
+end
+return touched
+"""
+
+SCRIPTS = (
+    DELETE_TRAINER_SCRIPT,
+    ADD_TO_TEAM_SCRIPT,
+    REMOVE_POKEMON_FROM_ALL_TEAMS_SCRIPT,
+    TOUCH_POKEMON_OWNERS_SCRIPT,
+)
@@ -1,5 +1,6 @@
 from common.docstring import MAPPER_DOCSTRING
-from models.pokemon import PokemonEvolutionModel, PokemonModel, TypeModel
+from common.type import PokemonNumberStr, UUIDStr
+from models.pokemon import PokemonEvolutionModel, PokemonIncludeModel, PokemonModel, TypeModel
 
 from .orm import Pokemon, Type
 
@@ -8,31 +9,35 @@ __doc__ = MAPPER_DOCSTRING
 
 class PokemonOrmMapper:
     @staticmethod
-    def orm_to_entity(pokemon: Pokemon) -> PokemonModel:
+    def orm_to_entity(
+        pokemon: Pokemon, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
+        # relations left out of `include` were never loaded (lazy='raise'), so don't touch them
         return PokemonModel(
-            no=pokemon.no,
+            no=PokemonNumberStr.from_trusted(pokemon.no),
             name=pokemon.name,
-            types=list(map(TypeOrmMapper.orm_to_entity, pokemon.types)),
+            types=list(map(TypeOrmMapper.orm_to_entity, pokemon.types)) if include.types else [],
             previous_evolutions=[
                 PokemonEvolutionModel(
-                    no=evo.previous_pokemon.no,
+                    no=PokemonNumberStr.from_trusted(evo.previous_pokemon.no),
                     name=evo.previous_pokemon.name,
                 )
-                for evo in pokemon.previous_evolutions
+                for evo in (pokemon.previous_evolutions if include.previous_evolutions else [])
                 if evo.previous_pokemon
             ],
             next_evolutions=[
                 PokemonEvolutionModel(
-                    no=evo.next_pokemon.no,
+                    no=PokemonNumberStr.from_trusted(evo.next_pokemon.no),
                     name=evo.next_pokemon.name,
                 )
-                for evo in pokemon.next_evolutions
+                for evo in (pokemon.next_evolutions if include.next_evolutions else [])
                 if evo.next_pokemon
             ],
+            version=pokemon.version,
         )
 
 
 class TypeOrmMapper:
     @staticmethod
     def orm_to_entity(type_: Type) -> TypeModel:
-        return TypeModel(id=type_.id, name=type_.name)
+        return TypeModel(id=UUIDStr.from_trusted(type_.id), name=type_.name)
@@ -1,8 +1,8 @@
-from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy import BigInteger, ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from common.type import PokemonNumberStr, UUIDStr
-from common.utils import build_uuid4_str
+from common.utils import build_initial_version, build_uuid4_str
 
 from ..base import Base
 
@@ -20,6 +20,7 @@ class Pokemon(Base):
     sp_atk: Mapped[int | None] = mapped_column(Integer, nullable=True)
     sp_def: Mapped[int | None] = mapped_column(Integer, nullable=True)
     speed: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=build_initial_version)
 
     types: Mapped[list['Type']] = relationship(
         'Type', secondary='pokemon_type', backref='pokemon', lazy='raise', order_by='Type.name'
@@ -1,16 +1,21 @@
-from typing import List
+from typing import AsyncIterator, Dict, List, Tuple
 
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from sqlalchemy.sql import delete, func, insert, select, update
+from sqlalchemy.sql import ColumnElement, Select, delete, insert, or_, select, update
 
-from common.type import PokemonNumberStr
+from common.type import PokemonNumberStr, UUIDStr
+from common.utils import build_initial_version
 from models.exception import PokemonAlreadyExists, PokemonNotFound
 from models.pokemon import (
     CreatePokemonModel,
     GetPokemonParamsModel,
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
     PokemonModel,
-    UpdatePokemonModel,
+    TypeModel,
 )
 
 from ...abstraction import AbstractPokemonRepository
@@ -22,109 +27,290 @@ class RelationalDBPokemonRepository(AbstractPokemonRepository):
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get(self, no: PokemonNumberStr) -> PokemonModel:
-        stmt = (
-            select(Pokemon)
-            .where(Pokemon.no == no)
-            .options(
-                selectinload(Pokemon.types),
+    def _build_load_options(self, include: PokemonIncludeModel) -> List:
+        options = []
+        if include.types:
+            options.append(selectinload(Pokemon.types))
+        if include.previous_evolutions:
+            options.append(
                 selectinload(Pokemon.previous_evolutions).joinedload(
                     PokemonEvolution.previous_pokemon
-                ),
-                selectinload(Pokemon.next_evolutions).joinedload(PokemonEvolution.next_pokemon),
+                )
             )
-        )
+        if include.next_evolutions:
+            options.append(
+                selectinload(Pokemon.next_evolutions).joinedload(PokemonEvolution.next_pokemon)
+            )
+
+        return options
+
+    def _paginate(self, stmt: Select, params: GetPokemonParamsModel | None) -> Select:
+        if params:
+            # keyset pagination: seek past the cursor on the primary key instead of OFFSET
+            if params.after_no is not None:
+                stmt = stmt.where(Pokemon.no > params.after_no)
+            stmt = stmt.limit(params.size)
+
+        return stmt
+
+    def _build_evolution_conditions(
+        self,
+        no: PokemonNumberStr,
+        previous_evolutions: bool = True,
+        next_evolutions: bool = True,
+    ) -> List[ColumnElement[bool]]:
+        """Build conditions matching the Pokemon's previous and/or next evolutions."""
+        conditions = []
+        if previous_evolutions:
+            stmt = select(PokemonEvolution.previous_no).where(PokemonEvolution.next_no == no)
+            conditions.append(Pokemon.no.in_(stmt))
+        if next_evolutions:
+            stmt = select(PokemonEvolution.next_no).where(PokemonEvolution.previous_no == no)
+            conditions.append(Pokemon.no.in_(stmt))
+
+        return conditions
+
+    async def _touch(self, *conditions: ColumnElement[bool]):
+        """Increment the version of the Pokemon matching any of `conditions`."""
+        stmt = update(Pokemon).where(or_(*conditions)).values(version=Pokemon.version + 1)
+        await self.session.execute(stmt)
+
+    async def get(
+        self, no: PokemonNumberStr, include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> PokemonModel:
+        stmt = select(Pokemon).where(Pokemon.no == no).options(*self._build_load_options(include))
         pokemon = (await self.session.execute(stmt)).scalars().one_or_none()
         if not pokemon:
             raise PokemonNotFound(no)
 
-        return PokemonOrmMapper.orm_to_entity(pokemon)
+        return PokemonOrmMapper.orm_to_entity(pokemon, include)
+
+    async def list(
+        self,
+        params: GetPokemonParamsModel | None = None,
+        include: PokemonIncludeModel = PokemonIncludeModel(),
+    ) -> List[PokemonModel]:
+        stmt = select(Pokemon).options(*self._build_load_options(include)).order_by(Pokemon.no)
+        stmt = self._paginate(stmt, params)
+        pokemons = (await self.session.execute(stmt)).scalars().all()
 
-    async def list(self, params: GetPokemonParamsModel | None = None) -> List[PokemonModel]:
-        stmt = select(Pokemon).options(
-            selectinload(Pokemon.types),
-            selectinload(Pokemon.previous_evolutions).joinedload(PokemonEvolution.previous_pokemon),
-            selectinload(Pokemon.next_evolutions).joinedload(PokemonEvolution.next_pokemon),
+        return [PokemonOrmMapper.orm_to_entity(pokemon, include) for pokemon in pokemons]
+
+    async def iter_all(
+        self, include: PokemonIncludeModel = PokemonIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[PokemonModel]:
+        stmt = (
+            select(Pokemon)
+            .options(*self._build_load_options(include))
+            .order_by(Pokemon.no)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.session.stream(stmt)
+        async for pokemons in result.scalars().partitions():
+            for pokemon in pokemons:
+                yield PokemonOrmMapper.orm_to_entity(pokemon, include)
+
+    async def get_many(
+        self, numbers: List[PokemonNumberStr], include: PokemonIncludeModel = PokemonIncludeModel()
+    ) -> Dict[PokemonNumberStr, PokemonModel]:
+        stmt = (
+            select(Pokemon)
+            .where(Pokemon.no.in_(numbers))
+            .options(*self._build_load_options(include))
+            .order_by(Pokemon.no)
         )
-        if params:
-            stmt = stmt.offset((params.page - 1) * params.size).limit(params.size)
         pokemons = (await self.session.execute(stmt)).scalars().all()
 
-        return list(map(PokemonOrmMapper.orm_to_entity, pokemons))
+        return {
+            pokemon.no: PokemonOrmMapper.orm_to_entity(pokemon, include) for pokemon in pokemons
+        }
+
+    async def get_version(self, no: PokemonNumberStr) -> int:
+        stmt = select(Pokemon.version).where(Pokemon.no == no)
+        version = (await self.session.execute(stmt)).scalars().one_or_none()
+        if version is None:
+            raise PokemonNotFound(no)
+
+        return version
+
+    async def list_versions(
+        self, params: GetPokemonParamsModel | None = None
+    ) -> Dict[PokemonNumberStr, int]:
+        stmt = self._paginate(select(Pokemon.no, Pokemon.version).order_by(Pokemon.no), params)
+        rows = (await self.session.execute(stmt)).all()
+
+        return dict(rows)
 
-    async def create(self, data: CreatePokemonModel) -> PokemonNumberStr:
-        stmt = select(func.count(Pokemon.no)).where(Pokemon.no == data.no)
-        count = (await self.session.execute(stmt)).scalars().first()
-        if count and count > 0:
-            raise PokemonAlreadyExists(data.no)
+    async def bulk_create(
+        self,
+        data: List[CreatePokemonModel],
+        evolutions: Dict[PokemonNumberStr, PokemonEvolutionModel],
+    ) -> List[PokemonModel]:
+        if not data:
+            return []
 
-        stmt = insert(Pokemon).values(no=data.no, name=data.name)
+        versions = {item.no: build_initial_version() for item in data}
+        stmt = insert(Pokemon).values(
+            [{'no': item.no, 'name': item.name, 'version': versions[item.no]} for item in data]
+        )
         await self.session.execute(stmt)
 
-        return data.no
+        type_name_to_id_map = await self._get_or_create_type_id_map(
+            [name for item in data for name in item.type_names]
+        )
+        if pokemon_types := [
+            {'pokemon_no': item.no, 'type_id': type_name_to_id_map[name]}
+            for item in data
+            for name in dict.fromkeys(item.type_names)
+        ]:
+            await self.session.execute(insert(PokemonType).values(pokemon_types))
+
+        if evolution_pairs := dict.fromkeys(
+            pair for item in data for pair in item.evolution_pairs()
+        ):
+            stmt = insert(PokemonEvolution).values(
+                [
+                    {'previous_no': previous_no, 'next_no': next_no}
+                    for previous_no, next_no in evolution_pairs
+                ]
+            )
+            await self.session.execute(stmt)
+
+            # existing Pokemon on the other side now show the new ones as evolutions
+            new_numbers = {item.no for item in data}
+            if existing_numbers := {no for pair in evolution_pairs for no in pair} - new_numbers:
+                await self._touch(Pokemon.no.in_(existing_numbers))
+
+        return [
+            PokemonAggregateModel.for_create(item, evolutions).apply_to(
+                None,
+                [
+                    TypeModel(id=UUIDStr.from_trusted(type_name_to_id_map[name]), name=name)
+                    for name in sorted(set(item.type_names))
+                ],
+                versions[item.no],
+            )
+            for item in data
+        ]
+
+    async def _update_returning(self, no: PokemonNumberStr, values: dict) -> Row | None:
+        """Update the Pokemon and return its `name` and `version`, or None if it doesn't exist."""
+        stmt = update(Pokemon).where(Pokemon.no == no).values(**values)
+        if self.session.bind.dialect.update_returning:
+            stmt = stmt.returning(Pokemon.name, Pokemon.version)
+            return (await self.session.execute(stmt)).one_or_none()
+
+        # e.g. MySQL, which has no UPDATE ... RETURNING
+        if (await self.session.execute(stmt)).rowcount == 0:
+            return None
+        stmt = select(Pokemon.name, Pokemon.version).where(Pokemon.no == no)
+        return (await self.session.execute(stmt)).one()
+
+    async def upsert_aggregate(self, aggregate: PokemonAggregateModel) -> PokemonModel:
+        pokemon, version = await self._upsert_pokemon(aggregate)
+        await self._write_evolutions(aggregate)
+        types = await self._write_types(aggregate)
+
+        return aggregate.apply_to(pokemon, types, version)
 
-    async def update(self, no: PokemonNumberStr, data: UpdatePokemonModel):
-        if data.name is not None:
-            stmt = update(Pokemon).where(Pokemon.no == no).values(name=data.name)
-            result = await self.session.execute(stmt)
-            if result.rowcount == 0:
-                raise PokemonNotFound(no)
+    async def _upsert_pokemon(
+        self, aggregate: PokemonAggregateModel
+    ) -> Tuple[PokemonModel | None, int]:
+        """Insert or update the Pokemon row, returning its kept relations and new version."""
+        no = aggregate.no
+        if aggregate.is_new:
+            if (await self.session.execute(select(Pokemon.no).where(Pokemon.no == no))).first():
+                raise PokemonAlreadyExists(no)
+            version = build_initial_version()
+            stmt = insert(Pokemon).values(no=no, name=aggregate.name, version=version)
+            await self.session.execute(stmt)
+            return None, version
+
+        values: dict = {'version': Pokemon.version + 1}
+        if aggregate.name is not None:
+            values['name'] = aggregate.name
+        if (row := await self._update_returning(no, values)) is None:
+            raise PokemonNotFound(no)
+
+        kept_relations = aggregate.kept_relations
+        if kept_relations == PokemonIncludeModel.without_relations():
+            return PokemonModel(no=no, name=row.name), row.version
+        return await self.get(no, kept_relations), row.version
+
+    async def _write_evolutions(self, aggregate: PokemonAggregateModel):
+        """Touch the Pokemon whose evolutions change and replace the aggregate's evolution rows."""
+        no = aggregate.no
+        # the former and the new evolutions on a replaced side, and all of them on a rename
+        renamed = aggregate.name is not None and not aggregate.is_new
+        replaces_previous = aggregate.previous_evolutions is not None
+        replaces_next = aggregate.next_evolutions is not None
+        conditions = []
+        if not aggregate.is_new:
+            conditions += self._build_evolution_conditions(
+                no,
+                previous_evolutions=renamed or replaces_previous,
+                next_evolutions=renamed or replaces_next,
+            )
+        if aggregate.evolution_numbers:
+            conditions.append(Pokemon.no.in_(aggregate.evolution_numbers))
+        if conditions:
+            await self._touch(*conditions)
+
+        if not aggregate.is_new and (replaces_previous or replaces_next):
+            stmt = delete(PokemonEvolution).where(
+                or_(
+                    *([PokemonEvolution.next_no == no] if replaces_previous else []),
+                    *([PokemonEvolution.previous_no == no] if replaces_next else []),
+                )
+            )
+            await self.session.execute(stmt)
+        if evolution_rows := [
+            *(
+                {'previous_no': evo.no, 'next_no': no}
+                for evo in aggregate.previous_evolutions or []
+            ),
+            *({'previous_no': no, 'next_no': evo.no} for evo in aggregate.next_evolutions or []),
+        ]:
+            await self.session.execute(insert(PokemonEvolution).values(evolution_rows))
+
+    async def _write_types(self, aggregate: PokemonAggregateModel) -> List[TypeModel] | None:
+        """Replace the aggregate's type rows, returning its types or None if they're kept."""
+        if aggregate.type_names is None:
+            return None
+
+        no = aggregate.no
+        if not aggregate.is_new:
+            await self.session.execute(delete(PokemonType).where(PokemonType.pokemon_no == no))
+        type_name_to_id_map = await self._get_or_create_type_id_map(aggregate.type_names)
+        if type_name_to_id_map:
+            stmt = insert(PokemonType).values(
+                [{'pokemon_no': no, 'type_id': type_id} for type_id in type_name_to_id_map.values()]
+            )
+            await self.session.execute(stmt)
+
+        return [
+            TypeModel(id=UUIDStr.from_trusted(type_name_to_id_map[name]), name=name)
+            for name in sorted(type_name_to_id_map)
+        ]
 
     async def delete(self, no: PokemonNumberStr):
+        await self._touch(*self._build_evolution_conditions(no))
         stmt = delete(Pokemon).where(Pokemon.no == no)
         result = await self.session.execute(stmt)
         if result.rowcount == 0:
             raise PokemonNotFound(no)
 
-    async def are_existed(self, numbers: List[PokemonNumberStr]) -> bool:
-        stmt = select(func.count(Pokemon.no)).where(Pokemon.no.in_(numbers))
-        count = (await self.session.execute(stmt)).scalars().first()
-
-        return count == len(numbers)
-
-    async def replace_types(self, pokemon_no: PokemonNumberStr, type_names: List[str]):
-        await self.session.execute(delete(PokemonType).where(PokemonType.pokemon_no == pokemon_no))
-
+    async def _get_or_create_type_id_map(self, type_names: List[str]) -> Dict[str, str]:
         stmt = select(Type).where(Type.name.in_(type_names))
         existing_types = (await self.session.execute(stmt)).scalars().all()
-        existing_type_name_to_id_map = {type_.name: type_.id for type_ in existing_types}
+        type_name_to_id_map = {type_.name: type_.id for type_ in existing_types}
 
         to_be_created_names = [
-            name for name in type_names if name not in existing_type_name_to_id_map
+            name for name in dict.fromkeys(type_names) if name not in type_name_to_id_map
         ]
         if new_types := [Type(name=name) for name in to_be_created_names]:
             self.session.add_all(new_types)
             await self.session.flush()
+            type_name_to_id_map.update((type_.name, type_.id) for type_ in new_types)
 
-        stmt = insert(PokemonType).values(
-            [
-                {'pokemon_no': pokemon_no, 'type_id': type_id}
-                for type_id in list(existing_type_name_to_id_map.values())
-                + [type_.id for type_ in new_types]
-            ]
-        )
-        await self.session.execute(stmt)
-
-    async def replace_previous_evolutions(
-        self, pokemon_no: PokemonNumberStr, previous_evolution_numbers: List[PokemonNumberStr]
-    ):
-        stmt = delete(PokemonEvolution).where(PokemonEvolution.next_no == pokemon_no)
-        await self.session.execute(stmt)
-
-        if previous_evolution_numbers:
-            stmt = insert(PokemonEvolution).values(
-                [{'previous_no': no, 'next_no': pokemon_no} for no in previous_evolution_numbers]
-            )
-            await self.session.execute(stmt)
-
-    async def replace_next_evolutions(
-        self, pokemon_no: PokemonNumberStr, next_evolution_numbers: List[PokemonNumberStr]
-    ):
-        stmt = delete(PokemonEvolution).where(PokemonEvolution.previous_no == pokemon_no)
-        await self.session.execute(stmt)
-
-        if next_evolution_numbers:
-            stmt = insert(PokemonEvolution).values(
-                [{'previous_no': pokemon_no, 'next_no': no} for no in next_evolution_numbers]
-            )
-            await self.session.execute(stmt)
+        return type_name_to_id_map
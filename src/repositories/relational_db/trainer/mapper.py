@@ -1,25 +1,36 @@
 from common.docstring import MAPPER_DOCSTRING
-from models.trainer import TrainerModel, TrainerPokemonModel
+from common.type import PokemonNumberStr, UUIDStr
+from models.trainer import TrainerIncludeModel, TrainerModel, TrainerPokemonModel
 
-from .orm import Trainer
+from .orm import Trainer, TrainerPokemon
 
 __doc__ = MAPPER_DOCSTRING
 
 
 class TrainerOrmMapper:
     @staticmethod
-    def orm_to_entity(trainer: Trainer) -> TrainerModel:
+    def orm_to_entity(
+        trainer: Trainer, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerModel:
+        # the team is never loaded (lazy='raise') when it isn't included, so don't touch it
         return TrainerModel(
-            id=trainer.id,
+            id=UUIDStr.from_trusted(trainer.id),
             name=trainer.name,
             region=trainer.region,
             badge_count=trainer.badge_count,
             team=[
-                TrainerPokemonModel(
-                    no=tp.pokemon.no,
-                    name=tp.pokemon.name,
-                )
-                for tp in trainer.team
+                TrainerPokemonOrmMapper.orm_to_entity(tp)
+                for tp in (trainer.team if include.team else [])
                 if tp.pokemon
             ],
+            version=trainer.version,
+        )
+
+
+class TrainerPokemonOrmMapper:
+    @staticmethod
+    def orm_to_entity(trainer_pokemon: TrainerPokemon) -> TrainerPokemonModel:
+        return TrainerPokemonModel(
+            no=PokemonNumberStr.from_trusted(trainer_pokemon.pokemon.no),
+            name=trainer_pokemon.pokemon.name,
         )
@@ -1,8 +1,8 @@
-from sqlalchemy import ForeignKey, Integer, String
+from sqlalchemy import BigInteger, ForeignKey, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from common.type import UUIDStr
-from common.utils import build_uuid4_str
+from common.utils import build_initial_version, build_uuid4_str
 
 from ..base import Base
 from ..pokemon.orm import Pokemon
@@ -15,6 +15,7 @@ class Trainer(Base):
     name: Mapped[str] = mapped_column(String(256))
     region: Mapped[str] = mapped_column(String(256))
     badge_count: Mapped[int] = mapped_column(Integer, default=0)
+    version: Mapped[int] = mapped_column(BigInteger, default=build_initial_version)
 
     team: Mapped[list['TrainerPokemon']] = relationship(
         'TrainerPokemon',
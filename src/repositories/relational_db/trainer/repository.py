@@ -1,20 +1,29 @@
 # pylint: disable=duplicate-code
-from typing import List
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy.sql import delete, insert, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql import ColumnElement, delete, func, insert, literal, select, update
 
 from common.type import PokemonNumberStr, UUIDStr
-from models.exception import TrainerNotFound
+from models.exception import (
+    TrainerAlreadyOwnsPokemon,
+    TrainerDoesNotOwnPokemon,
+    TrainerNotFound,
+    TrainerTeamFullError,
+)
 from models.trainer import (
+    MAX_TEAM_SIZE,
     CreateTrainerModel,
+    TrainerIncludeModel,
     TrainerModel,
+    TrainerPokemonModel,
     UpdateTrainerModel,
 )
 
 from ...abstraction import AbstractTrainerRepository
-from .mapper import TrainerOrmMapper
+from .mapper import TrainerOrmMapper, TrainerPokemonOrmMapper
 from .orm import Trainer, TrainerPokemon
 
 
@@ -22,26 +31,112 @@ class RelationalDBTrainerRepository(AbstractTrainerRepository):
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    def _select_with_team(self):
-        return select(Trainer).options(
-            selectinload(Trainer.team).joinedload(TrainerPokemon.pokemon)
+    def _select(self, include: TrainerIncludeModel):
+        stmt = select(Trainer)
+        if include.team:
+            stmt = stmt.options(selectinload(Trainer.team).joinedload(TrainerPokemon.pokemon))
+
+        return stmt
+
+    async def _touch(self, condition: ColumnElement[bool]):
+        """Increment the version of the Trainers matching `condition`."""
+        stmt = update(Trainer).where(condition).values(version=Trainer.version + 1)
+        await self.session.execute(stmt)
+
+    async def _touch_returning(self, id: UUIDStr, **values) -> int:
+        """Increment the Trainer's version, along with setting `values`, and return it."""
+        stmt = update(Trainer).where(Trainer.id == id).values(**values, version=Trainer.version + 1)
+        if self.session.bind.dialect.update_returning:
+            stmt = stmt.returning(Trainer.version)
+            if (version := (await self.session.execute(stmt)).scalar_one_or_none()) is None:
+                raise TrainerNotFound(id)
+            return version
+
+        # e.g. MySQL, which has no UPDATE ... RETURNING
+        if (await self.session.execute(stmt)).rowcount == 0:
+            raise TrainerNotFound(id)
+        return await self.get_version(id)
+
+    async def _get_written(self, id: UUIDStr) -> TrainerModel:
+        """Re-select the Trainer after a write, while its row is still locked."""
+        # overwrites a Trainer loaded before the write, along with its team
+        stmt = (
+            self._select(TrainerIncludeModel(team=True))
+            .where(Trainer.id == id)
+            .execution_options(populate_existing=True)
         )
+        trainer = (await self.session.execute(stmt)).scalars().one()
 
-    async def get(self, id: UUIDStr) -> TrainerModel:
-        stmt = self._select_with_team().where(Trainer.id == id)
+        return TrainerOrmMapper.orm_to_entity(trainer)
+
+    async def get(
+        self, id: UUIDStr, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> TrainerModel:
+        stmt = self._select(include).where(Trainer.id == id)
         trainer = (await self.session.execute(stmt)).scalars().one_or_none()
         if not trainer:
             raise TrainerNotFound(id)
 
-        return TrainerOrmMapper.orm_to_entity(trainer)
+        return TrainerOrmMapper.orm_to_entity(trainer, include)
+
+    async def get_many(
+        self, ids: List[UUIDStr], include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> Dict[UUIDStr, TrainerModel]:
+        stmt = self._select(include).where(Trainer.id.in_(ids))
+        trainers = (await self.session.execute(stmt)).scalars().all()
 
-    async def list(self) -> List[TrainerModel]:
-        stmt = self._select_with_team()
+        return {
+            trainer.id: TrainerOrmMapper.orm_to_entity(trainer, include) for trainer in trainers
+        }
+
+    async def list(
+        self, include: TrainerIncludeModel = TrainerIncludeModel()
+    ) -> List[TrainerModel]:
+        stmt = self._select(include).order_by(Trainer.id)
         trainers = (await self.session.execute(stmt)).scalars().unique().all()
 
-        return list(map(TrainerOrmMapper.orm_to_entity, trainers))
+        return [TrainerOrmMapper.orm_to_entity(trainer, include) for trainer in trainers]
+
+    async def iter_all(
+        self, include: TrainerIncludeModel = TrainerIncludeModel(), chunk_size: int = 1000
+    ) -> AsyncIterator[TrainerModel]:
+        stmt = self._select(include).order_by(Trainer.id).execution_options(yield_per=chunk_size)
+        result = await self.session.stream(stmt)
+        async for trainers in result.scalars().partitions():
+            for trainer in trainers:
+                yield TrainerOrmMapper.orm_to_entity(trainer, include)
+
+    async def get_teams(self, ids: List[UUIDStr]) -> Dict[UUIDStr, List[TrainerPokemonModel]]:
+        stmt = (
+            select(TrainerPokemon)
+            .where(TrainerPokemon.trainer_id.in_(ids))
+            .options(joinedload(TrainerPokemon.pokemon))
+            .order_by(TrainerPokemon.pokemon_no)
+        )
+        trainer_pokemons = (await self.session.execute(stmt)).scalars().all()
+
+        teams = defaultdict(list)
+        for tp in trainer_pokemons:
+            if tp.pokemon:
+                teams[tp.trainer_id].append(TrainerPokemonOrmMapper.orm_to_entity(tp))
 
-    async def create(self, data: CreateTrainerModel) -> UUIDStr:
+        return {id: teams[id] for id in ids}
+
+    async def get_version(self, id: UUIDStr) -> int:
+        stmt = select(Trainer.version).where(Trainer.id == id)
+        version = (await self.session.execute(stmt)).scalars().one_or_none()
+        if version is None:
+            raise TrainerNotFound(id)
+
+        return version
+
+    async def list_versions(self) -> Dict[UUIDStr, int]:
+        stmt = select(Trainer.id, Trainer.version).order_by(Trainer.id)
+        rows = (await self.session.execute(stmt)).all()
+
+        return dict(rows)
+
+    async def create(self, data: CreateTrainerModel) -> TrainerModel:
         trainer = Trainer(
             name=data.name,
             region=data.region,
@@ -50,9 +145,10 @@ class RelationalDBTrainerRepository(AbstractTrainerRepository):
         self.session.add(trainer)
         await self.session.flush()
 
-        return trainer.id
+        # a new Trainer has no team to load
+        return TrainerOrmMapper.orm_to_entity(trainer, TrainerIncludeModel(team=False))
 
-    async def update(self, id: UUIDStr, data: UpdateTrainerModel):
+    async def update(self, id: UUIDStr, data: UpdateTrainerModel) -> int:
         values = {}
         if data.name is not None:
             values['name'] = data.name
@@ -62,10 +158,9 @@ class RelationalDBTrainerRepository(AbstractTrainerRepository):
             values['badge_count'] = data.badge_count
 
         if values:
-            stmt = update(Trainer).where(Trainer.id == id).values(**values)
-            result = await self.session.execute(stmt)
-            if result.rowcount == 0:
-                raise TrainerNotFound(id)
+            return await self._touch_returning(id, **values)
+
+        return await self.get_version(id)
 
     async def delete(self, id: UUIDStr):
         stmt = delete(Trainer).where(Trainer.id == id)
@@ -73,17 +168,50 @@ class RelationalDBTrainerRepository(AbstractTrainerRepository):
         if result.rowcount == 0:
             raise TrainerNotFound(id)
 
-    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
-        stmt = insert(TrainerPokemon).values(trainer_id=trainer_id, pokemon_no=pokemon_no)
-        await self.session.execute(stmt)
-
-    async def remove_from_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr):
+    async def add_to_team(self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr) -> TrainerModel:
+        # locks the Trainer's row first, so that concurrent catches for it see each other's team
+        await self._touch_returning(trainer_id)
+
+        team = select(TrainerPokemon.pokemon_no).where(TrainerPokemon.trainer_id == trainer_id)
+        team_size = select(func.count()).select_from(team.subquery()).scalar_subquery()
+        owned = team.where(TrainerPokemon.pokemon_no == pokemon_no).exists()
+        stmt = insert(TrainerPokemon).from_select(
+            ['trainer_id', 'pokemon_no'],
+            select(literal(trainer_id), literal(pokemon_no)).where(
+                team_size < MAX_TEAM_SIZE, ~owned
+            ),
+        )
+        if (await self.session.execute(stmt)).rowcount == 0:
+            if (await self.session.execute(select(owned))).scalar():
+                raise TrainerAlreadyOwnsPokemon(
+                    f'Trainer {trainer_id} already owns Pokemon {pokemon_no}'
+                )
+            raise TrainerTeamFullError(f'Trainer {trainer_id} team is full')
+
+        return await self._get_written(trainer_id)
+
+    async def remove_from_team(
+        self, trainer_id: UUIDStr, pokemon_no: PokemonNumberStr
+    ) -> TrainerModel:
         stmt = delete(TrainerPokemon).where(
             TrainerPokemon.trainer_id == trainer_id,
             TrainerPokemon.pokemon_no == pokemon_no,
         )
-        await self.session.execute(stmt)
+        if (await self.session.execute(stmt)).rowcount == 0:
+            # raises `TrainerNotFound` first
+            await self.get_version(trainer_id)
+            raise TrainerDoesNotOwnPokemon(
+                f'Trainer {trainer_id} does not own Pokemon {pokemon_no}'
+            )
+        await self._touch_returning(trainer_id)
+
+        return await self._get_written(trainer_id)
 
     async def remove_pokemon_from_all_teams(self, pokemon_no: PokemonNumberStr):
+        await self.touch_pokemon_owners(pokemon_no)
         stmt = delete(TrainerPokemon).where(TrainerPokemon.pokemon_no == pokemon_no)
         await self.session.execute(stmt)
+
+    async def touch_pokemon_owners(self, pokemon_no: PokemonNumberStr):
+        owner_ids = select(TrainerPokemon.trainer_id).where(TrainerPokemon.pokemon_no == pokemon_no)
+        await self._touch(Trainer.id.in_(owner_ids))
@@ -7,9 +7,61 @@ APP_VERSION = '4'
 # enable/disable logging of SQL statements
 SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', '').lower() == 'true'
 
-# set the isolation level for the database connection
+# set the isolation level for the database connection; team sizes hold under READ COMMITTED too,
+# as catches lock the Trainer and guard their insert
 SQLALCHEMY_ISOLATION_LEVEL = os.environ.get('SQLALCHEMY_ISOLATION_LEVEL') or 'SERIALIZABLE'
 
+# connection pool of the relational databases, per worker process; the defaults are SQLAlchemy's.
+# Each worker may open up to POOL_SIZE + MAX_OVERFLOW connections, and waits up to POOL_TIMEOUT
+# seconds for one beyond that; connections older than POOL_RECYCLE seconds are replaced (-1: never)
+SQLALCHEMY_POOL_SIZE = int(os.environ.get('SQLALCHEMY_POOL_SIZE') or 5)
+SQLALCHEMY_MAX_OVERFLOW = int(os.environ.get('SQLALCHEMY_MAX_OVERFLOW') or 10)
+SQLALCHEMY_POOL_TIMEOUT = float(os.environ.get('SQLALCHEMY_POOL_TIMEOUT') or 30)
+SQLALCHEMY_POOL_RECYCLE = int(os.environ.get('SQLALCHEMY_POOL_RECYCLE') or -1)
+# test connections with a ping on checkout, e.g. when the server drops idle ones
+SQLALCHEMY_POOL_PRE_PING = os.environ.get('SQLALCHEMY_POOL_PRE_PING', '').lower() == 'true'
+# connections each worker opens and checks at startup, before reporting ready (up to POOL_SIZE)
+SQLALCHEMY_POOL_WARMUP_SIZE = int(
+    os.environ.get('SQLALCHEMY_POOL_WARMUP_SIZE') or SQLALCHEMY_POOL_SIZE
+)
+
+# encode REST responses straight from the domain models, skipping response-model revalidation
+REST_FAST_JSON = os.environ.get('REST_FAST_JSON', '').lower() == 'true'
+
+# in-process LRU cache of Pokemon reads; set POKEMON_CACHE_MAX_SIZE=0 to disable it
+POKEMON_CACHE_MAX_SIZE = int(os.environ.get('POKEMON_CACHE_MAX_SIZE') or 1024)
+POKEMON_CACHE_TTL_SECONDS = float(os.environ.get('POKEMON_CACHE_TTL_SECONDS') or 60)
+# Pokemon loaded into that cache at startup, from the start of the listing; 0 loads none
+POKEMON_CACHE_WARMUP_SIZE = int(os.environ.get('POKEMON_CACHE_WARMUP_SIZE') or 0)
+
+# pre-encoded pages of the REST Pokemon listing; set POKEMON_SNAPSHOT_MAX_SIZE=0 to disable them
+POKEMON_SNAPSHOT_MAX_SIZE = int(os.environ.get('POKEMON_SNAPSHOT_MAX_SIZE') or 64)
+POKEMON_SNAPSHOT_TTL_SECONDS = float(os.environ.get('POKEMON_SNAPSHOT_TTL_SECONDS') or 300)
+
+# optional Redis shared by all workers as a second-level cache, e.g. redis://<host>:<port>/1;
+# leave unset to keep caching per process
+CACHE_REDIS_URI = os.environ.get('CACHE_REDIS_URI', '')
+CACHE_REDIS_TTL_SECONDS = float(os.environ.get('CACHE_REDIS_TTL_SECONDS') or 300)
+
+# connection pool of each Redis client, per worker process: commands wait up to POOL_TIMEOUT seconds
+# for one of MAX_CONNECTIONS connections, and connections idle for longer than HEALTH_CHECK_INTERVAL
+# seconds are pinged before reuse; a SOCKET_TIMEOUT of 0 waits on replies indefinitely
+REDIS_MAX_CONNECTIONS = int(os.environ.get('REDIS_MAX_CONNECTIONS') or 50)
+REDIS_POOL_TIMEOUT = float(os.environ.get('REDIS_POOL_TIMEOUT') or 20)
+REDIS_SOCKET_TIMEOUT = float(os.environ.get('REDIS_SOCKET_TIMEOUT') or 0) or None
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.environ.get('REDIS_SOCKET_CONNECT_TIMEOUT') or 5)
+REDIS_SOCKET_KEEPALIVE = os.environ.get('REDIS_SOCKET_KEEPALIVE', 'true').lower() == 'true'
+REDIS_HEALTH_CHECK_INTERVAL = int(os.environ.get('REDIS_HEALTH_CHECK_INTERVAL') or 30)
+
+# a write usecase whose unit of work conflicts with a concurrent one (the keys it read on Redis
+# changed before it committed) is run again up to CONFLICT_RETRIES times, after a random pause of
+# up to RETRY_BACKOFF_SECONDS, doubled on each attempt. A Redis unit of work holds a connection for
+# its WATCHed keys on top of those it reads with, so leave room for both in REDIS_MAX_CONNECTIONS
+UNIT_OF_WORK_CONFLICT_RETRIES = int(os.environ.get('UNIT_OF_WORK_CONFLICT_RETRIES') or 3)
+UNIT_OF_WORK_RETRY_BACKOFF_SECONDS = float(
+    os.environ.get('UNIT_OF_WORK_RETRY_BACKOFF_SECONDS') or 0.01
+)
+
 # database connection string, e.g.:
 # - sqlite+aiosqlite:///sqlite.db (SQLite3)
 # - sqlite+aiosqlite:///:memory: (SQLite3 in-memory)
@@ -22,3 +74,16 @@ SQLALCHEMY_ISOLATION_LEVEL = os.environ.get('SQLALCHEMY_ISOLATION_LEVEL') or 'SE
 #   sqlite+aiosqlite:///sqlite.db?reinitialize=true
 
 DATABASE_URI = os.environ.get('DATABASE_URI', 'sqlite+aiosqlite:///:memory:')
+
+# optional read replicas of a relational DATABASE_URI, comma-separated; read-only usecases are
+# served by one of them, picked by "round_robin" or "least_connections" (fewest checked out).
+# Replicas lag behind, so what they serve may be briefly outdated; the caches load their misses
+# from the primary instead, so they never store what a replica hasn't caught up on yet
+DATABASE_REPLICA_URIS = [
+    uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URIS', '').split(',') if uri.strip()
+]
+DATABASE_REPLICA_SELECTION = os.environ.get('DATABASE_REPLICA_SELECTION') or 'round_robin'
+# e.g. PostgreSQL standbys don't allow SERIALIZABLE transactions
+SQLALCHEMY_REPLICA_ISOLATION_LEVEL = (
+    os.environ.get('SQLALCHEMY_REPLICA_ISOLATION_LEVEL') or SQLALCHEMY_ISOLATION_LEVEL
+)
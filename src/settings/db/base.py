@@ -1,5 +1,23 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator
 from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
 
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.connection import AbstractConnection
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from .. import (
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_SOCKET_KEEPALIVE,
+    REDIS_SOCKET_TIMEOUT,
+)
+
 
 def normalize_uri(database_uri: str) -> str:
     parsed_uri = urlparse(database_uri)
@@ -19,3 +37,87 @@ def has_reinitialize(database_uri: str) -> bool:
     reinitialize_values = query_params.get('reinitialize', [])
 
     return False if not reinitialize_values else reinitialize_values[0].lower() == 'true'
+
+
+class CheckoutStatsMixin:
+    """Counts the checkouts of a connection pool, how long they wait, and how many time out.
+
+    Pools record each checkout within `_record_checkout` and increment `timeouts` themselves, as
+    each library raises its own error when the pool is exhausted.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @contextmanager
+    def _record_checkout(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def _checkout_stats(self) -> dict:
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_seconds_total': self.wait_seconds_total,
+            'wait_seconds_max': self.wait_seconds_max,
+        }
+
+
+class InstrumentedBlockingConnectionPool(CheckoutStatsMixin, BlockingConnectionPool):
+    """Blocking pool that also records how long commands wait for a connection, and how often in vain."""
+
+    async def get_connection(self, *args, **kwargs) -> AbstractConnection:
+        with self._record_checkout():
+            try:
+                return await super().get_connection(*args, **kwargs)
+            except RedisConnectionError as exc:
+                # as opposed to failing to connect
+                if isinstance(exc.__cause__, asyncio.TimeoutError):
+                    self.timeouts += 1
+                raise
+
+    def stats(self) -> dict:
+        # pylint: disable=protected-access
+        return {
+            'max_connections': self.max_connections,
+            'in_use': len(self._in_use_connections),
+            'idle': len(self._available_connections),
+            **self._checkout_stats(),
+        }
+
+
+def get_redis_pool_stats(client: AsyncRedis) -> dict | None:
+    pool = client.connection_pool
+    # e.g. a client given a pool of its own
+    if not isinstance(pool, InstrumentedBlockingConnectionPool):
+        return None
+
+    return pool.stats()
+
+
+def create_async_redis(uri: str) -> AsyncRedis:
+    """Return a client that is meant to be shared: each command borrows a pooled connection."""
+    connection_pool = InstrumentedBlockingConnectionPool.from_url(
+        normalize_uri(uri),
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=REDIS_SOCKET_KEEPALIVE,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        encoding='utf-8',
+        decode_responses=True,
+        retry_on_error=[RedisConnectionError],
+    )
+
+    return AsyncRedis.from_pool(connection_pool)
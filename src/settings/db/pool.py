@@ -0,0 +1,89 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+from .. import (
+    SQLALCHEMY_MAX_OVERFLOW,
+    SQLALCHEMY_POOL_PRE_PING,
+    SQLALCHEMY_POOL_RECYCLE,
+    SQLALCHEMY_POOL_SIZE,
+    SQLALCHEMY_POOL_TIMEOUT,
+    SQLALCHEMY_POOL_WARMUP_SIZE,
+)
+from .base import CheckoutStatsMixin
+
+
+class InstrumentedAsyncQueuePool(CheckoutStatsMixin, AsyncAdaptedQueuePool):
+    """
+    Queue pool that also records how long checkouts wait and how many of them time out.
+
+    The counters live on the pool, so they start over when the engine is disposed and replaces it.
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        with self._record_checkout():
+            try:
+                return super().connect()
+            except PoolTimeoutError:
+                self.timeouts += 1
+                raise
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size(),
+            'checked_out': self.checkedout(),
+            'idle': self.checkedin(),
+            # negative while the pool hasn't opened `size` connections yet
+            'overflow': max(self.overflow(), 0),
+            'max_overflow': self._max_overflow,
+            **self._checkout_stats(),
+        }
+
+
+def build_pool_options() -> dict:
+    """Return the `create_async_engine` arguments of a pool sized by the `SQLALCHEMY_*` settings."""
+    return {
+        'poolclass': InstrumentedAsyncQueuePool,
+        'pool_size': SQLALCHEMY_POOL_SIZE,
+        'max_overflow': SQLALCHEMY_MAX_OVERFLOW,
+        'pool_timeout': SQLALCHEMY_POOL_TIMEOUT,
+        'pool_recycle': SQLALCHEMY_POOL_RECYCLE,
+        'pool_pre_ping': SQLALCHEMY_POOL_PRE_PING,
+    }
+
+
+def get_pool_stats(async_engine: AsyncEngine) -> dict | None:
+    pool = async_engine.pool
+    # e.g. the single shared connection of an in-memory SQLite database
+    if not isinstance(pool, InstrumentedAsyncQueuePool):
+        return None
+
+    return pool.stats()
+
+
+async def warm_up_pool(async_engine: AsyncEngine, size: int = SQLALCHEMY_POOL_WARMUP_SIZE):
+    """Open up to `size` pooled connections at once and run a health query on each.
+
+    They are all checked out together, so the pool opens new ones rather than reusing the first,
+    and they stay in the pool when returned; a failing query fails the startup.
+    """
+    pool = async_engine.pool
+    if not isinstance(pool, InstrumentedAsyncQueuePool) or (size := min(size, pool.size())) < 1:
+        return
+
+    connections: list[AsyncConnection] = []
+
+    async def check_connection():
+        connections.append(connection := await async_engine.connect().start())
+        await connection.execute(text('SELECT 1'))
+
+    try:
+        async with asyncio.TaskGroup() as task_group:
+            for _ in range(size):
+                task_group.create_task(check_connection())
+    finally:
+        for connection in connections:
+            await connection.close()
@@ -12,11 +12,13 @@ from sqlalchemy.orm import DeclarativeBase
 
 from .. import DATABASE_URI, SQLALCHEMY_ECHO, SQLALCHEMY_ISOLATION_LEVEL
 from .base import has_reinitialize, normalize_uri
+from .pool import build_pool_options
 
 AsyncPostgreSQLEngine = create_async_engine(
     normalize_uri(DATABASE_URI),
     echo=SQLALCHEMY_ECHO,
     isolation_level=SQLALCHEMY_ISOLATION_LEVEL,
+    **build_pool_options(),
 )
 AsyncPostgreSQLScopedSession = async_scoped_session(
     async_sessionmaker(
@@ -42,8 +44,6 @@ async def initialize_postgres_db(declarative_base: Type[DeclarativeBase]):
         # create tables
         await connection.run_sync(metadata.create_all)
 
-    await async_engine.dispose()
-
 
 def get_async_postgresql_session() -> AsyncSession:
     return AsyncPostgreSQLScopedSession()
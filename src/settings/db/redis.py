@@ -1,21 +1,19 @@
+from typing import Sequence
+
 from redis.asyncio import Redis as AsyncRedis
-from redis.exceptions import ConnectionError as RedisConnectionError
 
 from .. import DATABASE_URI
-from .base import has_reinitialize, normalize_uri
+from .base import create_async_redis, has_reinitialize
 
 CHUNK_SIZE = 5000
+POKEMON_INDEX_KEY = 'POKEMON:INDEX'
+TRAINER_INDEX_KEY = 'TRAINER:INDEX'
 
 
-async_redis = AsyncRedis.from_url(
-    normalize_uri(DATABASE_URI),
-    encoding='utf-8',
-    decode_responses=True,
-    retry_on_error=[RedisConnectionError],
-)
+async_redis = create_async_redis(DATABASE_URI)
 
 
-async def initialize_redis():
+async def initialize_redis(scripts: Sequence[str] = ()):
     if has_reinitialize(DATABASE_URI):
         async with async_redis.client() as client:
             cursor = '0'
@@ -24,6 +22,69 @@ async def initialize_redis():
                 if keys:
                     await client.delete(*keys)
 
+    # warm the script cache so the first EVAL of each script doesn't compile it
+    async with async_redis.client() as client:
+        for script in scripts:
+            await client.script_load(script)
+
+
+# KEYS: INFO, POKEMON:INDEX
+# ARGV: no
+BACKFILL_POKEMON_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('ZADD', KEYS[2], tonumber(ARGV[1]), ARGV[1])
+end
+"""
+
+# KEYS: INFO, TEAM, TRAINER:INDEX
+# ARGV: id
+BACKFILL_TRAINER_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('SADD', KEYS[3], ARGV[1])
+    for _, number in ipairs(redis.call('SMEMBERS', KEYS[2])) do
+        redis.call('SADD', 'POKEMON:' .. number .. ':OWNERS', ARGV[1])
+    end
+end
+"""
+
+
+async def backfill_redis_indexes():
+    """Index entities written before the listing indexes existed.
+
+    A one-off migration (`make redis-backfill-indexes`), run once when upgrading rather than on
+    every worker start: it scans the whole keyspace. Each entity is indexed by a script that checks
+    it still exists, so one deleted meanwhile isn't indexed again.
+    """
+    async with async_redis.client() as client:
+        async with client.pipeline(transaction=False) as pipe:
+            async for key in client.scan_iter(match='POKEMON:*:INFO', count=CHUNK_SIZE):
+                no = key.split(':')[1]
+                pipe.eval(BACKFILL_POKEMON_SCRIPT, 2, key, POKEMON_INDEX_KEY, no)
+                if len(pipe) >= CHUNK_SIZE:
+                    await pipe.execute()
+            async for key in client.scan_iter(match='TRAINER:*:INFO', count=CHUNK_SIZE):
+                id = key.split(':')[1]
+                team_key = f'TRAINER:{id}:TEAM'
+                pipe.eval(BACKFILL_TRAINER_SCRIPT, 3, key, team_key, TRAINER_INDEX_KEY, id)
+                if len(pipe) >= CHUNK_SIZE:
+                    await pipe.execute()
+            await pipe.execute()
+
+
+async def rebuild_redis_indexes():
+    """Drop every derived index key and rebuild it from the INFO and TEAM keys.
+
+    Meant as an offline repair (`make redis-rebuild-indexes`) when indexes drift, e.g. after keys
+    were edited by hand; concurrent writes during the rebuild may be lost from the indexes.
+    """
+    async with async_redis.client() as client:
+        keys = [POKEMON_INDEX_KEY, TRAINER_INDEX_KEY]
+        keys += [key async for key in client.scan_iter(match='POKEMON:*:OWNERS', count=CHUNK_SIZE)]
+        await client.delete(*keys)
+
+    await backfill_redis_indexes()
+
 
 def get_async_redis_client() -> AsyncRedis:
-    return async_redis.client()
+    # shared by every unit of work of the worker, so it is never closed by them
+    return async_redis
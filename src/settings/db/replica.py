@@ -0,0 +1,91 @@
+from itertools import count
+
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import ORMExecuteState, Session
+from sqlalchemy.pool import QueuePool
+
+from .. import (
+    DATABASE_REPLICA_SELECTION,
+    DATABASE_REPLICA_URIS,
+    SQLALCHEMY_ECHO,
+    SQLALCHEMY_REPLICA_ISOLATION_LEVEL,
+)
+from .pool import build_pool_options
+
+REPLICA_SELECTIONS = ('round_robin', 'least_connections')
+
+
+class ReplicaSet:
+    """
+    Read replicas of the relational database, handing out sessions that refuse to write.
+
+    Each session is bound to the next replica in turn, or, with "least_connections", to the one
+    with the fewest connections checked out, ties going to the next in turn.
+    """
+
+    def __init__(self, engines: list[AsyncEngine], selection: str = 'round_robin'):
+        if selection not in REPLICA_SELECTIONS:
+            raise ValueError(
+                f"Invalid replica selection '{selection}', expected one of {REPLICA_SELECTIONS}"
+            )
+
+        self.engines = engines
+        self.selection = selection
+        self._turns = count()
+        self._sessionmaker = async_sessionmaker(
+            expire_on_commit=False, autoflush=False, autocommit=False, class_=AsyncSession
+        )
+
+    def choose(self) -> AsyncEngine:
+        turn = next(self._turns) % len(self.engines)
+        engines = self.engines[turn:] + self.engines[:turn]
+        if self.selection == 'least_connections':
+            return min(engines, key=_count_checked_out)
+
+        return engines[0]
+
+    def create_session(self) -> AsyncSession:
+        session = self._sessionmaker(bind=self.choose())
+        event.listen(session.sync_session, 'do_orm_execute', _reject_write_statements)
+        event.listen(session.sync_session, 'before_flush', _reject_flushed_changes)
+
+        return session
+
+
+def _count_checked_out(engine: AsyncEngine) -> int:
+    pool = engine.pool
+    # e.g. the single shared connection of an in-memory SQLite database
+    return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+
+def _reject_write_statements(orm_execute_state: ORMExecuteState):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        raise InvalidRequestError(
+            f'Refusing to run {orm_execute_state.statement.__visit_name__!r} on a read replica'
+        )
+
+
+def _reject_flushed_changes(session: Session, flush_context, instances):
+    if session.new or session.dirty or session.deleted:
+        raise InvalidRequestError('Refusing to flush changes to a read replica')
+
+
+replica_set = ReplicaSet(
+    [
+        create_async_engine(
+            uri,
+            echo=SQLALCHEMY_ECHO,
+            isolation_level=SQLALCHEMY_REPLICA_ISOLATION_LEVEL,
+            **build_pool_options(),
+        )
+        for uri in DATABASE_REPLICA_URIS
+    ],
+    DATABASE_REPLICA_SELECTION,
+)
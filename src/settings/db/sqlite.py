@@ -1,7 +1,7 @@
 from asyncio import current_task
 from typing import AsyncGenerator, Type
 
-from sqlalchemy import event
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     async_scoped_session,
@@ -13,11 +13,16 @@ from sqlalchemy.sql import text
 
 from .. import DATABASE_URI, SQLALCHEMY_ECHO, SQLALCHEMY_ISOLATION_LEVEL
 from .base import has_reinitialize
+from .pool import build_pool_options
+
+# an in-memory database lives in its one connection, so it keeps the default single-connection pool
+IS_IN_MEMORY = make_url(DATABASE_URI).database in (None, '', ':memory:')
 
 AsyncSQLiteEngine = create_async_engine(
     DATABASE_URI,
     echo=SQLALCHEMY_ECHO,
     isolation_level=SQLALCHEMY_ISOLATION_LEVEL,
+    **({} if IS_IN_MEMORY else build_pool_options()),
 )
 AsyncSQLiteScopedSession = async_scoped_session(
     async_sessionmaker(
@@ -53,12 +58,6 @@ async def initialize_sqlite_db(
         # create tables
         await connection.run_sync(metadata.create_all)
 
-    if (
-        f'{async_engine.url.get_backend_name()}:///{async_engine.url.database}'
-        != 'sqlite:///:memory:'
-    ):
-        await async_engine.dispose()
-
 
 def get_async_sqlite_session() -> AsyncSession:
     return AsyncSQLiteScopedSession()
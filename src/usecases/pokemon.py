@@ -1,60 +1,245 @@
+from dataclasses import replace
+from typing import AsyncIterator, KeysView
+
 from common.type import PokemonNumberStr
-from di.unit_of_work import AbstractUnitOfWork
-from models.exception import PokemonNotFound
-from models.pokemon import CreatePokemonModel, PokemonModel, UpdatePokemonModel
+from di.unit_of_work import AbstractUnitOfWork, retry_on_conflict
+from models.exception import PokemonAlreadyExists, PokemonError, PokemonNotFound
+from models.pokemon import (
+    CreatePokemonErrorModel,
+    CreatePokemonModel,
+    CreatePokemonsResultModel,
+    GetPokemonParamsModel,
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
+    PokemonModel,
+    PokemonPageModel,
+    PokemonVersionPageModel,
+    UpdatePokemonModel,
+)
 
 
+@retry_on_conflict
 async def create_pokemon(
     async_unit_of_work: AbstractUnitOfWork, data: CreatePokemonModel
 ) -> PokemonModel:
     async with async_unit_of_work as auow:
-        no = await auow.pokemon_repo.create(data)
-        await auow.pokemon_repo.replace_types(no, data.type_names)
+        evolutions = await _get_evolutions(
+            auow, data.previous_evolution_numbers + data.next_evolution_numbers
+        )
+
+        return await auow.pokemon_repo.upsert_aggregate(
+            PokemonAggregateModel.for_create(data, evolutions)
+        )
 
-        if data.previous_evolution_numbers:
-            if not await auow.pokemon_repo.are_existed(data.previous_evolution_numbers):
-                raise PokemonNotFound(data.previous_evolution_numbers)
-            await auow.pokemon_repo.replace_previous_evolutions(no, data.previous_evolution_numbers)
-        if data.next_evolution_numbers:
-            if not await auow.pokemon_repo.are_existed(data.next_evolution_numbers):
-                raise PokemonNotFound(data.next_evolution_numbers)
-            await auow.pokemon_repo.replace_next_evolutions(no, data.next_evolution_numbers)
 
-        return await auow.pokemon_repo.get(no)
+@retry_on_conflict
+async def create_pokemons(
+    async_unit_of_work: AbstractUnitOfWork, items: list[CreatePokemonModel]
+) -> CreatePokemonsResultModel:
+    """Create a batch of Pokemon in one unit of work, skipping and reporting invalid items.
 
+    Items may reference each other as evolutions; an item is rejected when its number is taken
+    (in the backend or earlier in the batch) or an evolution number resolves to nothing.
+    """
+    errors: dict[int, PokemonError] = {}
+    seen_numbers: set[PokemonNumberStr] = set()
+    for index, item in enumerate(items):
+        if item.no in seen_numbers:
+            errors[index] = PokemonAlreadyExists(item.no)
+        seen_numbers.add(item.no)
 
-async def get_pokemon(async_unit_of_work: AbstractUnitOfWork, no: PokemonNumberStr) -> PokemonModel:
     async with async_unit_of_work as auow:
-        return await auow.pokemon_repo.get(no)
+        referenced_numbers = {
+            no for item in items for pair in item.evolution_pairs() for no in pair
+        }
+        existing = await auow.pokemon_repo.get_many(
+            sorted(seen_numbers | referenced_numbers), PokemonIncludeModel.without_relations()
+        )
+        existing_numbers = existing.keys()
+        for index, item in enumerate(items):
+            if index not in errors and item.no in existing_numbers:
+                errors[index] = PokemonAlreadyExists(item.no)
 
+        _reject_missing_evolutions(items, errors, existing_numbers)
+        valid_items = [item for index, item in enumerate(items) if index not in errors]
+        evolutions = {
+            pokemon.no: PokemonEvolutionModel(no=pokemon.no, name=pokemon.name)
+            for pokemon in [*existing.values(), *valid_items]
+        }
+        created = (
+            await auow.pokemon_repo.bulk_create(valid_items, evolutions) if valid_items else []
+        )
 
-async def get_pokemons(async_unit_of_work: AbstractUnitOfWork) -> list[PokemonModel]:
-    async with async_unit_of_work as auow:
-        return await auow.pokemon_repo.list()
+    return CreatePokemonsResultModel(
+        created=_link_batch_evolutions(created),
+        errors=[
+            CreatePokemonErrorModel(index=index, no=items[index].no, error=errors[index])
+            for index in sorted(errors)
+        ],
+    )
+
+
+async def get_pokemon(
+    async_unit_of_work: AbstractUnitOfWork,
+    no: PokemonNumberStr,
+    include: PokemonIncludeModel = PokemonIncludeModel(),
+) -> PokemonModel:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.pokemon_repo.get(no, include)
+
+
+async def get_pokemon_version(async_unit_of_work: AbstractUnitOfWork, no: PokemonNumberStr) -> int:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.pokemon_repo.get_version(no)
+
+
+async def get_pokemon_map(
+    async_unit_of_work: AbstractUnitOfWork,
+    numbers: list[PokemonNumberStr],
+    include: PokemonIncludeModel = PokemonIncludeModel(),
+) -> dict[PokemonNumberStr, PokemonModel]:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.pokemon_repo.get_many(numbers, include)
+
+
+async def get_pokemons(
+    async_unit_of_work: AbstractUnitOfWork, include: PokemonIncludeModel = PokemonIncludeModel()
+) -> list[PokemonModel]:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.pokemon_repo.list(include=include)
+
+
+async def iter_pokemons(
+    async_unit_of_work: AbstractUnitOfWork, include: PokemonIncludeModel = PokemonIncludeModel()
+) -> AsyncIterator[PokemonModel]:
+    async with async_unit_of_work.read_only() as auow:
+        async for pokemon in auow.pokemon_repo.iter_all(include):
+            yield pokemon
+
+
+async def get_pokemon_page(
+    async_unit_of_work: AbstractUnitOfWork,
+    params: GetPokemonParamsModel | None,
+    include: PokemonIncludeModel = PokemonIncludeModel(),
+) -> PokemonPageModel:
+    """Load the page of `params`, or every Pokemon as a single page without them."""
+    async with async_unit_of_work.read_only() as auow:
+        if params is None:
+            return PokemonPageModel(items=await auow.pokemon_repo.list(include=include))
+        # fetch one extra row to learn whether another page follows without a COUNT query
+        pokemons = await auow.pokemon_repo.list(replace(params, size=params.size + 1), include)
 
+    items = pokemons[: params.size]
+    next_no = items[-1].no if len(pokemons) > params.size else None
 
+    return PokemonPageModel(items=items, next_no=next_no)
+
+
+async def get_pokemon_page_versions(
+    async_unit_of_work: AbstractUnitOfWork, params: GetPokemonParamsModel | None
+) -> PokemonVersionPageModel:
+    """Return the versions of the page `get_pokemon_page` would load, without loading it."""
+    async with async_unit_of_work.read_only() as auow:
+        if params is None:
+            return PokemonVersionPageModel(versions=await auow.pokemon_repo.list_versions())
+        versions = await auow.pokemon_repo.list_versions(replace(params, size=params.size + 1))
+
+    numbers = list(versions)[: params.size]
+    next_no = numbers[-1] if len(versions) > params.size else None
+
+    return PokemonVersionPageModel(versions={no: versions[no] for no in numbers}, next_no=next_no)
+
+
+@retry_on_conflict
 async def update_pokemon(
     async_unit_of_work: AbstractUnitOfWork, no: PokemonNumberStr, data: UpdatePokemonModel
 ) -> PokemonModel:
     async with async_unit_of_work as auow:
-        await auow.pokemon_repo.update(no, data)
+        if data == UpdatePokemonModel():
+            return await auow.pokemon_repo.get(no)
 
-        if data.type_names is not None:
-            await auow.pokemon_repo.replace_types(no, data.type_names)
+        evolutions = await _get_evolutions(
+            auow, (data.previous_evolution_numbers or []) + (data.next_evolution_numbers or [])
+        )
 
-        if data.previous_evolution_numbers is not None:
-            if not await auow.pokemon_repo.are_existed(data.previous_evolution_numbers):
-                raise PokemonNotFound(data.previous_evolution_numbers)
-            await auow.pokemon_repo.replace_previous_evolutions(no, data.previous_evolution_numbers)
-        if data.next_evolution_numbers is not None:
-            if not await auow.pokemon_repo.are_existed(data.next_evolution_numbers):
-                raise PokemonNotFound(data.next_evolution_numbers)
-            await auow.pokemon_repo.replace_next_evolutions(no, data.next_evolution_numbers)
+        pokemon = await auow.pokemon_repo.upsert_aggregate(
+            PokemonAggregateModel.for_update(no, data, evolutions)
+        )
+        if data.name is not None:
+            # Trainers show the names of their team
+            await auow.trainer_repo.touch_pokemon_owners(no)
 
-        return await auow.pokemon_repo.get(no)
+        return pokemon
 
 
+@retry_on_conflict
 async def delete_pokemon(async_unit_of_work: AbstractUnitOfWork, no: PokemonNumberStr) -> None:
     async with async_unit_of_work as auow:
         await auow.trainer_repo.remove_pokemon_from_all_teams(no)
         await auow.pokemon_repo.delete(no)
+
+
+def _reject_missing_evolutions(
+    items: list[CreatePokemonModel],
+    errors: dict[int, PokemonError],
+    existing_numbers: KeysView[PokemonNumberStr],
+) -> None:
+    """Add a `PokemonNotFound` to `errors` for every item with an evolution number nowhere."""
+    # rejecting an item can orphan items evolving from it, so repeat until nothing changes
+    while True:
+        available_numbers = existing_numbers | {
+            item.no for index, item in enumerate(items) if index not in errors
+        }
+        rejected = {
+            index: PokemonNotFound(missing)
+            for index, item in enumerate(items)
+            if index not in errors
+            and (
+                missing := sorted(
+                    set(item.previous_evolution_numbers + item.next_evolution_numbers)
+                    - available_numbers
+                )
+            )
+        }
+        if not rejected:
+            return
+        errors.update(rejected)
+
+
+def _link_batch_evolutions(created: list[PokemonModel]) -> list[PokemonModel]:
+    """Add the evolutions an item of the batch gained from the other items, as they were written."""
+    by_no = {pokemon.no: pokemon for pokemon in created}
+    previous = {no: {evo.no: evo for evo in by_no[no].previous_evolutions} for no in by_no}
+    next_ = {no: {evo.no: evo for evo in by_no[no].next_evolutions} for no in by_no}
+    for pokemon in created:
+        evolution = PokemonEvolutionModel(no=pokemon.no, name=pokemon.name)
+        for evo in pokemon.next_evolutions:
+            if evo.no in by_no:
+                previous[evo.no].setdefault(pokemon.no, evolution)
+        for evo in pokemon.previous_evolutions:
+            if evo.no in by_no:
+                next_[evo.no].setdefault(pokemon.no, evolution)
+
+    return [
+        replace(
+            pokemon,
+            previous_evolutions=[previous[pokemon.no][no] for no in sorted(previous[pokemon.no])],
+            next_evolutions=[next_[pokemon.no][no] for no in sorted(next_[pokemon.no])],
+        )
+        for pokemon in created
+    ]
+
+
+async def _get_evolutions(
+    auow: AbstractUnitOfWork, numbers: list[PokemonNumberStr]
+) -> dict[PokemonNumberStr, PokemonEvolutionModel]:
+    """Load all `numbers` with one backend call, raising `PokemonNotFound` with the missing ones."""
+    if not numbers:
+        return {}
+
+    found = await auow.pokemon_repo.get_many(numbers, PokemonIncludeModel.without_relations())
+    if missing := sorted(set(numbers) - found.keys()):
+        raise PokemonNotFound(missing)
+
+    return {no: PokemonEvolutionModel(no=no, name=pokemon.name) for no, pokemon in found.items()}
@@ -1,57 +1,107 @@
+from dataclasses import asdict, replace
+from typing import AsyncIterator
+
 from common.type import UUIDStr
-from di.unit_of_work import AbstractUnitOfWork
+from di.unit_of_work import AbstractUnitOfWork, retry_on_conflict
 from models.exception import (
     TrainerAlreadyOwnsPokemon,
     TrainerDoesNotOwnPokemon,
+    TrainerNotFound,
     TrainerTeamFullError,
 )
+from models.pokemon import PokemonIncludeModel
 from models.trainer import (
     CatchPokemonModel,
     CreateTrainerModel,
     ReleasePokemonModel,
     TradePokemonModel,
+    TrainerIncludeModel,
     TrainerModel,
+    TrainerPokemonModel,
     UpdateTrainerModel,
 )
 
 
+@retry_on_conflict
 async def create_trainer(
     async_unit_of_work: AbstractUnitOfWork, data: CreateTrainerModel
 ) -> TrainerModel:
     async with async_unit_of_work as auow:
-        id = await auow.trainer_repo.create(data)
-        return await auow.trainer_repo.get(id)
+        return await auow.trainer_repo.create(data)
 
 
-async def get_trainer(async_unit_of_work: AbstractUnitOfWork, id: UUIDStr) -> TrainerModel:
-    async with async_unit_of_work as auow:
-        return await auow.trainer_repo.get(id)
+async def get_trainer(
+    async_unit_of_work: AbstractUnitOfWork,
+    id: UUIDStr,
+    include: TrainerIncludeModel = TrainerIncludeModel(),
+) -> TrainerModel:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.trainer_repo.get(id, include)
 
 
-async def get_trainers(async_unit_of_work: AbstractUnitOfWork) -> list[TrainerModel]:
-    async with async_unit_of_work as auow:
-        return await auow.trainer_repo.list()
+async def get_trainer_version(async_unit_of_work: AbstractUnitOfWork, id: UUIDStr) -> int:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.trainer_repo.get_version(id)
+
+
+async def get_trainer_versions(async_unit_of_work: AbstractUnitOfWork) -> dict[UUIDStr, int]:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.trainer_repo.list_versions()
+
+
+async def get_trainers(
+    async_unit_of_work: AbstractUnitOfWork, include: TrainerIncludeModel = TrainerIncludeModel()
+) -> list[TrainerModel]:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.trainer_repo.list(include)
+
+
+async def iter_trainers(
+    async_unit_of_work: AbstractUnitOfWork, include: TrainerIncludeModel = TrainerIncludeModel()
+) -> AsyncIterator[TrainerModel]:
+    async with async_unit_of_work.read_only() as auow:
+        async for trainer in auow.trainer_repo.iter_all(include):
+            yield trainer
 
 
+async def get_trainer_teams(
+    async_unit_of_work: AbstractUnitOfWork, ids: list[UUIDStr]
+) -> dict[UUIDStr, list[TrainerPokemonModel]]:
+    async with async_unit_of_work.read_only() as auow:
+        return await auow.trainer_repo.get_teams(ids)
+
+
+@retry_on_conflict
 async def update_trainer(
     async_unit_of_work: AbstractUnitOfWork, id: UUIDStr, data: UpdateTrainerModel
 ) -> TrainerModel:
     async with async_unit_of_work as auow:
-        await auow.trainer_repo.update(id, data)
-        return await auow.trainer_repo.get(id)
+        trainer = await auow.trainer_repo.get(id)
+        if data == UpdateTrainerModel():
+            return trainer
+
+        version = await auow.trainer_repo.update(id, data)
+        changes = {field: value for field, value in asdict(data).items() if value is not None}
 
+        return replace(trainer, **changes, version=version)
 
+
+@retry_on_conflict
 async def delete_trainer(async_unit_of_work: AbstractUnitOfWork, id: UUIDStr) -> None:
     async with async_unit_of_work as auow:
         await auow.trainer_repo.delete(id)
 
 
+@retry_on_conflict
 async def catch_pokemon(
     async_unit_of_work: AbstractUnitOfWork, trainer_id: UUIDStr, data: CatchPokemonModel
 ) -> TrainerModel:
     async with async_unit_of_work as auow:
         trainer = await auow.trainer_repo.get(trainer_id)
-        await auow.pokemon_repo.get(data.pokemon_no)
+        # only its name is shown in the team, so skip loading the Pokemon's relations
+        pokemon = await auow.pokemon_repo.get(
+            data.pokemon_no, PokemonIncludeModel.without_relations()
+        )
 
         if trainer.is_team_full:
             raise TrainerTeamFullError(f'Trainer {trainer_id} team is full')
@@ -61,10 +111,10 @@ async def catch_pokemon(
                 f'Trainer {trainer_id} already owns Pokemon {data.pokemon_no}'
             )
 
-        await auow.trainer_repo.add_to_team(trainer_id, data.pokemon_no)
-        return await auow.trainer_repo.get(trainer_id)
+        return await auow.trainer_repo.add_to_team(trainer_id, pokemon.no)
 
 
+@retry_on_conflict
 async def release_pokemon(
     async_unit_of_work: AbstractUnitOfWork, trainer_id: UUIDStr, data: ReleasePokemonModel
 ) -> TrainerModel:
@@ -76,16 +126,15 @@ async def release_pokemon(
                 f'Trainer {trainer_id} does not own Pokemon {data.pokemon_no}'
             )
 
-        await auow.trainer_repo.remove_from_team(trainer_id, data.pokemon_no)
-        return await auow.trainer_repo.get(trainer_id)
+        return await auow.trainer_repo.remove_from_team(trainer_id, data.pokemon_no)
 
 
+@retry_on_conflict
 async def trade_pokemon(
     async_unit_of_work: AbstractUnitOfWork, data: TradePokemonModel
 ) -> tuple[TrainerModel, TrainerModel]:
     async with async_unit_of_work as auow:
-        trainer = await auow.trainer_repo.get(data.trainer_id)
-        other_trainer = await auow.trainer_repo.get(data.other_trainer_id)
+        trainer, other_trainer = await _get_trainer_pair(auow, data)
 
         if not trainer.has_pokemon(data.pokemon_no):
             raise TrainerDoesNotOwnPokemon(
@@ -109,10 +158,19 @@ async def trade_pokemon(
 
         await auow.trainer_repo.remove_from_team(data.trainer_id, data.pokemon_no)
         await auow.trainer_repo.remove_from_team(data.other_trainer_id, data.other_pokemon_no)
-        await auow.trainer_repo.add_to_team(data.trainer_id, data.other_pokemon_no)
-        await auow.trainer_repo.add_to_team(data.other_trainer_id, data.pokemon_no)
 
         return (
-            await auow.trainer_repo.get(data.trainer_id),
-            await auow.trainer_repo.get(data.other_trainer_id),
+            await auow.trainer_repo.add_to_team(data.trainer_id, data.other_pokemon_no),
+            await auow.trainer_repo.add_to_team(data.other_trainer_id, data.pokemon_no),
         )
+
+
+async def _get_trainer_pair(
+    auow: AbstractUnitOfWork, data: TradePokemonModel
+) -> tuple[TrainerModel, TrainerModel]:
+    trainers = await auow.trainer_repo.get_many([data.trainer_id, data.other_trainer_id])
+    for id in (data.trainer_id, data.other_trainer_id):
+        if id not in trainers:
+            raise TrainerNotFound(id)
+
+    return trainers[data.trainer_id], trainers[data.other_trainer_id]
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the Application.
+
+This module contains benchmarks that guard the performance characteristics of the repositories,
+such as the number of database round-trips an operation needs as the dataset grows.
+
+Key Characteristics:
+    - Backend-specific: Each benchmark is skipped unless the configured database is the one it measures.
+    - Budget-based: Assertions check a round-trip or time budget rather than exact timings, so results
+      stay stable across machines while still catching regressions.
+"""
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from common.type import PokemonNumberStr
+from models.pokemon import CreatePokemonModel, GetPokemonParamsModel, PokemonEvolutionModel
+from repositories.key_value_db import RedisPokemonRepository
+from settings.db import IS_KEY_VALUE_DB
+
+pytestmark = pytest.mark.skipif(not IS_KEY_VALUE_DB, reason='requires a key-value database')
+
+DATASET_SIZE = 1000
+
+
+class RoundTripCounter:
+    def __init__(self, client):
+        self.count = 0
+        self._execute_command = client.execute_command
+        self._pipeline = client.pipeline
+        client.execute_command = self.execute_command
+        client.pipeline = self.pipeline
+
+    async def execute_command(self, *args, **kwargs):
+        self.count += 1
+        return await self._execute_command(*args, **kwargs)
+
+    def pipeline(self, *args, **kwargs):
+        pipe = self._pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def counted_execute(*execute_args, **execute_kwargs):
+            self.count += 1
+            return await execute(*execute_args, **execute_kwargs)
+
+        pipe.execute = counted_execute
+        return pipe
+
+
+@pytest.fixture(scope='function')
+async def pokemon_repo():
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    # a client of its own, since the round-trip counter patches it
+    client = async_redis.client()
+    repo = RedisPokemonRepository(client)
+    numbers = [PokemonNumberStr(f'{i:04d}') for i in range(1, DATASET_SIZE + 1)]
+    await repo.bulk_create(
+        [
+            CreatePokemonModel(
+                no=no,
+                name=f'Pokemon {no}',
+                type_names=['A'],
+                previous_evolution_numbers=numbers[i - 1 : i] if i else [],
+                next_evolution_numbers=[],
+            )
+            for i, no in enumerate(numbers)
+        ],
+        {no: PokemonEvolutionModel(no=no, name=f'Pokemon {no}') for no in numbers},
+    )
+
+    yield repo
+
+    await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_list_pokemons_round_trips(pokemon_repo):  # pylint: disable=redefined-outer-name
+    echo = print  # ignore: remove-print-statements
+
+    counter = RoundTripCounter(pokemon_repo.client)
+    started = time.perf_counter()
+    for no in await pokemon_repo.client.zrange(pokemon_repo.INDEX_KEY, 0, -1):
+        await pokemon_repo.get(no)
+    per_key_elapsed, per_key_round_trips = time.perf_counter() - started, counter.count
+
+    counter.count = 0
+    started = time.perf_counter()
+    pokemons = await pokemon_repo.list()
+    list_elapsed, list_round_trips = time.perf_counter() - started, counter.count
+
+    echo(
+        f'\nlist() of {DATASET_SIZE} pokemons: {list_round_trips} round-trips in {list_elapsed:.3f}s'
+        f' (per-key: {per_key_round_trips} round-trips in {per_key_elapsed:.3f}s)'
+    )
+    assert len(pokemons) == DATASET_SIZE
+    assert pokemons[1].previous_evolutions[0].name == 'Pokemon 0001'
+    assert pokemons[0].next_evolutions[0].name == 'Pokemon 0002'
+    # one ZRANGE, plus one pipeline per chunk of INFO/TYPE/EVOLUTION lookups
+    chunks = -(-DATASET_SIZE * 4 // pokemon_repo.pipeline_chunk_size)
+    assert list_round_trips <= 1 + chunks
+
+
+@pytest.mark.anyio
+async def test_list_pokemon_page_resolves_evolutions_outside_page(
+    pokemon_repo,
+):  # pylint: disable=redefined-outer-name
+    counter = RoundTripCounter(pokemon_repo.client)
+    pokemons = await pokemon_repo.list(
+        GetPokemonParamsModel(size=10, after_no=PokemonNumberStr('0010'))
+    )
+
+    assert [p.no for p in pokemons] == [f'{i:04d}' for i in range(11, 21)]
+    assert pokemons[0].previous_evolutions[0].name == 'Pokemon 0010'
+    assert pokemons[-1].next_evolutions[0].name == 'Pokemon 0021'
+    # ZRANGEBYSCORE, one pipeline for the page, one for evolution names outside it
+    assert counter.count == 3
@@ -0,0 +1,110 @@
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass, field
+
+import pytest
+
+from common.type import PokemonNumberStr, UUIDStr
+from models.pokemon import PokemonModel
+from repositories.key_value_db.pokemon.mapper import PokemonKeyValueMapper
+
+# every valid Pokemon number
+DATASET_SIZE = 9999
+ROUNDS = 3
+
+
+@dataclass
+class _TypeModel:
+    id: UUIDStr
+    name: str
+
+
+@dataclass
+class _PokemonEvolutionModel:
+    no: PokemonNumberStr
+    name: str
+
+
+@dataclass
+class _PokemonModel:
+    no: PokemonNumberStr
+    name: str
+    types: list[_TypeModel] = field(default_factory=list)
+    previous_evolutions: list[_PokemonEvolutionModel] = field(default_factory=list)
+    next_evolutions: list[_PokemonEvolutionModel] = field(default_factory=list)
+    version: int = 1
+
+
+def _dict_to_untrusted_entity(key_value: dict) -> _PokemonModel:
+    # the mapping as it was before: `__dict__`-backed models and every string matched again
+    return _PokemonModel(
+        no=PokemonNumberStr(key_value['no']),
+        name=key_value['name'],
+        types=[
+            _TypeModel(id=UUIDStr(uuid.uuid5(uuid.NAMESPACE_DNS, name).hex), name=name)
+            for name in key_value['types']
+        ],
+        previous_evolutions=[
+            _PokemonEvolutionModel(no=PokemonNumberStr(evo['no']), name=evo['name'])
+            for evo in key_value['previous_evolutions']
+        ],
+        next_evolutions=[
+            _PokemonEvolutionModel(no=PokemonNumberStr(evo['no']), name=evo['name'])
+            for evo in key_value['next_evolutions']
+        ],
+        version=int(key_value['version']),
+    )
+
+
+def _build_key_values() -> list[dict]:
+    return [
+        {
+            'no': f'{i:04d}',
+            'name': f'Pokemon {i:04d}',
+            'types': ['Grass', 'Poison'],
+            'previous_evolutions': (
+                [{'no': f'{i - 1:04d}', 'name': f'Pokemon {i - 1:04d}'}] if i > 1 else []
+            ),
+            'next_evolutions': (
+                [{'no': f'{i + 1:04d}', 'name': f'Pokemon {i + 1:04d}'}] if i < DATASET_SIZE else []
+            ),
+            'version': '1',
+        }
+        for i in range(1, DATASET_SIZE + 1)
+    ]
+
+
+def _measure(map_entity, key_values: list[dict]) -> tuple[list, int, float]:
+    """Return the listed entities, the bytes they hold and the CPU time to list them."""
+    tracemalloc.start()
+    entities = list(map(map_entity, key_values))
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.process_time()
+    for _ in range(ROUNDS):
+        list(map(map_entity, key_values))
+
+    return entities, allocated, (time.process_time() - started) / ROUNDS
+
+
+@pytest.mark.anyio
+async def test_list_pokemons_memory_and_cpu():
+    echo = print  # ignore: remove-print-statements
+
+    key_values = _build_key_values()
+    _, untrusted_bytes, untrusted_cpu = _measure(_dict_to_untrusted_entity, key_values)
+    entities, bytes_, cpu = _measure(PokemonKeyValueMapper.dict_to_entity, key_values)
+
+    echo(
+        f'\nlisting {DATASET_SIZE} Pokemon: {untrusted_bytes / 2**20:.2f}MiB'
+        f' / {untrusted_cpu * 1000:.1f}ms CPU -> {bytes_ / 2**20:.2f}MiB'
+        f' / {cpu * 1000:.1f}ms CPU with slotted models and trusted strings'
+    )
+    assert all(isinstance(entity, PokemonModel) for entity in entities)
+    assert not hasattr(entities[0], '__dict__')
+    assert type(entities[0].no) is PokemonNumberStr
+    # the budgets leave room for noisy machines
+    assert bytes_ < untrusted_bytes * 0.8
+    assert cpu < untrusted_cpu * 0.8
@@ -0,0 +1,106 @@
+import json
+import time
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from common.type import PokemonNumberStr, UUIDStr
+from controllers.rest.pokemon.router import pokemon_encoder
+from controllers.rest.trainer.router import trainer_encoder
+from main import app
+from models.pokemon import PokemonEvolutionModel, PokemonModel, TypeModel
+from models.trainer import TrainerModel, TrainerPokemonModel
+
+PAGE_SIZE = 1000
+ROUNDS = 20
+
+
+def _build_pokemons() -> list[PokemonModel]:
+    return [
+        PokemonModel(
+            no=PokemonNumberStr(f'{i:04d}'),
+            name=f'Pokemon {i:04d}',
+            types=[TypeModel(id=UUIDStr(f'{i:032x}'), name='Grass')],
+            previous_evolutions=(
+                [PokemonEvolutionModel(no=PokemonNumberStr(f'{i - 1:04d}'), name='Previous')]
+                if i > 1
+                else []
+            ),
+            next_evolutions=[
+                PokemonEvolutionModel(no=PokemonNumberStr(f'{i + 1:04d}'), name='Next')
+            ],
+        )
+        for i in range(1, PAGE_SIZE + 1)
+    ]
+
+
+def _build_trainers() -> list[TrainerModel]:
+    return [
+        TrainerModel(
+            id=UUIDStr(f'{i:032x}'),
+            name=f'Trainer {i}',
+            region='Kanto',
+            badge_count=i % 8,
+            team=[
+                TrainerPokemonModel(no=PokemonNumberStr(f'{no:04d}'), name=f'Pokemon {no:04d}')
+                for no in range(1, 7)
+            ],
+        )
+        for i in range(1, PAGE_SIZE + 1)
+    ]
+
+
+def _get_route(path: str) -> APIRoute:
+    return next(
+        route
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.path == path and 'GET' in route.methods
+    )
+
+
+async def _measure(render, rounds: int = ROUNDS) -> tuple[bytes, float]:
+    """Return the body `render` produces and its CPU time per call."""
+    body = b''
+    started = time.process_time()
+    for _ in range(rounds):
+        body = await render()
+
+    return body, (time.process_time() - started) / rounds
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    'path, encoder, build_entities',
+    [
+        ('/pokemons', pokemon_encoder, _build_pokemons),
+        ('/trainers', trainer_encoder, _build_trainers),
+    ],
+)
+async def test_fast_json_list_cpu_per_request(path, encoder, build_entities):
+    echo = print  # ignore: remove-print-statements
+
+    entities = build_entities()
+    route = _get_route(path)
+
+    async def render_default() -> bytes:
+        # what FastAPI does with a returned list of response models
+        content = await serialize_response(
+            field=route.response_field,
+            response_content=list(map(encoder.to_response, entities)),
+        )
+        return bytes(JSONResponse(content).body)
+
+    async def render_fast() -> bytes:
+        return encoder.encode_many(entities)
+
+    default_body, default_cpu = await _measure(render_default)
+    fast_body, fast_cpu = await _measure(render_fast)
+
+    echo(
+        f'\nGET {path} with {PAGE_SIZE} items: {default_cpu * 1000:.2f}ms CPU per request'
+        f' -> {fast_cpu * 1000:.2f}ms with REST_FAST_JSON ({default_cpu / fast_cpu:.1f}x)'
+    )
+    assert json.loads(fast_body) == json.loads(default_body)
+    # typically ~10x; the budget leaves room for noisy machines
+    assert fast_cpu * 3 < default_cpu
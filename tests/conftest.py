@@ -5,7 +5,10 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 from pytest import Config
 
+from controllers.rest.pokemon.snapshot import page_snapshots
+from di.dependency_injection import injector
 from main import app as fastapi_app
+from repositories.cache import PokemonCache
 from settings.db import IS_DOCUMENT_DB, IS_KEY_VALUE_DB, IS_RELATIONAL_DB, initialize_db
 
 
@@ -89,10 +92,25 @@ async def client():
         yield ac
 
 
+@pytest.fixture(scope='function', autouse=True)
+def pokemon_cache():
+    # the cache is process-wide while every test starts from a fresh database
+    cache = injector.get(PokemonCache)
+    cache.clear()
+    yield cache
+
+
+@pytest.fixture(scope='function', autouse=True)
+def pokemon_page_snapshots():
+    page_snapshots.clear()
+    yield page_snapshots
+
+
 @pytest.fixture(scope='function')
 async def mock_async_unit_of_work():
     auow = MagicMock()
     auow.__aenter__.return_value = auow
+    auow.read_only.return_value = auow
     auow.pokemon_repo = AsyncMock()
     auow.trainer_repo = AsyncMock()
 
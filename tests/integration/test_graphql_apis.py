@@ -1,5 +1,11 @@
+from unittest.mock import patch
+
 import pytest
 
+import usecases.pokemon as pokemon_ucase
+import usecases.trainer as trainer_ucase
+from models.pokemon import PokemonIncludeModel
+
 
 @pytest.mark.anyio
 @pytest.mark.dependency
@@ -223,6 +229,164 @@ async def test_get_pokemons(client):
     }
 
 
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_get_pokemon_connection(client):
+    # pre-work
+    mutation = """
+        mutation {
+            mutation1: createPokemon(input: {no: "0004", name: "Charmander", typeNames: ["FIRE"]}) {
+                no
+            }
+            mutation2: createPokemon(input: {no: "0005", name: "Charmeleon", typeNames: ["FIRE"]}) {
+                no
+            }
+            mutation3: createPokemon(input: {no: "0006", name: "Charizard", typeNames: ["FIRE"]}) {
+                no
+            }
+        }
+    """
+    response = await client.post('/graphql', json={'query': mutation})
+    assert response.status_code == 200
+    assert response.json().get('errors') is None
+
+    # test first page
+    query = """
+        query ($after: String) {
+            pokemonConnection(first: 2, after: $after) {
+                nodes {
+                    no
+                }
+                pageInfo {
+                    hasNextPage
+                    endCursor
+                }
+            }
+        }
+    """
+    response = await client.post('/graphql', json={'query': query})
+    data = response.json()['data']['pokemonConnection']
+    assert response.status_code == 200
+    assert data['nodes'] == [{'no': '0004'}, {'no': '0005'}]
+    assert data['pageInfo']['hasNextPage'] is True
+
+    # test last page
+    variables = {'after': data['pageInfo']['endCursor']}
+    response = await client.post('/graphql', json={'query': query, 'variables': variables})
+    data = response.json()['data']['pokemonConnection']
+    assert response.status_code == 200
+    assert data == {
+        'nodes': [{'no': '0006'}],
+        'pageInfo': {'hasNextPage': False, 'endCursor': None},
+    }
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_get_pokemon_selected_fields(client):
+    # pre-work
+    mutation = """
+        mutation {
+            mutation1: createPokemon(input: {no: "0004", name: "Charmander", typeNames: ["FIRE"]}) {
+                no
+            }
+            mutation2: createPokemon(input: {
+                no: "0005",
+                name: "Charmeleon",
+                typeNames: ["FIRE"],
+                previousEvolutionNumbers: ["0004"]
+            }) {
+                no
+            }
+        }
+    """
+    response = await client.post('/graphql', json={'query': mutation})
+    assert response.status_code == 200
+    assert response.json().get('errors') is None
+
+    # test only the selected relations are loaded, including those selected through fragments
+    query = """
+        query {
+            pokemon(no: "0005") {
+                no
+                name
+                ...Evolutions
+            }
+        }
+        fragment Evolutions on PokemonNode {
+            previousEvolutions {
+                no
+                name
+            }
+        }
+    """
+    with patch(
+        'usecases.pokemon.get_pokemon_map', wraps=pokemon_ucase.get_pokemon_map
+    ) as get_pokemon_map:
+        response = await client.post('/graphql', json={'query': query})
+    assert response.status_code == 200
+    assert response.json() == {
+        'data': {
+            'pokemon': {
+                'no': '0005',
+                'name': 'Charmeleon',
+                'previousEvolutions': [{'no': '0004', 'name': 'Charmander'}],
+            }
+        }
+    }
+    assert get_pokemon_map.call_args.args[2] == PokemonIncludeModel(
+        types=False, previous_evolutions=True, next_evolutions=False
+    )
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_create_pokemons(client):
+    # test batch with an evolution inside the batch and a duplicated number
+    mutation = """
+        mutation {
+            createPokemons(input: [
+                {no: "0004", name: "Charmander", typeNames: ["FIRE"]},
+                {no: "0005", name: "Charmeleon", typeNames: ["FIRE"], previousEvolutionNumbers: ["0004"]},
+                {no: "0004", name: "Charmander", typeNames: ["FIRE"]}
+            ]) {
+                created {
+                    no
+                    types {
+                        name
+                    }
+                    previousEvolutions {
+                        no
+                        name
+                    }
+                }
+                errors {
+                    index
+                    no
+                    error
+                }
+            }
+        }
+    """
+    response = await client.post('/graphql', json={'query': mutation})
+    assert response.status_code == 200
+    assert response.json() == {
+        'data': {
+            'createPokemons': {
+                'created': [
+                    {'no': '0004', 'types': [{'name': 'FIRE'}], 'previousEvolutions': []},
+                    {
+                        'no': '0005',
+                        'types': [{'name': 'FIRE'}],
+                        'previousEvolutions': [{'no': '0004', 'name': 'Charmander'}],
+                    },
+                ],
+                'errors': [{'index': 2, 'no': '0004', 'error': 'PokemonAlreadyExists: 0004'}],
+            }
+        }
+    }
+
+
 @pytest.mark.anyio
 @pytest.mark.dependency(depends=['test_create_pokemon'])
 async def test_update_pokemon(client):
@@ -455,6 +619,68 @@ async def test_get_trainers(client):
     assert len(data['data']['trainers']) >= 2
 
 
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_trainer'])
+async def test_get_trainers_batches_nested_fields(client):
+    # pre-work
+    mutation = """
+        mutation {
+            p1: createPokemon(input: { no: "0025", name: "Pikachu", typeNames: ["Electric"] }) { no }
+            p2: createPokemon(input: { no: "0004", name: "Charmander", typeNames: ["Fire"] }) { no }
+            t1: createTrainer(input: { name: "Ash", region: "Kanto", badgeCount: 0 }) { id }
+            t2: createTrainer(input: { name: "Misty", region: "Kanto", badgeCount: 2 }) { id }
+            t3: createTrainer(input: { name: "Brock", region: "Kanto", badgeCount: 1 }) { id }
+        }
+    """
+    response = await client.post('/graphql', json={'query': mutation})
+    data = response.json()['data']
+    assert response.status_code == 200
+    for trainer_key, pokemon_no in [('t1', '0025'), ('t2', '0025'), ('t3', '0004')]:
+        mutation = f"""
+            mutation {{
+                catchPokemon(id: "{data[trainer_key]['id']}", input: {{ pokemonNo: "{pokemon_no}" }}) {{
+                    id
+                }}
+            }}
+        """
+        response = await client.post('/graphql', json={'query': mutation})
+        assert response.json().get('errors') is None
+
+    # test teams and their types are each loaded with a single batched call
+    query = """
+        query {
+            trainers {
+                name
+                team {
+                    no
+                    types {
+                        name
+                    }
+                }
+            }
+        }
+    """
+    with (
+        patch(
+            'usecases.trainer.get_trainer_teams', wraps=trainer_ucase.get_trainer_teams
+        ) as get_trainer_teams,
+        patch(
+            'usecases.pokemon.get_pokemon_map', wraps=pokemon_ucase.get_pokemon_map
+        ) as get_pokemon_map,
+    ):
+        response = await client.post('/graphql', json={'query': query})
+    data = response.json()
+    assert response.status_code == 200
+    assert data.get('errors') is None
+    teams = {trainer['name']: trainer['team'] for trainer in data['data']['trainers']}
+    assert teams['Ash'] == [{'no': '0025', 'types': [{'name': 'Electric'}]}]
+    assert teams['Misty'] == [{'no': '0025', 'types': [{'name': 'Electric'}]}]
+    assert teams['Brock'] == [{'no': '0004', 'types': [{'name': 'Fire'}]}]
+    assert get_trainer_teams.call_count == 1
+    assert get_pokemon_map.call_count == 1
+    assert sorted(get_pokemon_map.call_args.args[1]) == ['0004', '0025']
+
+
 @pytest.mark.anyio
 @pytest.mark.dependency(depends=['test_create_trainer'])
 async def test_update_trainer(client):
@@ -1,5 +1,9 @@
+import json
+
 import pytest
 
+from controllers.rest.pokemon.router import pokemon_encoder
+
 
 @pytest.mark.anyio
 @pytest.mark.dependency
@@ -146,6 +150,255 @@ async def test_get_pokemons(client):
     ]
 
 
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_get_pokemons_paginated(client):
+    # pre-work
+    for no, name in [('0001', 'Bulbasaur'), ('0004', 'Charmander'), ('0007', 'Squirtle')]:
+        response = await client.post(
+            '/pokemons', json={'no': no, 'name': name, 'type_names': ['A']}
+        )
+        assert response.status_code == 201
+
+    # test first page
+    response = await client.get('/pokemons', params={'size': 2})
+    assert response.status_code == 200
+    assert [item['no'] for item in response.json()] == ['0001', '0004']
+    cursor = response.headers['X-Next-Cursor']
+
+    # test last page
+    response = await client.get('/pokemons', params={'size': 2, 'cursor': cursor})
+    assert response.status_code == 200
+    assert [item['no'] for item in response.json()] == ['0007']
+    assert 'X-Next-Cursor' not in response.headers
+
+    # test without size nor cursor every Pokemon is listed
+    response = await client.get('/pokemons')
+    assert response.status_code == 200
+    assert [item['no'] for item in response.json()] == ['0001', '0004', '0007']
+    assert 'X-Next-Cursor' not in response.headers
+
+    # test a malformed cursor is rejected as invalid input
+    for cursor in ('%%%', 'MDAwMA', 'YWJj'):
+        response = await client.get('/pokemons', params={'cursor': cursor})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_get_pokemon_conditional(client):
+    # pre-work
+    for no, name, previous_evolution_numbers in [
+        ('0001', 'Bulbasaur', []),
+        ('0002', 'Ivysaur', ['0001']),
+    ]:
+        response = await client.post(
+            '/pokemons',
+            json={
+                'no': no,
+                'name': name,
+                'type_names': ['Grass'],
+                'previous_evolution_numbers': previous_evolution_numbers,
+            },
+        )
+        assert response.status_code == 201
+
+    response = await client.get('/pokemons/0001')
+    etag = response.headers['etag']
+    response = await client.get('/pokemons')
+    list_etag = response.headers['etag']
+
+    # test unchanged resources answer 304 with the same ETag and no body
+    for url, expected_etag in [('/pokemons/0001', etag), ('/pokemons', list_etag)]:
+        response = await client.get(url, headers={'If-None-Match': expected_etag})
+        assert response.status_code == 304
+        assert response.headers['etag'] == expected_etag
+        assert response.content == b''
+
+    # test renaming an evolution changes the ETag of the Pokemon embedding its name
+    response = await client.patch('/pokemons/0002', json={'name': 'Ivysaur II'})
+    assert response.status_code == 200
+    for url, old_etag in [('/pokemons/0001', etag), ('/pokemons', list_etag)]:
+        response = await client.get(url, headers={'If-None-Match': old_etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != old_etag
+
+        # the new ETag is the one the version lookup computes
+        response = await client.get(url, headers={'If-None-Match': response.headers['etag']})
+        assert response.status_code == 304
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_fast_json_responses(client, monkeypatch):
+    # pre-work
+    payload = {'no': '0001', 'name': 'Bulbasaur', 'type_names': ['Grass']}
+    response = await client.post('/pokemons', json=payload)
+    expected = response.json()
+    response = await client.get('/pokemons/0001')
+    expected_etag = response.headers['etag']
+
+    # test the fast path keeps the body, status code and headers
+    monkeypatch.setattr(pokemon_encoder, 'enabled', True)
+    response = await client.patch('/pokemons/0001', json={'name': 'Bulbasaur'})
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/json'
+    assert response.json() == expected
+    response = await client.get('/pokemons/0001')
+    assert response.json() == expected
+    assert response.headers['etag'] != expected_etag  # the PATCH bumped the version
+    response = await client.post('/pokemons', json=payload | {'no': '0002'})
+    assert response.status_code == 201
+    assert response.json() == expected | {'no': '0002'}
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_get_pokemons_snapshot(client, pokemon_page_snapshots, monkeypatch):
+    # pre-work
+    # even when POKEMON_SNAPSHOT_MAX_SIZE=0 turns snapshots off
+    monkeypatch.setattr(pokemon_page_snapshots, 'max_size', 16)
+    for no, name in [('0001', 'Bulbasaur'), ('0002', 'Ivysaur'), ('0003', 'Venusaur')]:
+        response = await client.post(
+            '/pokemons', json={'no': no, 'name': name, 'type_names': ['Grass']}
+        )
+        assert response.status_code == 201
+
+    # test the second request of a page is served from its snapshot
+    hits = pokemon_page_snapshots.counts['hits']
+    first_response = await client.get('/pokemons', params={'size': 2})
+    second_response = await client.get('/pokemons', params={'size': 2})
+    assert second_response.content == first_response.content
+    assert second_response.headers['etag'] == first_response.headers['etag']
+    assert second_response.headers['x-next-cursor'] == first_response.headers['x-next-cursor']
+    assert pokemon_page_snapshots.counts['hits'] == hits + 1
+
+    # test a write outdates only the pages it touches
+    response = await client.patch('/pokemons/0003', json={'name': 'Venusaur II'})
+    assert response.status_code == 200
+    cursor = first_response.headers['x-next-cursor']
+    response = await client.get('/pokemons', params={'size': 2, 'cursor': cursor})
+    assert [item['name'] for item in response.json()] == ['Venusaur II']
+    response = await client.get('/pokemons', params={'size': 2})
+    assert response.content == first_response.content
+    assert pokemon_page_snapshots.counts['hits'] == hits + 2
+
+    # test the unpaged listing is snapshotted, and revalidated from the versions alone
+    first_response = await client.get('/pokemons')
+    second_response = await client.get('/pokemons')
+    assert second_response.content == first_response.content
+    assert [item['no'] for item in second_response.json()] == ['0001', '0002', '0003']
+    assert pokemon_page_snapshots.counts['hits'] == hits + 3
+    etag = first_response.headers['etag']
+    response = await client.get('/pokemons', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert pokemon_page_snapshots.counts['hits'] == hits + 3
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_create_pokemons(client):
+    # pre-work
+    response = await client.post(
+        '/pokemons', json={'no': '0001', 'name': 'Bulbasaur', 'type_names': ['Grass']}
+    )
+    assert response.status_code == 201
+
+    # test batch with evolutions inside the batch and per-item errors
+    response = await client.post(
+        '/pokemons:batch',
+        json={
+            'items': [
+                {'no': '0001', 'name': 'Bulbasaur', 'type_names': ['Grass']},
+                {
+                    'no': '0002',
+                    'name': 'Ivysaur',
+                    'type_names': ['Grass', 'Poison'],
+                    'previous_evolution_numbers': ['0001'],
+                    'next_evolution_numbers': ['0003'],
+                },
+                {'no': '0003', 'name': 'Venusaur', 'type_names': ['Grass', 'Poison']},
+                {'no': '0003', 'name': 'Venusaur', 'type_names': ['Grass']},
+                {
+                    'no': '0005',
+                    'name': 'Charmeleon',
+                    'type_names': ['Fire'],
+                    'previous_evolution_numbers': ['0099'],
+                },
+                {
+                    'no': '0006',
+                    'name': 'Charizard',
+                    'type_names': ['Fire'],
+                    'previous_evolution_numbers': ['0005'],
+                },
+            ]
+        },
+    )
+    data = response.json()
+    for item in data['created']:
+        item['types'].sort(key=lambda k: k['name'])
+    assert response.status_code == 200
+    assert [
+        (
+            item['no'],
+            [type_['name'] for type_ in item['types']],
+            item['previous_evolutions'],
+            item['next_evolutions'],
+        )  # fmt: skip
+        for item in data['created']
+    ] == [
+        (
+            '0002',
+            ['Grass', 'Poison'],
+            [{'no': '0001', 'name': 'Bulbasaur'}],
+            [{'no': '0003', 'name': 'Venusaur'}],
+        ),
+        ('0003', ['Grass', 'Poison'], [{'no': '0002', 'name': 'Ivysaur'}], []),
+    ]
+    assert data['errors'] == [
+        {'index': 0, 'no': '0001', 'error': 'PokemonAlreadyExists: 0001'},
+        {'index': 3, 'no': '0003', 'error': 'PokemonAlreadyExists: 0003'},
+        {'index': 4, 'no': '0005', 'error': "PokemonNotFound: ['0099']"},
+        {'index': 5, 'no': '0006', 'error': "PokemonNotFound: ['0005']"},
+    ]
+
+    # test existing Pokemon gained the reverse evolution
+    response = await client.get('/pokemons/0001')
+    assert response.json()['next_evolutions'] == [{'no': '0002', 'name': 'Ivysaur'}]
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_pokemon'])
+async def test_export_pokemons(client):
+    # pre-work
+    response = await client.post(
+        '/pokemons:batch',
+        json={
+            'items': [
+                {'no': '0004', 'name': 'Charmander', 'type_names': ['Fire']},
+                {
+                    'no': '0005',
+                    'name': 'Charmeleon',
+                    'type_names': ['Fire'],
+                    'previous_evolution_numbers': ['0004'],
+                },
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()['errors'] == []
+
+    # test export streams one JSON document per line
+    response = await client.get('/pokemons/export')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(item['no'], item['next_evolutions']) for item in lines] == [
+        ('0004', [{'no': '0005', 'name': 'Charmeleon'}]),
+        ('0005', []),
+    ]
+
+
 @pytest.mark.anyio
 @pytest.mark.dependency(depends=['test_create_pokemon'])
 async def test_update_pokemon(client):
@@ -190,6 +443,36 @@ async def test_update_pokemon(client):
     }
 
 
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_update_pokemon'])
+async def test_update_pokemon_keeps_omitted_fields(client):
+    # pre-work
+    response = await client.post(
+        '/pokemons', json={'no': '9001', 'name': 'AAA', 'type_names': ['A']}
+    )
+    assert response.status_code == 201
+    response = await client.post(
+        '/pokemons',
+        json={
+            'no': '9002',
+            'name': 'BBB',
+            'type_names': ['B', 'BB'],
+            'previous_evolution_numbers': ['9001'],
+        },
+    )
+    assert response.status_code == 201
+
+    # test update
+    response = await client.patch('/pokemons/9002', json={'name': 'BBB-2'})
+    assert response.status_code == 200
+    assert response.json() == (await client.get('/pokemons/9002')).json()
+    assert [type_['name'] for type_ in response.json()['types']] == ['B', 'BB']
+    assert response.json()['previous_evolutions'] == [{'no': '9001', 'name': 'AAA'}]
+
+    response = await client.get('/pokemons/9001')
+    assert response.json()['next_evolutions'] == [{'no': '9002', 'name': 'BBB-2'}]
+
+
 @pytest.mark.anyio
 @pytest.mark.dependency(depends=['test_create_pokemon'])
 async def test_delete_pokemon(client):
@@ -266,6 +549,59 @@ async def test_get_trainers(client):
     assert len(data) >= 2
 
 
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_trainer'])
+async def test_get_trainer_conditional(client):
+    # pre-work
+    response = await client.post(
+        '/pokemons', json={'no': '0025', 'name': 'Pikachu', 'type_names': ['Electric']}
+    )
+    assert response.status_code == 201
+    response = await client.post(
+        '/trainers', json={'name': 'Ash', 'region': 'Kanto', 'badge_count': 0}
+    )
+    trainer_id = response.json()['id']
+    response = await client.post(f'/trainers/{trainer_id}/catch', json={'pokemon_no': '0025'})
+    assert response.status_code == 200
+    etag = (await client.get(f'/trainers/{trainer_id}')).headers['etag']
+    list_etag = (await client.get('/trainers')).headers['etag']
+
+    # test unchanged resources answer 304
+    for url, expected_etag in [(f'/trainers/{trainer_id}', etag), ('/trainers', list_etag)]:
+        response = await client.get(url, headers={'If-None-Match': f'W/{expected_etag}, "x"'})
+        assert response.status_code == 304
+
+    # test renaming a Pokemon of the team changes the ETags
+    response = await client.patch('/pokemons/0025', json={'name': 'Raichu'})
+    assert response.status_code == 200
+    for url, old_etag in [(f'/trainers/{trainer_id}', etag), ('/trainers', list_etag)]:
+        response = await client.get(url, headers={'If-None-Match': old_etag})
+        assert response.status_code == 200
+        assert response.headers['etag'] != old_etag
+
+
+@pytest.mark.anyio
+@pytest.mark.dependency(depends=['test_create_trainer'])
+async def test_export_trainers(client):
+    # pre-work
+    ids = []
+    for name in ('Ash', 'Misty'):
+        response = await client.post(
+            '/trainers', json={'name': name, 'region': 'Kanto', 'badge_count': 0}
+        )
+        assert response.status_code == 201
+        ids.append(response.json()['id'])
+
+    # test export streams one JSON document per line
+    response = await client.get('/trainers/export')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted((item['id'], item['name'], item['team']) for item in lines) == sorted(
+        [(ids[0], 'Ash', []), (ids[1], 'Misty', [])]
+    )
+
+
 @pytest.mark.anyio
 @pytest.mark.dependency(depends=['test_create_trainer'])
 async def test_update_trainer(client):
@@ -486,3 +822,19 @@ async def test_trade_pokemon(client):
     assert response.status_code == 200
     assert data['trainer']['team'][0]['no'] == '0004'
     assert data['other_trainer']['team'][0]['no'] == '0025'
+
+
+@pytest.mark.anyio
+async def test_ready(client, monkeypatch):
+    from main import app  # pylint: disable=import-outside-toplevel
+
+    # the tests don't run the app's lifespan, so there is no warm-up to wait for
+    monkeypatch.setattr(app.state, 'ready', False)
+    response = await client.get('/ready')
+    assert response.status_code == 503
+    assert response.json() == {'ready': False}
+
+    monkeypatch.setattr(app.state, 'ready', True)
+    response = await client.get('/ready')
+    assert response.status_code == 200
+    assert response.json() == {'ready': True}
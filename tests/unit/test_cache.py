@@ -0,0 +1,161 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from common.cache import TTLLRUCache
+from common.type import PokemonNumberStr
+from models.pokemon import (
+    PokemonAggregateModel,
+    PokemonEvolutionModel,
+    PokemonIncludeModel,
+    PokemonModel,
+)
+from repositories.cache import (
+    CachedPokemonRepository,
+    PokemonCache,
+    SharedCache,
+    SharedCacheCodec,
+)
+from settings.db import IS_KEY_VALUE_DB
+
+
+@pytest.mark.anyio
+async def test_ttl_lru_cache_eviction_and_expiry():
+    now = [0.0]
+    cache = TTLLRUCache(max_size=2, ttl=10, timer=lambda: now[0])
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+
+    # "b" is the least recently used entry
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+    now[0] = 10
+    assert cache.get('a') is None
+    assert cache.stats() | {'hit_ratio': None} == {
+        'size': 1,
+        'max_size': 2,
+        'ttl': 10,
+        'hits': 2,
+        'misses': 2,
+        'hit_ratio': None,
+        'evictions': 1,
+        'invalidations': 0,
+    }
+
+
+@pytest.mark.anyio
+async def test_ttl_lru_cache_invalidate_tag():
+    cache = TTLLRUCache(max_size=10, ttl=10)
+    cache.set('a', 1, tags=['x'])
+    cache.set('b', 2, tags=['x', 'y'])
+    cache.set('c', 3, tags=['y'])
+
+    cache.invalidate_tag('x')
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (None, None, 3)
+    assert cache.counts['invalidations'] == 2
+
+
+@pytest.mark.anyio
+async def test_cached_pokemon_repository_invalidates_evolution_neighbours():
+    bulbasaur = PokemonModel(
+        no=PokemonNumberStr('0001'),
+        name='Bulbasaur',
+        next_evolutions=[PokemonEvolutionModel(no=PokemonNumberStr('0002'), name='Ivysaur')],
+    )
+    repository = AsyncMock(transaction=None)
+    repository.get_many.return_value = {bulbasaur.no: bulbasaur}
+    cache = PokemonCache(max_size=10, ttl=60)
+    shared_cache = SharedCache(None, ttl=60)
+
+    # test the second read is served from the cache
+    for _ in range(2):
+        cached_repository = CachedPokemonRepository(repository, cache, shared_cache)
+        assert await cached_repository.get(bulbasaur.no) is bulbasaur
+    assert repository.get_many.call_count == 1
+
+    # test renaming an evolution evicts the Pokemon embedding its name
+    cached_repository = CachedPokemonRepository(repository, cache, shared_cache)
+    await cached_repository.upsert_aggregate(
+        PokemonAggregateModel(no=PokemonNumberStr('0002'), name='Ivysaur')
+    )
+    assert cache.get((bulbasaur.no, PokemonIncludeModel())) is None
+    assert cached_repository.pending_tags == {'POKEMON:0002'}
+
+    # test reads after a write bypass the cache within the same unit of work
+    await cached_repository.get(bulbasaur.no)
+    assert len(cache) == 0
+
+
+@pytest.mark.anyio
+async def test_cached_pokemon_repository_loads_misses_with_its_loader():
+    bulbasaur = PokemonModel(no=PokemonNumberStr('0001'), name='Bulbasaur')
+    replica, primary = AsyncMock(transaction=None), AsyncMock(transaction=None)
+    primary.get_many.return_value = {bulbasaur.no: bulbasaur}
+    cache = PokemonCache(max_size=10, ttl=60)
+    shared_cache = SharedCache(None, ttl=60)
+
+    # test e.g. a replica's misses are loaded from the primary, and cached
+    cached_repository = CachedPokemonRepository(replica, cache, shared_cache, loader=primary)
+    for _ in range(2):
+        assert await cached_repository.get(bulbasaur.no) is bulbasaur
+    assert (primary.get_many.call_count, replica.get_many.call_count) == (1, 0)
+
+    # test what isn't cached is still read from the replica
+    await cached_repository.list_versions()
+    assert (primary.list_versions.call_count, replica.list_versions.call_count) == (0, 1)
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not IS_KEY_VALUE_DB, reason='needs a Redis server')
+async def test_shared_cache_versioned_invalidation():
+    from settings.db import get_async_client  # pylint: disable=import-outside-toplevel
+
+    shared_cache = SharedCache(get_async_client(), ttl=60)
+    load = AsyncMock(return_value={'0001': {'no': '0001', 'evolutions': ['0002']}})
+    codec = SharedCacheCodec(
+        'POKEMON',
+        dump=lambda value: value,
+        parse=lambda value: value,
+        tags_of=lambda value: {f'POKEMON:{no}' for no in value['evolutions']},
+    )
+
+    # test the second lookup is served from Redis
+    for _ in range(2):
+        found = await shared_cache.get_or_load(codec, ['0001'], '111', load)
+        assert found == {'0001': {'no': '0001', 'evolutions': ['0002']}}
+    assert load.call_count == 1
+
+    # test invalidating an embedded evolution outdates the entry
+    await shared_cache.invalidate(['POKEMON:0002'])
+    await shared_cache.get_or_load(codec, ['0001'], '111', load)
+    assert load.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_shared_cache_listen_reconnects(monkeypatch):
+    invalidation = {'type': 'message', 'data': '["POKEMON:0001"]'}
+    pubsub = AsyncMock()
+    pubsub.__aenter__.return_value = pubsub
+    # the first subscription loses its connection, the second one gets a message
+    pubsub.subscribe.side_effect = [RedisConnectionError(), None]
+
+    async def listen():
+        yield invalidation
+        raise asyncio.CancelledError
+
+    pubsub.listen = listen
+    client = MagicMock()
+    client.pubsub.return_value = pubsub
+    monkeypatch.setattr(SharedCache, 'RECONNECT_INTERVAL', 0)
+    on_invalidate, on_reconnect = MagicMock(), MagicMock()
+
+    with pytest.raises(asyncio.CancelledError):
+        await SharedCache(client, ttl=60).listen(on_invalidate, on_reconnect)
+
+    on_reconnect.assert_called_once_with()
+    on_invalidate.assert_called_once_with(['POKEMON:0001'])
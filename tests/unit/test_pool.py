@@ -0,0 +1,83 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from settings import DATABASE_URI
+from settings.db import IS_KEY_VALUE_DB
+from settings.db.base import InstrumentedBlockingConnectionPool, normalize_uri
+from settings.db.pool import build_pool_options, get_pool_stats, warm_up_pool
+
+
+@pytest.mark.anyio
+async def test_instrumented_pool_stats(tmp_path):
+    options = build_pool_options() | {'pool_size': 1, 'max_overflow': 0, 'pool_timeout': 0.05}
+    async_engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "pool.db"}', **options)
+
+    try:
+        async with async_engine.connect():
+            stats = get_pool_stats(async_engine)
+            assert stats is not None
+            assert (stats['size'], stats['checked_out'], stats['idle']) == (1, 1, 0)
+            assert (stats['overflow'], stats['max_overflow']) == (0, 0)
+            assert (stats['checkouts'], stats['timeouts']) == (1, 0)
+
+            with pytest.raises(PoolTimeoutError):
+                await async_engine.connect()
+
+        stats = get_pool_stats(async_engine)
+        assert stats is not None
+        assert (stats['checked_out'], stats['idle']) == (0, 1)
+        assert (stats['checkouts'], stats['timeouts']) == (2, 1)
+        assert stats['wait_seconds_max'] >= 0.05
+    finally:
+        await async_engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_pool_stats_of_a_single_connection_pool():
+    assert get_pool_stats(create_async_engine('sqlite+aiosqlite:///:memory:')) is None
+
+
+@pytest.mark.anyio
+async def test_warm_up_pool(tmp_path):
+    options = build_pool_options() | {'pool_size': 3}
+    async_engine = create_async_engine(f'sqlite+aiosqlite:///{tmp_path / "pool.db"}', **options)
+
+    try:
+        await warm_up_pool(async_engine, size=5)
+
+        stats = get_pool_stats(async_engine)
+        assert stats is not None
+        # capped at the pool size, and all returned to it
+        assert (stats['checked_out'], stats['idle'], stats['checkouts']) == (0, 3, 3)
+    finally:
+        await async_engine.dispose()
+
+
+@pytest.mark.anyio
+@pytest.mark.skipif(not IS_KEY_VALUE_DB, reason='needs a Redis server')
+async def test_instrumented_redis_pool_stats():
+    pool = InstrumentedBlockingConnectionPool.from_url(
+        normalize_uri(DATABASE_URI), max_connections=1, timeout=0.05
+    )
+
+    try:
+        connection = await pool.get_connection()
+        with pytest.raises(RedisConnectionError):
+            await pool.get_connection()
+        assert pool.stats() | {'wait_seconds_total': 0, 'wait_seconds_max': 0} == {
+            'max_connections': 1,
+            'in_use': 1,
+            'idle': 0,
+            'checkouts': 2,
+            'timeouts': 1,
+            'wait_seconds_total': 0,
+            'wait_seconds_max': 0,
+        }
+        assert pool.stats()['wait_seconds_max'] >= 0.05
+
+        await pool.release(connection)
+        assert (pool.stats()['in_use'], pool.stats()['idle']) == (0, 1)
+    finally:
+        await pool.disconnect()
@@ -0,0 +1,67 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, insert, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from di.unit_of_work import AsyncSQLAlchemyUnitOfWork
+from settings.db.pool import build_pool_options
+from settings.db.replica import ReplicaSet
+
+
+@pytest.fixture(name='replica_engines')
+async def _replica_engines(tmp_path):
+    engines = [
+        create_async_engine(
+            f'sqlite+aiosqlite:///{tmp_path / f"replica{i}.db"}', **build_pool_options()
+        )
+        for i in range(2)
+    ]
+    yield engines
+
+    for async_engine in engines:
+        await async_engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_replica_set_selection(replica_engines):
+    first, second = replica_engines
+
+    replica_set = ReplicaSet(replica_engines)
+    assert [replica_set.choose() for _ in range(3)] == [first, second, first]
+
+    replica_set = ReplicaSet(replica_engines, 'least_connections')
+    async with first.connect():
+        assert [replica_set.choose() for _ in range(2)] == [second, second]
+    assert [replica_set.choose() for _ in range(2)] == [first, second]
+
+    with pytest.raises(ValueError):
+        ReplicaSet(replica_engines, 'random')
+
+
+@pytest.mark.anyio
+async def test_replica_session_refuses_writes(replica_engines):
+    session = ReplicaSet(replica_engines).create_session()
+
+    try:
+        assert (await session.execute(text('SELECT 1'))).scalar() == 1
+        table = Table('pokemon', MetaData(), Column('id', Integer))
+        with pytest.raises(InvalidRequestError, match='read replica'):
+            await session.execute(insert(table).values(id=1))
+    finally:
+        await session.close()
+
+
+@pytest.mark.anyio
+async def test_sqlalchemy_unit_of_work_read_only(monkeypatch):
+    monkeypatch.setattr(AsyncSQLAlchemyUnitOfWork, 'remove', AsyncMock())
+    replica_unit_of_work = MagicMock()
+    unit_of_work = AsyncSQLAlchemyUnitOfWork(
+        AsyncMock(), MagicMock(), MagicMock(), replica_factory=lambda: replica_unit_of_work
+    )
+    assert unit_of_work.read_only() is replica_unit_of_work
+
+    # reads inside a unit of work that writes stay on the primary
+    async with unit_of_work:
+        assert unit_of_work.read_only() is unit_of_work
@@ -1 +1,222 @@
-# TODO: To be implemented
+import pytest
+
+from common.type import PokemonNumberStr
+from di.dependency_injection import injector
+from di.unit_of_work import AbstractUnitOfWork, UnitOfWorkConflict
+from models.exception import (
+    PokemonNotFound,
+    TrainerAlreadyOwnsPokemon,
+    TrainerDoesNotOwnPokemon,
+    TrainerTeamFullError,
+)
+from models.pokemon import CreatePokemonModel
+from models.trainer import MAX_TEAM_SIZE, CreateTrainerModel
+from settings.db import IS_KEY_VALUE_DB
+
+pytestmark = pytest.mark.skipif(not IS_KEY_VALUE_DB, reason='requires a key-value database')
+
+BULBASAUR = CreatePokemonModel(
+    no=PokemonNumberStr('0001'),
+    name='Bulbasaur',
+    type_names=['Grass', 'Poison'],
+    previous_evolution_numbers=[],
+    next_evolution_numbers=[],
+)
+
+
+async def _create_bulbasaur():
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.pokemon_repo.bulk_create([BULBASAUR], {})
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_commits_writes_together():
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.pokemon_repo.bulk_create([BULBASAUR], {})
+        # queued until the unit of work exits
+        assert not await async_redis.exists('POKEMON:0001:INFO')
+
+    pokemon = await injector.get(AbstractUnitOfWork).pokemon_repo.get(BULBASAUR.no)
+    assert [type_.name for type_ in pokemon.types] == ['Grass', 'Poison']
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_discards_writes_on_error():
+    with pytest.raises(PokemonNotFound):
+        async with injector.get(AbstractUnitOfWork) as auow:
+            await auow.pokemon_repo.bulk_create([BULBASAUR], {})
+            raise PokemonNotFound(['0002'])
+
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    assert not await async_redis.keys('POKEMON:0001:*')
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_conflicts_when_a_read_key_changes():
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    await _create_bulbasaur()
+
+    with pytest.raises(UnitOfWorkConflict):
+        async with injector.get(AbstractUnitOfWork) as auow:
+            await auow.pokemon_repo.get(BULBASAUR.no)
+            await async_redis.hset('POKEMON:0001:INFO', 'name', 'Venusaur')
+            await auow.pokemon_repo.delete(BULBASAUR.no)
+
+    assert await async_redis.hget('POKEMON:0001:INFO', 'name') == 'Venusaur'
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_refuses_reads_after_its_writes():
+    with pytest.raises(RuntimeError):
+        async with injector.get(AbstractUnitOfWork) as auow:
+            await auow.pokemon_repo.bulk_create([BULBASAUR], {})
+            await auow.pokemon_repo.get(BULBASAUR.no)
+
+
+@pytest.mark.anyio
+async def test_unit_of_work_holds_a_single_connection():
+    # pylint: disable=import-outside-toplevel
+    from redis.asyncio import Redis as AsyncRedis
+
+    from di.unit_of_work import AsyncRedisUnitOfWork
+    from repositories.key_value_db import RedisPokemonRepository, RedisTrainerRepository
+    from settings import DATABASE_URI
+    from settings.db.base import InstrumentedBlockingConnectionPool, normalize_uri
+    from usecases import trainer as trainer_ucase
+
+    pool = InstrumentedBlockingConnectionPool.from_url(
+        normalize_uri(DATABASE_URI), max_connections=1, timeout=0.05, decode_responses=True
+    )
+    client = AsyncRedis.from_pool(pool)
+    auow = AsyncRedisUnitOfWork(
+        client, RedisPokemonRepository(client), RedisTrainerRepository(client)
+    )
+
+    try:
+        trainer = await trainer_ucase.create_trainer(
+            auow, CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+        assert await auow.trainer_repo.get_version(trainer.id) == trainer.version
+        assert pool.stats()['timeouts'] == 0
+    finally:
+        await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_delete_missing_pokemon_raises_after_commit():
+    with pytest.raises(PokemonNotFound):
+        async with injector.get(AbstractUnitOfWork) as auow:
+            await auow.trainer_repo.remove_pokemon_from_all_teams(BULBASAUR.no)
+            await auow.pokemon_repo.delete(BULBASAUR.no)
+
+
+@pytest.mark.anyio
+async def test_team_writes_return_the_committed_trainer():
+    await _create_bulbasaur()
+    async with injector.get(AbstractUnitOfWork) as auow:
+        trainer = await auow.trainer_repo.create(
+            CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+        trainer_id = trainer.id
+
+    async with injector.get(AbstractUnitOfWork) as auow:
+        trainer = await auow.trainer_repo.get(trainer_id)
+        caught = await auow.trainer_repo.add_to_team(trainer_id, BULBASAUR.no)
+        released = await auow.trainer_repo.remove_from_team(trainer_id, BULBASAUR.no)
+
+    assert [(p.no, p.name) for p in caught.team] == [(BULBASAUR.no, BULBASAUR.name)]
+    assert not released.team
+    assert released.version == trainer.version + 2
+    written = await injector.get(AbstractUnitOfWork).trainer_repo.get(trainer_id)
+    assert (written.team, written.version) == (released.team, released.version)
+
+
+@pytest.mark.anyio
+async def test_add_to_team_guards_the_team_in_its_script():
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    async with injector.get(AbstractUnitOfWork) as auow:
+        trainer = await auow.trainer_repo.create(
+            CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+        trainer_id = trainer.id
+    # e.g. another worker's catches, committed after the team was checked
+    full_team = [f'{no:04}' for no in range(1, MAX_TEAM_SIZE + 1)]
+    await async_redis.sadd(f'TRAINER:{trainer_id}:TEAM', *full_team)
+
+    for no, error in ((full_team[0], TrainerAlreadyOwnsPokemon), ('0099', TrainerTeamFullError)):
+        with pytest.raises(error):
+            async with injector.get(AbstractUnitOfWork) as auow:
+                await auow.trainer_repo.add_to_team(trainer_id, PokemonNumberStr(no))
+
+    assert await async_redis.scard(f'TRAINER:{trainer_id}:TEAM') == MAX_TEAM_SIZE
+
+
+@pytest.mark.anyio
+async def test_remove_from_team_rejects_a_pokemon_not_owned():
+    async with injector.get(AbstractUnitOfWork) as auow:
+        trainer = await auow.trainer_repo.create(
+            CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+
+    with pytest.raises(TrainerDoesNotOwnPokemon):
+        async with injector.get(AbstractUnitOfWork) as auow:
+            await auow.trainer_repo.remove_from_team(trainer.id, BULBASAUR.no)
+
+    version = await injector.get(AbstractUnitOfWork).trainer_repo.get_version(trainer.id)
+    assert version == trainer.version
+
+
+@pytest.mark.anyio
+async def test_remove_pokemon_from_all_teams_skips_deleted_owners():
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    # e.g. an owner left behind by a Trainer deleted before the index was maintained
+    await async_redis.sadd('POKEMON:0001:OWNERS', 'deleted-trainer')
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.trainer_repo.remove_pokemon_from_all_teams(BULBASAUR.no)
+
+    assert not await async_redis.keys('TRAINER:deleted-trainer:*')
+    assert not await async_redis.exists('POKEMON:0001:OWNERS')
+
+
+@pytest.mark.anyio
+async def test_touch_pokemon_owners_skips_deleted_owners():
+    from settings.db.redis import async_redis  # pylint: disable=import-outside-toplevel
+
+    await async_redis.sadd('POKEMON:0001:OWNERS', 'deleted-trainer')
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.trainer_repo.touch_pokemon_owners(BULBASAUR.no)
+
+    assert not await async_redis.keys('TRAINER:deleted-trainer:*')
+    assert not await async_redis.sismember('POKEMON:0001:OWNERS', 'deleted-trainer')
+
+
+@pytest.mark.anyio
+async def test_backfill_redis_indexes_skips_deleted_entities(monkeypatch):
+    # pylint: disable=import-outside-toplevel
+    from settings.db.redis import async_redis, backfill_redis_indexes
+
+    # one script per round-trip
+    monkeypatch.setattr('settings.db.redis.CHUNK_SIZE', 1)
+
+    await _create_bulbasaur()
+    async with injector.get(AbstractUnitOfWork) as auow:
+        trainer = await auow.trainer_repo.create(
+            CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.trainer_repo.add_to_team(trainer.id, BULBASAUR.no)
+    # e.g. indexes that didn't exist yet, and a team left by a Trainer deleted meanwhile
+    await async_redis.delete('POKEMON:INDEX', 'TRAINER:INDEX', 'POKEMON:0001:OWNERS')
+    await async_redis.sadd('TRAINER:deleted-trainer:TEAM', BULBASAUR.no)
+
+    await backfill_redis_indexes()
+
+    assert await async_redis.zrange('POKEMON:INDEX', 0, -1) == [BULBASAUR.no]
+    assert await async_redis.smembers('TRAINER:INDEX') == {trainer.id}
+    assert await async_redis.smembers('POKEMON:0001:OWNERS') == {trainer.id}
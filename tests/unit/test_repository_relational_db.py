@@ -1 +1,88 @@
-# TODO: To be implemented
+import pytest
+
+from common.type import PokemonNumberStr
+from di.dependency_injection import injector
+from di.unit_of_work import AbstractUnitOfWork
+from models.exception import (
+    TrainerAlreadyOwnsPokemon,
+    TrainerDoesNotOwnPokemon,
+    TrainerTeamFullError,
+)
+from models.pokemon import CreatePokemonModel
+from models.trainer import MAX_TEAM_SIZE, CreateTrainerModel
+from settings.db import IS_RELATIONAL_DB
+
+pytestmark = pytest.mark.skipif(not IS_RELATIONAL_DB, reason='requires a relational database')
+
+
+@pytest.mark.anyio
+async def test_add_to_team_guards_the_team_in_the_insert():
+    numbers = [PokemonNumberStr(f'{no:04}') for no in range(1, MAX_TEAM_SIZE + 2)]
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.pokemon_repo.bulk_create(
+            [
+                CreatePokemonModel(
+                    no=no,
+                    name=f'Pokemon{no}',
+                    type_names=[],
+                    previous_evolution_numbers=[],
+                    next_evolution_numbers=[],
+                )
+                for no in numbers
+            ],
+            {},
+        )
+        trainer = await auow.trainer_repo.create(
+            CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+        trainer_id = trainer.id
+        for no in numbers[:MAX_TEAM_SIZE]:
+            await auow.trainer_repo.add_to_team(trainer_id, no)
+
+    # without the checks of the usecase
+    async with injector.get(AbstractUnitOfWork) as auow:
+        with pytest.raises(TrainerAlreadyOwnsPokemon):
+            await auow.trainer_repo.add_to_team(trainer_id, numbers[0])
+        with pytest.raises(TrainerTeamFullError):
+            await auow.trainer_repo.add_to_team(trainer_id, numbers[-1])
+
+    team = await injector.get(AbstractUnitOfWork).trainer_repo.get_teams([trainer_id])
+    assert [tp.no for tp in team[trainer_id]] == numbers[:MAX_TEAM_SIZE]
+
+
+@pytest.mark.anyio
+async def test_team_writes_return_the_team_they_produced_and_check_ownership():
+    no = PokemonNumberStr('0001')
+    async with injector.get(AbstractUnitOfWork) as auow:
+        await auow.pokemon_repo.bulk_create(
+            [
+                CreatePokemonModel(
+                    no=no,
+                    name='Bulbasaur',
+                    type_names=[],
+                    previous_evolution_numbers=[],
+                    next_evolution_numbers=[],
+                )
+            ],
+            {},
+        )
+        trainer = await auow.trainer_repo.create(
+            CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
+        )
+
+    async with injector.get(AbstractUnitOfWork) as auow:
+        # the Trainer loaded before the writes must not be served back
+        await auow.trainer_repo.get(trainer.id)
+        caught = await auow.trainer_repo.add_to_team(trainer.id, no)
+        released = await auow.trainer_repo.remove_from_team(trainer.id, no)
+
+    assert [(tp.no, tp.name) for tp in caught.team] == [(no, 'Bulbasaur')]
+    assert (caught.version, released.version) == (trainer.version + 1, trainer.version + 2)
+    assert not released.team
+
+    # without the check of the usecase
+    with pytest.raises(TrainerDoesNotOwnPokemon):
+        async with injector.get(AbstractUnitOfWork) as auow:
+            await auow.trainer_repo.remove_from_team(trainer.id, no)
+    version = await injector.get(AbstractUnitOfWork).trainer_repo.get_version(trainer.id)
+    assert version == released.version
@@ -0,0 +1,44 @@
+import pytest
+
+from common.type import PokemonNumberStr, UUIDStr
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    'values',
+    [
+        [],
+        ['0001', '0150', '9999'],
+        ['0001\n'],  # accepted one by one, so accepted in a batch too
+    ],
+)
+async def test_pokemon_numbers_validate_many(values):
+    numbers = PokemonNumberStr.validate_many(values)
+
+    assert numbers == list(map(PokemonNumberStr, values))
+    assert all(type(no) is PokemonNumberStr for no in numbers)
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    'values, invalid',
+    [
+        (['0001', '0000'], '0000'),
+        (['0001\n0002'], '0001\n0002'),
+        (['0001', '12a4', '99999'], '12a4'),
+    ],
+)
+async def test_pokemon_numbers_validate_many_invalid(values, invalid):
+    with pytest.raises(ValueError) as exc_info:
+        PokemonNumberStr.validate_many(values)
+
+    assert str(exc_info.value) == str(pytest.raises(ValueError, PokemonNumberStr, invalid).value)
+
+
+@pytest.mark.anyio
+async def test_uuids_validate_many():
+    values = [f'{i:032x}' for i in range(3)]
+
+    assert UUIDStr.validate_many(values) == values
+    with pytest.raises(ValueError, match="'not-a-uuid' is not a valid UUID"):
+        UUIDStr.validate_many([*values, 'not-a-uuid'])
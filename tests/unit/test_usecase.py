@@ -21,15 +21,19 @@ Key Aspects Covered:
 Overall, this test module showcases how to effectively unit test asynchronous usecase functions by mocking external dependencies, allowing us to verify the business logic without any side effects.
 """
 
+from dataclasses import replace
+
 import pytest
 
 from common.type import PokemonNumberStr, UUIDStr
+from di.unit_of_work import UnitOfWorkConflict
 from models.exception import (
+    PokemonNotFound,
     TrainerAlreadyOwnsPokemon,
     TrainerDoesNotOwnPokemon,
     TrainerTeamFullError,
 )
-from models.pokemon import PokemonModel
+from models.pokemon import CreatePokemonModel, PokemonModel
 from models.trainer import (
     CatchPokemonModel,
     CreateTrainerModel,
@@ -49,16 +53,56 @@ async def test_get_pokemon(mock_async_unit_of_work):
     assert mock_async_unit_of_work.pokemon_repo.get.call_count == 1
 
 
+@pytest.mark.anyio
+async def test_create_pokemon_missing_evolutions(mock_async_unit_of_work):
+    mock_async_unit_of_work.pokemon_repo.get_many.return_value = {
+        PokemonNumberStr('0001'): PokemonModel(no=PokemonNumberStr('0001'), name='Bulbasaur')
+    }
+
+    data = CreatePokemonModel(
+        no=PokemonNumberStr('0003'),
+        name='Venusaur',
+        type_names=['Grass'],
+        previous_evolution_numbers=[PokemonNumberStr('0001'), PokemonNumberStr('0002')],
+        next_evolution_numbers=[],
+    )
+    with pytest.raises(PokemonNotFound) as exc_info:
+        await pokemon_ucase.create_pokemon(mock_async_unit_of_work, data)
+
+    assert exc_info.value.args == (['0002'],)
+    assert mock_async_unit_of_work.pokemon_repo.get_many.call_count == 1
+    assert mock_async_unit_of_work.pokemon_repo.upsert_aggregate.call_count == 0
+
+
+@pytest.mark.anyio
+async def test_delete_pokemon_retries_on_conflict(mock_async_unit_of_work):
+    mock_async_unit_of_work.__aexit__.side_effect = [UnitOfWorkConflict(), None]
+
+    await pokemon_ucase.delete_pokemon(mock_async_unit_of_work, PokemonNumberStr('0001'))
+    assert mock_async_unit_of_work.pokemon_repo.delete.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_delete_pokemon_gives_up_on_conflicts(mock_async_unit_of_work, monkeypatch):
+    monkeypatch.setattr('di.unit_of_work.UNIT_OF_WORK_RETRY_BACKOFF_SECONDS', 0)
+    mock_async_unit_of_work.__aexit__.side_effect = UnitOfWorkConflict()
+
+    with pytest.raises(UnitOfWorkConflict):
+        await pokemon_ucase.delete_pokemon(mock_async_unit_of_work, PokemonNumberStr('0001'))
+    # the first attempt and 3 retries
+    assert mock_async_unit_of_work.pokemon_repo.delete.call_count == 4
+
+
 @pytest.mark.anyio
 async def test_create_trainer(mock_async_unit_of_work):
-    mock_async_unit_of_work.trainer_repo.create.return_value = UUIDStr('a' * 32)
-    mock_async_unit_of_work.trainer_repo.get.return_value = TrainerModel(
+    mock_async_unit_of_work.trainer_repo.create.return_value = TrainerModel(
         id=UUIDStr('a' * 32), name='Ash', region='Kanto', badge_count=0, team=[]
     )
     data = CreateTrainerModel(name='Ash', region='Kanto', badge_count=0)
     result = await trainer_ucase.create_trainer(mock_async_unit_of_work, data)
     assert result.name == 'Ash'
     assert mock_async_unit_of_work.trainer_repo.create.call_count == 1
+    assert mock_async_unit_of_work.trainer_repo.get.call_count == 0
 
 
 @pytest.mark.anyio
@@ -114,16 +158,16 @@ async def test_release_pokemon_not_owned(mock_async_unit_of_work):
 async def test_trade_pokemon_not_owned_by_trainer(mock_async_unit_of_work):
     trainer_id = UUIDStr('a' * 32)
     other_id = UUIDStr('b' * 32)
-    mock_async_unit_of_work.trainer_repo.get.side_effect = [
-        TrainerModel(id=trainer_id, name='Ash', region='Kanto', badge_count=0, team=[]),
-        TrainerModel(
+    mock_async_unit_of_work.trainer_repo.get_many.return_value = {
+        trainer_id: TrainerModel(id=trainer_id, name='Ash', region='Kanto', badge_count=0, team=[]),
+        other_id: TrainerModel(
             id=other_id,
             name='Gary',
             region='Kanto',
             badge_count=0,
             team=[TrainerPokemonModel(no=PokemonNumberStr('0002'), name='Ivysaur')],
         ),
-    ]
+    }
 
     data = TradePokemonModel(
         trainer_id=trainer_id,
@@ -139,8 +183,8 @@ async def test_trade_pokemon_not_owned_by_trainer(mock_async_unit_of_work):
 async def test_trade_pokemon_already_owned_by_other(mock_async_unit_of_work):
     trainer_id = UUIDStr('a' * 32)
     other_id = UUIDStr('b' * 32)
-    mock_async_unit_of_work.trainer_repo.get.side_effect = [
-        TrainerModel(
+    mock_async_unit_of_work.trainer_repo.get_many.return_value = {
+        trainer_id: TrainerModel(
             id=trainer_id,
             name='Ash',
             region='Kanto',
@@ -150,14 +194,14 @@ async def test_trade_pokemon_already_owned_by_other(mock_async_unit_of_work):
                 TrainerPokemonModel(no=PokemonNumberStr('0002'), name='Ivysaur'),
             ],
         ),
-        TrainerModel(
+        other_id: TrainerModel(
             id=other_id,
             name='Gary',
             region='Kanto',
             badge_count=0,
             team=[TrainerPokemonModel(no=PokemonNumberStr('0002'), name='Ivysaur')],
         ),
-    ]
+    }
 
     data = TradePokemonModel(
         trainer_id=trainer_id,
@@ -167,3 +211,60 @@ async def test_trade_pokemon_already_owned_by_other(mock_async_unit_of_work):
     )
     with pytest.raises(TrainerAlreadyOwnsPokemon):
         await trainer_ucase.trade_pokemon(mock_async_unit_of_work, data)
+
+
+@pytest.mark.anyio
+async def test_trade_pokemon_returns_trainers_as_written(mock_async_unit_of_work):
+    trainer_id = UUIDStr('a' * 32)
+    other_id = UUIDStr('b' * 32)
+    trainer = TrainerModel(
+        id=trainer_id,
+        name='Ash',
+        region='Kanto',
+        badge_count=0,
+        team=[
+            TrainerPokemonModel(no=PokemonNumberStr('0001'), name='Bulbasaur'),
+            TrainerPokemonModel(no=PokemonNumberStr('0025'), name='Pikachu'),
+        ],
+        version=10,
+    )
+    other_trainer = TrainerModel(
+        id=other_id,
+        name='Gary',
+        region='Kanto',
+        badge_count=0,
+        team=[TrainerPokemonModel(no=PokemonNumberStr('0004'), name='Charmander')],
+        version=20,
+    )
+    mock_async_unit_of_work.trainer_repo.get_many.return_value = {
+        trainer_id: trainer,
+        other_id: other_trainer,
+    }
+    # e.g. a catch committed by another worker between the read and the trade
+    written = (
+        replace(
+            trainer,
+            team=[
+                TrainerPokemonModel(no=PokemonNumberStr('0001'), name='Bulbasaur'),
+                TrainerPokemonModel(no=PokemonNumberStr('0004'), name='Charmander'),
+                TrainerPokemonModel(no=PokemonNumberStr('0007'), name='Squirtle'),
+            ],
+            version=13,
+        ),
+        replace(
+            other_trainer,
+            team=[TrainerPokemonModel(no=PokemonNumberStr('0025'), name='Pikachu')],
+            version=22,
+        ),
+    )
+    mock_async_unit_of_work.trainer_repo.add_to_team.side_effect = written
+
+    data = TradePokemonModel(
+        trainer_id=trainer_id,
+        other_trainer_id=other_id,
+        pokemon_no=PokemonNumberStr('0025'),
+        other_pokemon_no=PokemonNumberStr('0004'),
+    )
+
+    assert await trainer_ucase.trade_pokemon(mock_async_unit_of_work, data) == written
+    assert mock_async_unit_of_work.trainer_repo.get_many.call_count == 1